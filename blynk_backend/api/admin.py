@@ -1,8 +1,29 @@
 from django.contrib import admin
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from django.utils import timezone
+
+from . import clustering, events, jobs, search, stats
 from .models import (
     UserProfile, NGOInfo, VolunteerRequest,
-    DonorRequest, HelpRequest, ContactMessage, Post
+    DonorRequest, HelpRequest, ContactMessage, Post, MediaJob
 )
+from .serializers import MapPostSerializer
+
+class FullTextSearchMixin:
+    """
+    Search through the full-text index instead of ``icontains`` scans;
+    ``search_fields`` only switches the search box on. Usernames still
+    match exactly.
+    """
+    
+    def get_search_results(self, request, queryset, search_term):
+        matching = search.matching_ids_sql(self.model, search_term)
+        if matching is None:
+            return queryset, False
+        sql, params = matching
+        return queryset.filter(Q(pk__in=RawSQL(sql, params)) | Q(user__username=search_term.strip())), False
 
 @admin.register(UserProfile)
 class UserProfileAdmin(admin.ModelAdmin):
@@ -10,7 +31,7 @@ class UserProfileAdmin(admin.ModelAdmin):
 
 @admin.register(NGOInfo)
 class NGOInfoAdmin(admin.ModelAdmin):
-    list_display = ['name', 'email', 'phone', 'lives_impacted', 'active_donors']
+    list_display = ['name', 'email', 'phone']
 
 @admin.register(VolunteerRequest)
 class VolunteerRequestAdmin(admin.ModelAdmin):
@@ -21,26 +42,74 @@ class DonorRequestAdmin(admin.ModelAdmin):
     list_display = ['user', 'donation_type', 'amount', 'status', 'created_at']
 
 @admin.register(HelpRequest)
-class HelpRequestAdmin(admin.ModelAdmin):
-    list_display = ['user', 'title', 'category', 'urgency', 'status', 'created_at']
+class HelpRequestAdmin(FullTextSearchMixin, admin.ModelAdmin):
+    list_display = ['user', 'title', 'category', 'urgency', 'status', 'assigned_to', 'created_at']
+    list_filter = ['status', 'urgency', 'category']
+    list_select_related = ['user', 'assigned_to']
+    search_fields = ['title', 'description', 'user__username']
 
 @admin.register(ContactMessage)
 class ContactMessageAdmin(admin.ModelAdmin):
     list_display = ['name', 'email', 'is_read', 'created_at']
 
 @admin.register(Post)
-class PostAdmin(admin.ModelAdmin):
-    list_display = ['title', 'user', 'is_confirmed', 'created_at']
-    list_filter = ['is_confirmed', 'created_at']
+class PostAdmin(FullTextSearchMixin, admin.ModelAdmin):
+    list_display = ['title', 'user', 'is_confirmed', 'media_status', 'created_at']
+    list_filter = ['is_confirmed', 'media_status', 'created_at']
     search_fields = ['title', 'description', 'user__username']
     actions = ['approve_posts', 'unapprove_posts']
     
+    def _set_confirmed(self, queryset, confirmed):
+        """
+        Set ``is_confirmed`` on the selected posts; returns those changed.
+        update() skips model signals and auto_now, so refresh the map
+        clusters and impact stats, stamp updated_at for delta sync and
+        publish events here.
+        """
+        with transaction.atomic():
+            candidates = queryset.filter(is_confirmed=not confirmed).only(*MapPostSerializer.Meta.fields)
+            now = timezone.now()
+            # Each row changes only if it still has the old value, so admins
+            # acting on overlapping selections never count a post twice
+            changed = [
+                post for post in candidates
+                if Post.objects.filter(pk=post.pk, is_confirmed=not confirmed).update(
+                    is_confirmed=confirmed, updated_at=now
+                )
+            ]
+            points = [clustering.cluster_point(True, p.latitude, p.longitude) for p in changed]
+            points = [point for point in points if point]
+            if confirmed:
+                clustering.add_points(points)
+                stats.add_posts(changed)
+                events.publish_posts(events.POST_APPROVED, changed)
+            else:
+                clustering.remove_points(points)
+                stats.remove_posts(changed)
+                events.publish_posts(events.POST_UNAPPROVED, changed)
+        return changed
+    
     def approve_posts(self, request, queryset):
-        queryset.update(is_confirmed=True)
-        self.message_user(request, f"{queryset.count()} posts approved")
+        changed = self._set_confirmed(queryset, True)
+        self.message_user(request, f"{len(changed)} posts approved")
     approve_posts.short_description = "Approve selected posts"
     
     def unapprove_posts(self, request, queryset):
-        queryset.update(is_confirmed=False)
-        self.message_user(request, f"{queryset.count()} posts unapproved")
+        changed = self._set_confirmed(queryset, False)
+        self.message_user(request, f"{len(changed)} posts unapproved")
     unapprove_posts.short_description = "Unapprove selected posts"
+
+@admin.register(MediaJob)
+class MediaJobAdmin(admin.ModelAdmin):
+    list_display = ['id', 'kind', 'post', 'status', 'attempts', 'run_after', 'updated_at']
+    list_filter = ['status', 'kind']
+    list_select_related = ['post']
+    readonly_fields = ['locked_by', 'locked_at', 'last_error', 'created_at', 'updated_at']
+    actions = ['retry_jobs']
+    
+    def retry_jobs(self, request, queryset):
+        failed = list(queryset.filter(status='failed').select_related('post'))
+        for job in failed:
+            jobs.enqueue(job.post, [job.kind])
+        self.message_user(request, f"{len(failed)} jobs queued again")
+    retry_jobs.short_description = "Retry selected failed jobs"
@@ -0,0 +1,213 @@
+"""
+Async variants of the hot read endpoints, used when ``SERVER_MODE=asgi``.
+
+DRF views are synchronous, so under ASGI every request to them occupies a
+thread. These views use Django's async ORM and cache APIs instead and
+return the same payloads as their DRF counterparts in ``views.py``. They
+reuse the DRF serializers, which do no database access once the rows
+are loaded.
+"""
+import asyncio
+import json
+
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.cache import patch_cache_control
+from django.views import View
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.settings import api_settings
+
+from . import caching, events
+from .authentication import token_cache, token_queryset, token_usage
+from .geo import parse_bbox, parse_viewport, bbox_q, bbox_contains, coordinate_precision
+from .models import DeviceToken, Post, UserProfile
+from .pagination import KeysetPagination
+from .serializers import PostSerializer, PostValuesSerializer, MapPostValuesSerializer, UserProfileSerializer
+
+
+# Seconds between comment lines that keep idle event streams open
+EVENT_KEEPALIVE = 15
+# Milliseconds EventSource clients wait before reconnecting
+EVENT_RETRY = 5000
+
+
+class AsyncJSONView(View):
+    """Base class rendering JSON with the renderer the DRF views use"""
+    renderer = api_settings.DEFAULT_RENDERER_CLASSES[0]()
+
+    def respond(self, data=None, status=status.HTTP_200_OK, headers=None):
+        content = b'' if data is None else self.renderer.render(data)
+        return HttpResponse(content, status=status, content_type='application/json', headers=headers)
+
+    async def authenticate(self, request):
+        """Resolve ``Authorization: Token <key>`` like ``CachedTokenAuthentication``"""
+        parts = request.headers.get('Authorization', '').split()
+        if len(parts) != 2 or parts[0].lower() != 'token':
+            return None
+        key = parts[1]
+        cached = await token_cache.aget(key)
+        if cached is not None:
+            user, token = cached
+        else:
+            try:
+                token = await token_queryset().aget(key=key)
+            except DeviceToken.DoesNotExist:
+                return None
+            if not token.user.is_active:
+                return None
+            user = token.user
+            token_cache.set(key, user, token)
+        if token.is_expired(timezone.now()):
+            return None
+        if token_usage.touch(key):
+            await token_usage.aflush()
+        return user
+
+    def not_authenticated(self):
+        return self.respond(
+            {'detail': 'Authentication credentials were not provided.'},
+            status=status.HTTP_401_UNAUTHORIZED,
+            headers={'WWW-Authenticate': 'Token'},
+        )
+
+
+class AsyncNGOInfoView(AsyncJSONView):
+    """Async variant of ``NGOInfoView``"""
+
+    async def get(self, request):
+        cached = await caching.aget_ngo_info()
+        if cached is None:
+            return self.respond({
+                'success': False,
+                'message': 'NGO information not found'
+            }, status=status.HTTP_404_NOT_FOUND)
+
+        etag, data = cached
+        if caching.etag_matches(request, etag):
+            response = self.respond(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = self.respond({
+                'success': True,
+                'ngo_info': data
+            })
+        response['ETag'] = etag
+        patch_cache_control(response, public=True, max_age=caching.NGO_INFO_MAX_AGE)
+        return response
+
+
+class AsyncApprovedPostListView(AsyncJSONView):
+    """Async variant of ``ApprovedPostViewSet.list``"""
+
+    def get_queryset(self):
+        return Post.objects.filter(is_confirmed=True).select_related('user').order_by('-created_at', '-id')
+
+    async def get(self, request):
+        queryset = self.get_queryset()
+        serializer_class, context = PostValuesSerializer, {'request': request}
+        if 'bbox' in request.GET:
+            try:
+                bounds, zoom = parse_viewport(request.GET)
+            except ValueError as e:
+                return self.respond({
+                    'success': False,
+                    'message': str(e)
+                }, status=status.HTTP_400_BAD_REQUEST)
+            queryset = queryset.filter(bbox_q(*bounds))
+            serializer_class = MapPostValuesSerializer
+            if zoom is not None:
+                context['coordinate_precision'] = coordinate_precision(zoom)
+
+        serializer = serializer_class(context=context)
+        paginator = KeysetPagination()
+        try:
+            rows = paginator.page_queryset(serializer.values(queryset), request)
+        except APIException as e:
+            # An invalid cursor; DRF's exception handler isn't in play here
+            return self.respond({'detail': e.detail}, status=e.status_code)
+        page = paginator.set_page([row async for row in rows])
+        return self.respond(serializer.to_list(page), headers=paginator.get_headers())
+
+
+class AsyncApprovedPostDetailView(AsyncApprovedPostListView):
+    """Async variant of ``ApprovedPostViewSet.retrieve``"""
+
+    async def get(self, request, pk):
+        post = await self.get_queryset().filter(pk=pk).afirst()
+        if post is None:
+            return self.respond({'detail': 'No Post matches the given query.'}, status=status.HTTP_404_NOT_FOUND)
+        return self.respond(PostSerializer(post, context={'request': request}).data)
+
+
+class AsyncUserProfileView(AsyncJSONView):
+    """Async variant of ``UserProfileView``"""
+
+    async def get(self, request):
+        user = await self.authenticate(request)
+        if user is None:
+            return self.not_authenticated()
+
+        # Loaded along with the token, so this does not query
+        try:
+            profile = user.profile
+        except UserProfile.DoesNotExist:
+            profile = None
+        if profile is None:
+            return self.respond({
+                'success': False,
+                'message': 'Profile not found'
+            }, status=status.HTTP_404_NOT_FOUND)
+        return self.respond({
+            'success': True,
+            'profile': UserProfileSerializer(profile).data
+        })
+
+
+class PostEventStreamView(AsyncJSONView):
+    """
+    Server-sent events for post approvals, so map clients need not poll.
+
+    ``bbox`` (``minLon,minLat,maxLon,maxLat``) limits the stream to posts
+    inside the client's viewport. A client that falls too far behind is
+    disconnected; ``EventSource`` reconnects and the client reloads.
+    """
+
+    async def get(self, request):
+        bounds = None
+        if 'bbox' in request.GET:
+            try:
+                bounds = parse_bbox(request.GET['bbox'])
+            except ValueError as e:
+                return self.respond({
+                    'success': False,
+                    'message': str(e)
+                }, status=status.HTTP_400_BAD_REQUEST)
+
+        response = StreamingHttpResponse(
+            self.stream(request, bounds), content_type='text/event-stream'
+        )
+        response['Cache-Control'] = 'no-cache'
+        # Stop proxies such as nginx from buffering the stream
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+    async def stream(self, request, bounds):
+        subscription = events.get_broker().subscribe()
+        try:
+            yield f'retry: {EVENT_RETRY}\n\n'
+            while True:
+                try:
+                    event = await asyncio.wait_for(subscription.get(), EVENT_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    yield ': keepalive\n\n'
+                    continue
+                if event is None:
+                    return
+                post = event['post']
+                if bounds and not bbox_contains(bounds, post['latitude'], post['longitude']):
+                    continue
+                if post.get('photo') and post['photo'].startswith('/'):
+                    post = dict(post, photo=request.build_absolute_uri(post['photo']))
+                yield f"event: {event['type']}\ndata: {json.dumps(post)}\n\n"
+        finally:
+            subscription.close()
@@ -0,0 +1,234 @@
+"""
+Per-device token authentication backed by an in-process cache.
+
+Each login issues a ``DeviceToken`` for the device it came from with one
+upsert on ``(user, device_id)``, so logging in on a phone no longer logs
+the user out of the browser. Tokens expire after ``TOKEN_LIFETIME``, and
+``last_used_at`` is buffered per worker and written for many tokens in
+one ``UPDATE`` every ``LAST_USED_FLUSH_INTERVAL`` seconds.
+``sweep_tokens`` (the ``sweep_tokens`` command) deletes expired tokens
+and the least recently used ones beyond ``MAX_DEVICES_PER_USER``, which
+keeps the table bounded.
+
+``CachedTokenAuthentication`` loads the token, user and profile in one
+query and keeps them in a bounded, TTL-evicting cache per worker.
+Deleting a token (logout), issuing a new one, or saving a user or
+profile revokes cached entries. The revocation is also recorded in the
+Django cache so other workers drop their copies on next use:
+immediately with a shared backend (``REDIS_URL``), and within
+``TOKEN_CACHE_TTL`` with the default per-process cache.
+"""
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db.models import Count, F
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+
+from .models import DeviceToken, generate_token_key
+
+TOKEN_CACHE_TTL = 60
+TOKEN_CACHE_SIZE = 10000
+
+TOKEN_LIFETIME = timedelta(days=30)
+MAX_DEVICES_PER_USER = 10
+LAST_USED_FLUSH_INTERVAL = 60
+# Rows per UPDATE when flushing last_used_at
+LAST_USED_BATCH_SIZE = 500
+
+TOKEN_REVOKED_KEY = 'auth:token-revoked:{}'
+USER_REVOKED_KEY = 'auth:user-revoked:{}'
+
+
+class TokenCache:
+    """LRU map of token key to ``(user, token)`` whose entries expire"""
+
+    def __init__(self, maxsize=TOKEN_CACHE_SIZE, ttl=TOKEN_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _lookup(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if time.time() - entry[2] > self.ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def _check(self, key, entry, markers):
+        user, token, cached_at = entry
+        revoked_at = max(
+            markers.get(TOKEN_REVOKED_KEY.format(key), 0),
+            markers.get(USER_REVOKED_KEY.format(user.pk), 0),
+        )
+        if revoked_at >= cached_at:
+            self.discard(key)
+            return None
+        return user, token
+
+    def _marker_keys(self, key, entry):
+        return [TOKEN_REVOKED_KEY.format(key), USER_REVOKED_KEY.format(entry[0].pk)]
+
+    def get(self, key):
+        entry = self._lookup(key)
+        if entry is None:
+            return None
+        return self._check(key, entry, cache.get_many(self._marker_keys(key, entry)))
+
+    async def aget(self, key):
+        entry = self._lookup(key)
+        if entry is None:
+            return None
+        return self._check(key, entry, await cache.aget_many(self._marker_keys(key, entry)))
+
+    def set(self, key, user, token):
+        with self._lock:
+            self._entries[key] = (user, token, time.time())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def discard(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def discard_user(self, user_id):
+        with self._lock:
+            for key in [key for key, entry in self._entries.items() if entry[0].pk == user_id]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+token_cache = TokenCache()
+
+
+def revoke_token(key):
+    """Drop a token from this worker's cache and tell the other workers"""
+    token_cache.discard(key)
+    cache.set(TOKEN_REVOKED_KEY.format(key), time.time(), TOKEN_CACHE_TTL)
+
+
+def revoke_user(user_id):
+    """Drop every cached token of a user, e.g. after the user changed"""
+    token_cache.discard_user(user_id)
+    cache.set(USER_REVOKED_KEY.format(user_id), time.time(), TOKEN_CACHE_TTL)
+
+
+class TokenUsage:
+    """Collects the keys of used tokens until their ``last_used_at`` is written"""
+
+    def __init__(self, interval=LAST_USED_FLUSH_INTERVAL):
+        self.interval = interval
+        self._keys = set()
+        self._flushed_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def touch(self, key):
+        """Record a use; returns whether a flush is due"""
+        with self._lock:
+            self._keys.add(key)
+            return time.monotonic() - self._flushed_at >= self.interval
+
+    def _take(self):
+        with self._lock:
+            keys, self._keys = list(self._keys), set()
+            self._flushed_at = time.monotonic()
+        return [keys[i:i + LAST_USED_BATCH_SIZE] for i in range(0, len(keys), LAST_USED_BATCH_SIZE)]
+
+    def flush(self):
+        now = timezone.now()
+        for batch in self._take():
+            DeviceToken.objects.filter(key__in=batch).update(last_used_at=now)
+
+    async def aflush(self):
+        now = timezone.now()
+        for batch in self._take():
+            await DeviceToken.objects.filter(key__in=batch).aupdate(last_used_at=now)
+
+
+token_usage = TokenUsage()
+
+
+def issue_token(user, device_id=DeviceToken.DEFAULT_DEVICE_ID):
+    """Create or replace the token of one of the user's devices in one upsert"""
+    now = timezone.now()
+    token = DeviceToken(
+        key=generate_token_key(), user=user, device_id=device_id,
+        last_used_at=now, expires_at=now + TOKEN_LIFETIME,
+    )
+    DeviceToken.objects.bulk_create(
+        [token],
+        update_conflicts=True,
+        unique_fields=['user', 'device_id'],
+        update_fields=['key', 'created_at', 'last_used_at', 'expires_at'],
+    )
+    # The device's previous key may still be cached by some worker
+    revoke_user(user.pk)
+    return token
+
+
+def sweep_tokens(now=None):
+    """
+    Delete expired tokens, then each user's least recently used tokens
+    beyond ``MAX_DEVICES_PER_USER``. Returns ``(expired, excess)`` counts.
+    """
+    now = now or timezone.now()
+    expired, _ = DeviceToken.objects.filter(expires_at__lte=now).delete()
+
+    excess = 0
+    crowded = DeviceToken.objects.values('user').annotate(devices=Count('id')).filter(
+        devices__gt=MAX_DEVICES_PER_USER
+    ).values_list('user', flat=True)
+    for user_id in crowded.iterator():
+        stale = DeviceToken.objects.filter(user_id=user_id).order_by(
+            F('last_used_at').desc(nulls_last=True), '-created_at'
+        ).values_list('id', flat=True)[MAX_DEVICES_PER_USER:]
+        deleted, _ = DeviceToken.objects.filter(id__in=list(stale)).delete()
+        excess += deleted
+    return expired, excess
+
+
+def token_queryset():
+    # The profile join saves views a second query for request.user.profile
+    return DeviceToken.objects.select_related('user', 'user__profile')
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """``TokenAuthentication`` over ``DeviceToken`` that usually answers from ``token_cache``"""
+    model = DeviceToken
+
+    def authenticate_credentials(self, key):
+        cached = token_cache.get(key)
+        if cached is not None:
+            user, token = cached
+        else:
+            try:
+                token = token_queryset().get(key=key)
+            except DeviceToken.DoesNotExist:
+                raise exceptions.AuthenticationFailed(_('Invalid token.'))
+
+            if not token.user.is_active:
+                raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+
+            user = token.user
+            token_cache.set(key, user, token)
+
+        if token.is_expired(timezone.now()):
+            raise exceptions.AuthenticationFailed(_('Token has expired.'))
+
+        if token_usage.touch(key):
+            token_usage.flush()
+        return user, token
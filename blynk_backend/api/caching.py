@@ -0,0 +1,146 @@
+"""
+Cached API payloads.
+
+Cached entries are invalidated from model signals (see ``signals.py``).
+With the default per-process memory cache a signal only clears the
+worker that handled the write, so entries also expire after a timeout;
+a shared backend (``REDIS_URL``) makes invalidation immediate everywhere.
+
+Each user's own volunteer, donor and help request lists are cached per
+page under a generation counter for that user and collection. A write
+bumps the counter, so the user's next read misses and rebuilds, without
+having to find and delete every cached page. Writes that skip model
+signals (``bulk_create``, ``queryset.update()``) must call
+``invalidate_user_list`` themselves. A user's next request may reach
+another worker, which would not see a per-process counter move, so
+these pages are cached only with a shared backend; otherwise they are
+rebuilt on every request and still get an ETag for a cheap 304.
+"""
+import hashlib
+import json
+import time
+
+from django.core.cache import cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.utils.http import parse_etags, quote_etag
+from rest_framework.utils.encoders import JSONEncoder
+
+from .models import NGOInfo, ImpactStat
+from .serializers import NGOInfoSerializer
+
+NGO_INFO_CACHE_KEY = 'ngo_info'
+# Bump when the NGOInfoSerializer output changes shape
+NGO_INFO_CACHE_VERSION = 3
+NGO_INFO_CACHE_TIMEOUT = 60 * 10
+# How long clients may reuse the NGO info before revalidating
+NGO_INFO_MAX_AGE = 60 * 5
+
+USER_LIST_GENERATION_KEY = 'user_list_generation:{}:{}'
+USER_LIST_CACHE_KEY = 'user_list:{}:{}:{}:{}'
+# Bump when the payload of the user list views changes shape
+USER_LIST_CACHE_VERSION = 1
+USER_LIST_CACHE_TIMEOUT = 60 * 10
+
+
+def make_etag(data, version=1):
+    """Strong ETag over the JSON form of a payload"""
+    content = json.dumps(data, cls=JSONEncoder, sort_keys=True, separators=(',', ':'))
+    digest = hashlib.sha256(content.encode('utf-8')).hexdigest()[:32]
+    return quote_etag(f'v{version}-{digest}')
+
+
+def etag_matches(request, etag):
+    """Whether the request's If-None-Match covers ``etag``"""
+    header = request.headers.get('If-None-Match')
+    if not header:
+        return False
+    etags = parse_etags(header)
+    # Weak comparison, as If-None-Match requires (RFC 9110 13.1.2)
+    return '*' in etags or etag in etags or etag in (e.removeprefix('W/') for e in etags)
+
+
+def get_ngo_info():
+    """``(etag, data)`` for the NGO information, or ``None`` if there is none"""
+    cached = cache.get(NGO_INFO_CACHE_KEY, version=NGO_INFO_CACHE_VERSION)
+    if cached is not None:
+        return cached
+
+    ngo_info = NGOInfo.objects.first()
+    if ngo_info is None:
+        return None
+    data = dict(NGOInfoSerializer(ngo_info).data)
+    cached = (make_etag(data, NGO_INFO_CACHE_VERSION), data)
+    cache.set(NGO_INFO_CACHE_KEY, cached, NGO_INFO_CACHE_TIMEOUT, version=NGO_INFO_CACHE_VERSION)
+    return cached
+
+
+async def aget_ngo_info():
+    """Async version of ``get_ngo_info`` for the ASGI views"""
+    cached = await cache.aget(NGO_INFO_CACHE_KEY, version=NGO_INFO_CACHE_VERSION)
+    if cached is not None:
+        return cached
+
+    ngo_info = await NGOInfo.objects.afirst()
+    if ngo_info is None:
+        return None
+    # Loaded here: the serializer would otherwise query synchronously
+    statistics = await ImpactStat.aheadline()
+    data = dict(NGOInfoSerializer(ngo_info, context={'statistics': statistics}).data)
+    cached = (make_etag(data, NGO_INFO_CACHE_VERSION), data)
+    await cache.aset(NGO_INFO_CACHE_KEY, cached, NGO_INFO_CACHE_TIMEOUT, version=NGO_INFO_CACHE_VERSION)
+    return cached
+
+
+def invalidate_ngo_info():
+    cache.delete(NGO_INFO_CACHE_KEY, version=NGO_INFO_CACHE_VERSION)
+
+
+def shared_cache():
+    """Whether the default cache is one store for every worker"""
+    return not isinstance(caches['default'], (LocMemCache, DummyCache))
+
+
+def _user_list_generation(collection, user_id):
+    key = USER_LIST_GENERATION_KEY.format(collection, user_id)
+    generation = cache.get(key)
+    if generation is None:
+        # Start from the clock, so pages cached under a counter that was
+        # evicted are never served again
+        cache.add(key, time.time_ns(), None)
+        generation = cache.get(key, 0)
+    return generation
+
+
+def get_user_list(collection, request, build):
+    """
+    ``(etag, payload)`` for a page of the requesting user's own
+    ``collection``; ``build()`` makes the payload on a miss.
+    """
+    if not shared_cache():
+        payload = build()
+        return make_etag(payload, USER_LIST_CACHE_VERSION), payload
+
+    generation = _user_list_generation(collection, request.user.pk)
+    # The page's URL covers the cursor and page size, and the host in its next link
+    page = hashlib.sha256(request.build_absolute_uri().encode('utf-8')).hexdigest()[:32]
+    key = USER_LIST_CACHE_KEY.format(collection, request.user.pk, generation, page)
+    cached = cache.get(key, version=USER_LIST_CACHE_VERSION)
+    if cached is not None:
+        return cached
+
+    payload = build()
+    cached = (make_etag(payload, USER_LIST_CACHE_VERSION), payload)
+    cache.set(key, cached, USER_LIST_CACHE_TIMEOUT, version=USER_LIST_CACHE_VERSION)
+    return cached
+
+
+def invalidate_user_list(collection, user_id):
+    """Drop every cached page of one user's ``collection``"""
+    if not shared_cache():
+        return
+    key = USER_LIST_GENERATION_KEY.format(collection, user_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), None)
@@ -0,0 +1,172 @@
+"""
+Server-side clustering of confirmed posts for the map.
+
+Confirmed posts are bucketed into a Web Mercator grid at every zoom level
+from ``MIN_ZOOM`` to ``MAX_CLUSTER_ZOOM``. Each ``PostCluster`` row keeps a
+count and coordinate sums, so confirming or removing a post only touches
+one row per zoom level instead of recomputing the whole grid.
+"""
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .geo import MIN_ZOOM, tile_xy
+from .models import Post, PostCluster
+
+# Above this zoom the client shows individual markers (see the bbox query)
+MAX_CLUSTER_ZOOM = 16
+
+# Grid cells per tile edge; 4 gives 64x64 pixel cells on 256 pixel tiles
+CELLS_PER_TILE = 4
+
+
+def cell_for(latitude, longitude, zoom):
+    """Grid cell ``(x, y)`` containing a point at a zoom level"""
+    x, y = tile_xy(latitude, longitude, zoom)
+    return int(x * CELLS_PER_TILE), int(y * CELLS_PER_TILE)
+
+
+def cluster_point(is_confirmed, latitude, longitude):
+    """The point a post contributes to the clusters, or ``None``"""
+    if not is_confirmed or latitude is None or longitude is None:
+        return None
+    return latitude, longitude
+
+
+def _deltas(points, sign):
+    deltas = defaultdict(lambda: [0, 0.0, 0.0])
+    for latitude, longitude in points:
+        for zoom in range(MIN_ZOOM, MAX_CLUSTER_ZOOM + 1):
+            delta = deltas[(zoom, *cell_for(latitude, longitude, zoom))]
+            delta[0] += sign
+            delta[1] += sign * latitude
+            delta[2] += sign * longitude
+    return deltas
+
+
+def _apply(deltas):
+    """Apply per-cell ``[count, latitude_sum, longitude_sum]`` deltas"""
+    if not deltas:
+        return
+    
+    by_zoom = defaultdict(list)
+    for key in deltas:
+        by_zoom[key[0]].append(key)
+    
+    with transaction.atomic():
+        existing = {}
+        for zoom, keys in by_zoom.items():
+            rows = PostCluster.objects.select_for_update().filter(
+                zoom=zoom,
+                cell_x__in={key[1] for key in keys},
+                cell_y__in={key[2] for key in keys},
+            )
+            for row in rows:
+                existing[(row.zoom, row.cell_x, row.cell_y)] = row
+        
+        to_create, to_update, to_delete = {}, [], []
+        # bulk_update() skips auto_now, so updated_at is set here
+        now = timezone.now()
+        for key, (count, latitude_sum, longitude_sum) in deltas.items():
+            row = existing.get(key)
+            if row is None:
+                if count > 0:
+                    to_create[key] = (count, latitude_sum, longitude_sum)
+                continue
+            row.count += count
+            if row.count <= 0:
+                to_delete.append(row.pk)
+                continue
+            row.latitude_sum += latitude_sum
+            row.longitude_sum += longitude_sum
+            row.updated_at = now
+            to_update.append(row)
+        
+        if to_delete:
+            PostCluster.objects.filter(pk__in=to_delete).delete()
+        if to_update:
+            PostCluster.objects.bulk_update(to_update, ['count', 'latitude_sum', 'longitude_sum', 'updated_at'])
+        if to_create:
+            _create_cells(to_create)
+
+
+def _create_cells(deltas):
+    """
+    Add deltas to cells that did not exist when they were locked. Another
+    transaction may create the same cell meanwhile, so empty rows are
+    inserted skipping conflicts and the deltas are then added in place.
+    """
+    PostCluster.objects.bulk_create(
+        [PostCluster(zoom=zoom, cell_x=x, cell_y=y, count=0) for zoom, x, y in deltas],
+        ignore_conflicts=True,
+    )
+    now = timezone.now()
+    for (zoom, x, y), (count, latitude_sum, longitude_sum) in deltas.items():
+        PostCluster.objects.filter(zoom=zoom, cell_x=x, cell_y=y).update(
+            count=F('count') + count,
+            latitude_sum=F('latitude_sum') + latitude_sum,
+            longitude_sum=F('longitude_sum') + longitude_sum,
+            updated_at=now,
+        )
+
+
+def add_points(points):
+    """Add ``(latitude, longitude)`` points of newly confirmed posts"""
+    _apply(_deltas(points, 1))
+
+
+def remove_points(points):
+    """Remove ``(latitude, longitude)`` points of posts no longer confirmed"""
+    _apply(_deltas(points, -1))
+
+
+def move_point(old, new):
+    """Replace the contribution of one post; either side may be ``None``"""
+    if old == new:
+        return
+    deltas = _deltas([old] if old else [], -1)
+    for key, (count, latitude_sum, longitude_sum) in _deltas([new] if new else [], 1).items():
+        delta = deltas[key]
+        delta[0] += count
+        delta[1] += latitude_sum
+        delta[2] += longitude_sum
+    _apply({key: delta for key, delta in deltas.items() if delta[0] or delta[1] or delta[2]})
+
+
+def rebuild():
+    """Recompute every cluster from the confirmed posts; returns the row count"""
+    points = Post.objects.filter(
+        is_confirmed=True, latitude__isnull=False, longitude__isnull=False,
+    ).values_list('latitude', 'longitude')
+    deltas = _deltas(points.iterator(), 1)
+    with transaction.atomic():
+        PostCluster.objects.all().delete()
+        PostCluster.objects.bulk_create(
+            [
+                PostCluster(
+                    zoom=zoom, cell_x=x, cell_y=y, count=count,
+                    latitude_sum=latitude_sum, longitude_sum=longitude_sum,
+                )
+                for (zoom, x, y), (count, latitude_sum, longitude_sum) in deltas.items()
+            ],
+            batch_size=1000,
+        )
+    return len(deltas)
+
+
+def clusters_for(zoom, bbox=None):
+    """Clusters at a zoom level, optionally limited to a bbox"""
+    zoom = min(zoom, MAX_CLUSTER_ZOOM)
+    queryset = PostCluster.objects.filter(zoom=zoom)
+    if bbox is not None:
+        min_lon, min_lat, max_lon, max_lat = bbox
+        min_x, min_y = cell_for(max_lat, min_lon, zoom)
+        max_x, max_y = cell_for(min_lat, max_lon, zoom)
+        queryset = queryset.filter(cell_y__gte=min_y, cell_y__lte=max_y)
+        if min_lon <= max_lon:
+            queryset = queryset.filter(cell_x__gte=min_x, cell_x__lte=max_x)
+        else:
+            queryset = queryset.filter(Q(cell_x__gte=min_x) | Q(cell_x__lte=max_x))
+    return zoom, queryset
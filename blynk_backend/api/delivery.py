@@ -0,0 +1,230 @@
+"""
+Bandwidth-aware delivery of API responses and uploaded media.
+
+``CompressionMiddleware`` compresses JSON (and other text) responses of
+at least ``COMPRESSION_MIN_SIZE`` bytes with the best encoding the
+client accepts: brotli when the ``brotli`` package is installed, gzip
+otherwise. Post lists compress to a fraction of their size, while
+shorter responses are left alone since the encoding overhead would
+outweigh the saving. Streaming responses (event streams, files) are
+never touched.
+
+``serve_media`` serves files under ``MEDIA_ROOT`` in every environment,
+not only with ``DEBUG``. Uploaded files are never overwritten in place,
+so they are sent with a long ``Cache-Control`` lifetime plus an ``ETag``
+and ``Last-Modified`` for cheap revalidation, and a single byte
+``Range`` is honoured so interrupted video downloads resume instead of
+starting over.
+"""
+import mimetypes
+import re
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, parse_http_date_safe
+from django.utils.text import compress_string
+from django.views.decorators.http import require_safe
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Brotli quality for responses compressed on the fly; the top levels cost
+# far more CPU for a few percent smaller output
+BROTLI_QUALITY = 5
+# Like Django's GZipMiddleware, pad gzip output by a random amount to
+# mitigate BREACH
+GZIP_MAX_RANDOM_BYTES = 100
+
+COMPRESSIBLE_TYPES = ('application/json', 'text/', 'application/javascript', 'image/svg+xml')
+
+_BYTE_RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def accepted_encodings(header):
+    """Encodings named in an ``Accept-Encoding`` header, by their q-value"""
+    accepted = {}
+    for item in header.split(','):
+        name, _, params = item.strip().partition(';')
+        quality = 1.0
+        for param in params.split(';'):
+            key, _, value = param.strip().partition('=')
+            if key == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if name:
+            accepted[name.strip().lower()] = quality
+    return accepted
+
+
+def choose_encoding(header):
+    """``'br'``, ``'gzip'`` or ``None`` for an ``Accept-Encoding`` header"""
+    accepted = accepted_encodings(header or '')
+    available = ['br', 'gzip'] if brotli is not None else ['gzip']
+    best, best_quality = None, 0.0
+    for encoding in available:
+        quality = accepted.get(encoding, accepted.get('*', 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def compress(content, encoding):
+    if encoding == 'br':
+        return brotli.compress(content, quality=BROTLI_QUALITY)
+    return compress_string(content, max_random_bytes=GZIP_MAX_RANDOM_BYTES)
+
+
+class CompressionMiddleware:
+    """Negotiated brotli/gzip for buffered text responses above a size threshold"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        return self.process_response(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.process_response(request, await self.get_response(request))
+
+    def process_response(self, request, response):
+        if response.streaming or response.has_header('Content-Encoding'):
+            return response
+        if not response.get('Content-Type', '').startswith(COMPRESSIBLE_TYPES):
+            return response
+        if 'no-transform' in response.get('Cache-Control', ''):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        if len(response.content) < settings.COMPRESSION_MIN_SIZE:
+            return response
+        encoding = choose_encoding(request.META.get('HTTP_ACCEPT_ENCODING'))
+        if encoding is None:
+            return response
+
+        compressed = compress(response.content, encoding)
+        if len(compressed) >= len(response.content):
+            return response
+        response.content = compressed
+        response.headers['Content-Length'] = str(len(compressed))
+        response.headers['Content-Encoding'] = encoding
+        # The compressed bytes differ per encoding, so a strong ETag becomes weak
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        return response
+
+
+class _FileSlice:
+    """``length`` bytes of an open file from its current position"""
+
+    def __init__(self, file, length):
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+def parse_range(header, size):
+    """
+    ``(start, end)`` inclusive for a single byte range, ``None`` to send
+    the whole file (no range, a malformed one, or several ranges).
+    Raises ``ValueError`` if the range cannot be satisfied.
+    """
+    match = _BYTE_RANGE.match(header.strip()) if header else None
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first:
+        if not last:
+            return None
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0 or size == 0:
+            raise ValueError(header)
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size:
+        raise ValueError(header)
+    if start > end:
+        return None
+    return start, end
+
+
+def _range_applies(request, etag, mtime):
+    """``If-Range``: the range holds only if the file is the one the client has"""
+    if_range = request.headers.get('If-Range')
+    if not if_range:
+        return True
+    if if_range.startswith('"'):
+        return if_range == etag
+    modified = parse_http_date_safe(if_range)
+    return modified is not None and modified == mtime
+
+
+@require_safe
+def serve_media(request, path):
+    """A file under ``MEDIA_ROOT`` with caching and ``Range`` support"""
+    fullpath = Path(safe_join(settings.MEDIA_ROOT, path))
+    if not fullpath.is_file():
+        raise Http404('Media file not found')
+
+    stat = fullpath.stat()
+    mtime = int(stat.st_mtime)
+    etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+    headers = {
+        'ETag': etag,
+        'Last-Modified': http_date(mtime),
+        'Cache-Control': f'public, max-age={settings.MEDIA_CACHE_MAX_AGE}',
+        'Accept-Ranges': 'bytes',
+    }
+
+    conditional = get_conditional_response(request, etag=etag, last_modified=mtime)
+    if conditional is not None:
+        for header, value in headers.items():
+            conditional.headers[header] = value
+        return conditional
+
+    content_type = mimetypes.guess_type(fullpath.name)[0] or 'application/octet-stream'
+    try:
+        byte_range = None
+        if _range_applies(request, etag, mtime):
+            byte_range = parse_range(request.headers.get('Range'), stat.st_size)
+    except ValueError:
+        response = HttpResponse(status=416, headers=headers)
+        response.headers['Content-Range'] = f'bytes */{stat.st_size}'
+        return response
+
+    if byte_range is None:
+        return FileResponse(fullpath.open('rb'), content_type=content_type, headers=headers)
+
+    start, end = byte_range
+    file = fullpath.open('rb')
+    file.seek(start)
+    response = FileResponse(_FileSlice(file, end - start + 1), status=206, content_type=content_type, headers=headers)
+    response.headers['Content-Length'] = str(end - start + 1)
+    response.headers['Content-Range'] = f'bytes {start}-{end}/{stat.st_size}'
+    return response
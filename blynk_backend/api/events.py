@@ -0,0 +1,177 @@
+"""
+Post approval events pushed to map clients.
+
+Approving, unapproving or deleting a post publishes an event (after the
+transaction commits) to the broker named by ``EVENT_BROKER``. The
+server-sent events stream in ``async_views`` subscribes to it, so map
+clients hear about changes instead of polling ``/api/approved-posts/``.
+
+``InProcessBroker`` only reaches subscribers in the publishing process,
+so it suits a single worker. ``RedisBroker`` relays events through Redis
+pub/sub to every worker on every node. Other brokers subclass
+``InProcessBroker`` and override ``publish`` to hand events to their
+transport, then call ``dispatch`` wherever events arrive.
+"""
+import asyncio
+import json
+import logging
+import threading
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+from .serializers import MapPostSerializer
+
+logger = logging.getLogger(__name__)
+
+POST_APPROVED = 'post.approved'
+POST_UNAPPROVED = 'post.unapproved'
+POST_DELETED = 'post.deleted'
+
+# Events a subscriber may fall behind by before its stream is closed
+SUBSCRIBER_QUEUE_SIZE = 100
+
+
+class Subscription:
+    """Queue of events for one stream, fed from any thread"""
+
+    def __init__(self, broker, maxsize=SUBSCRIBER_QUEUE_SIZE):
+        self.broker = broker
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize)
+        self.overflowed = False
+
+    def _put(self, event):
+        if self.queue.full():
+            # The client can't keep up; end its stream so it reconnects and reloads
+            self.overflowed = True
+        else:
+            self.queue.put_nowait(event)
+
+    def deliver(self, event):
+        self.loop.call_soon_threadsafe(self._put, event)
+
+    async def get(self):
+        """The next event, or ``None`` once the subscriber has overflowed"""
+        if self.overflowed:
+            return None
+        event = await self.queue.get()
+        return None if self.overflowed else event
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class InProcessBroker:
+    """Fans events out to the subscribers of this process"""
+
+    def __init__(self):
+        self._subscriptions = set()
+        self._lock = threading.Lock()
+
+    def subscribe(self):
+        """Subscribe from async code; ``close()`` the subscription when done"""
+        subscription = Subscription(self)
+        with self._lock:
+            self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def dispatch(self, event):
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+        for subscription in subscriptions:
+            try:
+                subscription.deliver(event)
+            except RuntimeError:
+                # Its event loop has shut down
+                self.unsubscribe(subscription)
+
+    def publish(self, event):
+        self.dispatch(event)
+
+
+class RedisBroker(InProcessBroker):
+    """
+    Publishes through Redis pub/sub. Each process keeps one subscription
+    to the channel, opened with its first subscriber, and dispatches what
+    arrives to its local subscribers.
+    """
+    channel = 'beulynk:events'
+    reconnect_delay = 1.0
+
+    def __init__(self, url=None):
+        super().__init__()
+        self.url = url or settings.REDIS_URL
+        self._client = None
+        self._listener = None
+
+    def publish(self, event):
+        if self._client is None:
+            import redis
+            self._client = redis.Redis.from_url(self.url)
+        self._client.publish(self.channel, json.dumps(event))
+
+    def subscribe(self):
+        subscription = super().subscribe()
+        if self._listener is None or self._listener.done():
+            self._listener = asyncio.get_running_loop().create_task(self._listen())
+        return subscription
+
+    async def _listen(self):
+        import redis.asyncio
+        while True:
+            try:
+                client = redis.asyncio.Redis.from_url(self.url)
+                async with client.pubsub() as pubsub:
+                    await pubsub.subscribe(self.channel)
+                    async for message in pubsub.listen():
+                        if message['type'] == 'message':
+                            self.dispatch(json.loads(message['data']))
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception('Lost the event channel, reconnecting')
+                await asyncio.sleep(self.reconnect_delay)
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    with _broker_lock:
+        if _broker is None:
+            _broker = import_string(settings.EVENT_BROKER)()
+    return _broker
+
+
+def post_event(event_type, post):
+    return {'type': event_type, 'post': MapPostSerializer(post).data}
+
+
+def publish(events):
+    """Publish ``events`` once the current transaction commits"""
+    events = list(events)
+    if not events:
+        return
+
+    def send():
+        broker = get_broker()
+        for event in events:
+            try:
+                broker.publish(event)
+            except Exception:
+                # Push is best effort; clients reconcile through the API
+                logger.exception('Could not publish %s', event['type'])
+
+    transaction.on_commit(send)
+
+
+def publish_posts(event_type, posts):
+    publish(post_event(event_type, post) for post in posts)
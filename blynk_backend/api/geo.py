@@ -0,0 +1,217 @@
+"""Geographic helpers for map and proximity queries"""
+import math
+
+from django.db.models import Q
+
+MIN_ZOOM = 0
+MAX_ZOOM = 22
+
+# Web map tiles are 256 pixels wide at every zoom level
+TILE_SIZE = 256
+
+# Web Mercator cannot represent the poles; clamp to the usual tile limit
+MAX_MERCATOR_LAT = 85.05112878
+
+
+def parse_bbox(value):
+    """
+    Parse a ``minLon,minLat,maxLon,maxLat`` string into a tuple of floats.
+
+    A ``minLon`` greater than ``maxLon`` is allowed and means the box
+    crosses the antimeridian. Raises ``ValueError`` for malformed input.
+    """
+    parts = value.split(',')
+    if len(parts) != 4:
+        raise ValueError('bbox must be minLon,minLat,maxLon,maxLat')
+
+    try:
+        min_lon, min_lat, max_lon, max_lat = (float(part) for part in parts)
+    except ValueError:
+        raise ValueError('bbox values must be numbers')
+
+    if any(math.isnan(v) for v in (min_lon, min_lat, max_lon, max_lat)):
+        raise ValueError('bbox values must be numbers')
+    if not (-180 <= min_lon <= 180 and -180 <= max_lon <= 180):
+        raise ValueError('bbox longitudes must be between -180 and 180')
+    if not (-90 <= min_lat <= 90 and -90 <= max_lat <= 90):
+        raise ValueError('bbox latitudes must be between -90 and 90')
+    if min_lat > max_lat:
+        raise ValueError('bbox minLat must not be greater than maxLat')
+
+    return min_lon, min_lat, max_lon, max_lat
+
+
+def parse_zoom(value):
+    """Parse a map zoom level, clamped to the supported range"""
+    try:
+        zoom = int(value)
+    except (TypeError, ValueError):
+        raise ValueError('zoom must be an integer')
+    return max(MIN_ZOOM, min(MAX_ZOOM, zoom))
+
+
+def parse_viewport(params):
+    """``(bbox, zoom)`` from map query parameters; zoom may be ``None``"""
+    bbox = parse_bbox(params['bbox'])
+    zoom = params.get('zoom')
+    return bbox, (parse_zoom(zoom) if zoom is not None else None)
+
+
+def bbox_q(min_lon, min_lat, max_lon, max_lat):
+    """Build a filter matching rows whose coordinates fall inside the box"""
+    q = Q(latitude__gte=min_lat, latitude__lte=max_lat)
+    if min_lon <= max_lon:
+        return q & Q(longitude__gte=min_lon, longitude__lte=max_lon)
+    # Box crosses the antimeridian: split it into two longitude ranges
+    return q & (Q(longitude__gte=min_lon) | Q(longitude__lte=max_lon))
+
+
+def bbox_contains(bbox, latitude, longitude):
+    """Python counterpart of ``bbox_q`` for a single point"""
+    min_lon, min_lat, max_lon, max_lat = bbox
+    if latitude is None or longitude is None or not min_lat <= latitude <= max_lat:
+        return False
+    if min_lon <= max_lon:
+        return min_lon <= longitude <= max_lon
+    return longitude >= min_lon or longitude <= max_lon
+
+
+def coordinate_precision(zoom):
+    """
+    Number of decimal places needed to place a marker to within one
+    pixel at the given zoom level. Extra digits are wasted bytes.
+    """
+    pixels_per_degree = TILE_SIZE * (2 ** zoom) / 360.0
+    return max(1, math.ceil(math.log10(pixels_per_degree)))
+
+
+def tile_xy(latitude, longitude, zoom):
+    """
+    Fractional Web Mercator tile coordinates of a point at a zoom level.
+    ``x`` grows eastwards and ``y`` southwards, both in ``[0, 2**zoom)``.
+    """
+    n = 2 ** zoom
+    latitude = max(-MAX_MERCATOR_LAT, min(MAX_MERCATOR_LAT, latitude))
+    sin_lat = math.sin(math.radians(latitude))
+    x = (longitude + 180.0) / 360.0 * n
+    y = (0.5 - math.log((1 + sin_lat) / (1 - sin_lat)) / (4 * math.pi)) * n
+    return min(max(x, 0.0), n - 1e-9), min(max(y, 0.0), n - 1e-9)
+
+
+EARTH_RADIUS_KM = 6371.0088
+
+GEOHASH_ALPHABET = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+# Stored precision; 9 characters is a cell of roughly 5m x 5m
+GEOHASH_PRECISION = 9
+
+
+def geohash_encode(latitude, longitude, precision=GEOHASH_PRECISION):
+    """Encode a point as a geohash string"""
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    bit_count = 0
+    even = True
+    while len(chars) < precision:
+        rng, value = (lon_range, longitude) if even else (lat_range, latitude)
+        mid = (rng[0] + rng[1]) / 2
+        if value >= mid:
+            bits = (bits << 1) | 1
+            rng[0] = mid
+        else:
+            bits <<= 1
+            rng[1] = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(GEOHASH_ALPHABET[bits])
+            bits = 0
+            bit_count = 0
+    return ''.join(chars)
+
+
+def geohash_cell_size(precision):
+    """``(height, width)`` in degrees of a geohash cell"""
+    lon_bits = (5 * precision + 1) // 2
+    lat_bits = (5 * precision) // 2
+    return 180.0 / (2 ** lat_bits), 360.0 / (2 ** lon_bits)
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Great-circle distance between two points in kilometres"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lon2 - lon1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def radius_bounds(latitude, longitude, radius_km):
+    """
+    Bounding box ``(min_lat, min_lon, max_lat, max_lon)`` of a circle.
+    Longitudes are not wrapped; near the poles the box spans every longitude.
+    """
+    d_lat = math.degrees(radius_km / EARTH_RADIUS_KM)
+    min_lat = max(-90.0, latitude - d_lat)
+    max_lat = min(90.0, latitude + d_lat)
+    if min_lat <= -90.0 or max_lat >= 90.0:
+        return min_lat, -180.0, max_lat, 180.0
+    d_lon = math.degrees(radius_km / (EARTH_RADIUS_KM * math.cos(math.radians(latitude))))
+    if d_lon >= 180.0:
+        return min_lat, -180.0, max_lat, 180.0
+    return min_lat, longitude - d_lon, max_lat, longitude + d_lon
+
+
+def geohash_prefixes(latitude, longitude, radius_km):
+    """
+    Geohash prefixes whose cells together cover a circle.
+
+    The precision is the finest one whose cells are at least as large as
+    the circle's bounding box, so at most a 2x2 (rarely 3x3) block of
+    cells is returned. An empty set means no prefix narrows the search.
+    """
+    min_lat, min_lon, max_lat, max_lon = radius_bounds(latitude, longitude, radius_km)
+    precision = 0
+    for candidate in range(GEOHASH_PRECISION, 0, -1):
+        height, width = geohash_cell_size(candidate)
+        if height >= max_lat - min_lat and width >= max_lon - min_lon:
+            precision = candidate
+            break
+    if precision == 0:
+        return set()
+
+    height, width = geohash_cell_size(precision)
+    lats = [min_lat + i * height for i in range(int((max_lat - min_lat) / height) + 1)] + [max_lat]
+    lons = [min_lon + i * width for i in range(int((max_lon - min_lon) / width) + 1)] + [max_lon]
+    prefixes = set()
+    for lat in lats:
+        for lon in lons:
+            lon = (lon + 180.0) % 360.0 - 180.0
+            prefixes.add(geohash_encode(min(lat, 90.0), lon, precision))
+    return prefixes
+
+
+def geohash_prefix_end(prefix):
+    """
+    Smallest geohash string greater than every string starting with
+    ``prefix``, or ``None`` if there is none. Only alphanumerics are used
+    so the bound sorts the same under any database collation.
+    """
+    prefix = prefix.rstrip(GEOHASH_ALPHABET[-1])
+    if not prefix:
+        return None
+    return prefix[:-1] + GEOHASH_ALPHABET[GEOHASH_ALPHABET.index(prefix[-1]) + 1]
+
+
+def geohash_prefix_q(prefixes, field='geohash'):
+    """Filter matching any of the prefixes as index-friendly range scans"""
+    q = Q()
+    for prefix in sorted(prefixes):
+        bounds = {f'{field}__gte': prefix}
+        end = geohash_prefix_end(prefix)
+        if end is not None:
+            bounds[f'{field}__lt'] = end
+        q |= Q(**bounds)
+    return q
@@ -0,0 +1,55 @@
+"""
+Password hashers whose cost comes from settings.
+
+Each class keeps the algorithm name of the Django hasher it extends, so
+stored hashes stay valid. When a cost setting changes, ``must_update``
+reports old hashes as outdated and Django rehashes them with the new
+cost on the user's next successful login.
+"""
+from django.conf import settings
+from django.contrib.auth import hashers
+
+
+def _setting(name, default):
+    value = getattr(settings, name, None)
+    return default if value is None else value
+
+
+class PBKDF2PasswordHasher(hashers.PBKDF2PasswordHasher):
+    """PBKDF2-SHA256 with ``PASSWORD_PBKDF2_ITERATIONS`` iterations"""
+
+    @property
+    def iterations(self):
+        return _setting('PASSWORD_PBKDF2_ITERATIONS', hashers.PBKDF2PasswordHasher.iterations)
+
+
+class Argon2PasswordHasher(hashers.Argon2PasswordHasher):
+    """Argon2id with ``PASSWORD_ARGON2_*`` costs; needs ``argon2-cffi``"""
+
+    @property
+    def time_cost(self):
+        return _setting('PASSWORD_ARGON2_TIME_COST', hashers.Argon2PasswordHasher.time_cost)
+
+    @property
+    def memory_cost(self):
+        return _setting('PASSWORD_ARGON2_MEMORY_COST', hashers.Argon2PasswordHasher.memory_cost)
+
+    @property
+    def parallelism(self):
+        return _setting('PASSWORD_ARGON2_PARALLELISM', hashers.Argon2PasswordHasher.parallelism)
+
+
+class BCryptSHA256PasswordHasher(hashers.BCryptSHA256PasswordHasher):
+    """bcrypt with ``PASSWORD_BCRYPT_ROUNDS`` rounds; needs ``bcrypt``"""
+
+    @property
+    def rounds(self):
+        return _setting('PASSWORD_BCRYPT_ROUNDS', hashers.BCryptSHA256PasswordHasher.rounds)
+
+
+class ScryptPasswordHasher(hashers.ScryptPasswordHasher):
+    """scrypt with ``PASSWORD_SCRYPT_WORK_FACTOR`` as its N parameter"""
+
+    @property
+    def work_factor(self):
+        return _setting('PASSWORD_SCRYPT_WORK_FACTOR', hashers.ScryptPasswordHasher.work_factor)
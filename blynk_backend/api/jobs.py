@@ -0,0 +1,217 @@
+"""
+Durable queue of background media work, kept in the database.
+
+Creating a post only stores its uploads and enqueues ``MediaJob`` rows
+for the slow part (photo variants, video transcoding); the post is
+marked ``processing`` until its jobs finish. The ``process_media_jobs``
+command claims due jobs and runs them in a process pool, so CPU-heavy
+media work neither blocks requests nor shares the GIL with the web
+workers, and needs nothing but the configured database.
+
+A job is claimed with an ``UPDATE`` conditional on it still being
+queued (after ``SELECT ... FOR UPDATE SKIP LOCKED`` where supported, as
+in ``triage``), so several workers can share the queue. Failed attempts
+are retried with exponential backoff up to ``MAX_ATTEMPTS``; jobs whose
+worker died are requeued once their lease (``JOB_LEASE``) expires.
+Finished jobs are deleted; failed ones stay for inspection.
+
+Deployments without a worker (``MEDIA_JOBS_INLINE``, the default) run
+the queue on a background thread of the web process instead, started
+when a job is enqueued and kept alive while retries are pending. The
+jobs still go through the table, so a worker started later, or one
+running alongside, picks up exactly where the thread left off.
+"""
+import logging
+import os
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.db.models import F, Min
+from django.utils import timezone
+
+from . import media
+from .models import MediaJob, Post
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 3
+# Delay before the first retry; doubled for each later one
+RETRY_DELAY = timedelta(seconds=30)
+# A running job not finished within this time is assumed lost
+JOB_LEASE = timedelta(minutes=30)
+# Longest wait, in seconds, of the inline runner for a retry to fall due
+INLINE_POLL_INTERVAL = 5
+
+
+def _photo_variants(post):
+    media.generate_photo_variants(post)
+
+
+def _video_transcode(post):
+    media.generate_video_variants(post)
+
+
+# Work done for each job kind, given the post
+HANDLERS = {
+    'photo_variants': _photo_variants,
+    'video_transcode': _video_transcode,
+}
+
+
+def post_job_kinds(post, fields=('photo', 'video')):
+    """The jobs a post's uploads in ``fields`` need"""
+    kinds = []
+    if 'photo' in fields and post.photo:
+        kinds.append('photo_variants')
+    if 'video' in fields and post.video:
+        kinds.append('video_transcode')
+    return kinds
+
+
+def enqueue(post, kinds):
+    """
+    Queue ``kinds`` of work on a post and mark it processing. Earlier
+    failed jobs of the same kinds are replaced.
+    """
+    kinds = [kind for kind in kinds if kind in HANDLERS]
+    if not kinds:
+        return
+    with transaction.atomic():
+        MediaJob.objects.filter(post=post, kind__in=kinds, status='failed').delete()
+        queued = set(
+            MediaJob.objects.filter(post=post, kind__in=kinds, status='queued').values_list('kind', flat=True)
+        )
+        MediaJob.objects.bulk_create([MediaJob(post=post, kind=kind) for kind in kinds if kind not in queued])
+        # queryset.update() skips auto_now, so updated_at is set here for sync
+        Post.objects.filter(pk=post.pk).update(media_status='processing', updated_at=timezone.now())
+        if settings.MEDIA_JOBS_INLINE:
+            transaction.on_commit(run_inline)
+    post.media_status = 'processing'
+
+
+def enqueue_post_media(post):
+    enqueue(post, post_job_kinds(post))
+
+
+def claim(worker, limit):
+    """Mark up to ``limit`` due jobs as running for ``worker``; returns their ids"""
+    claimed = []
+    while len(claimed) < limit:
+        now = timezone.now()
+        with transaction.atomic():
+            due = MediaJob.objects.filter(status='queued', run_after__lte=now).order_by('run_after', 'id')
+            if connection.features.has_select_for_update_skip_locked:
+                due = due.select_for_update(skip_locked=True)
+            pk = due.values_list('id', flat=True).first()
+            if pk is None:
+                break
+            updated = MediaJob.objects.filter(pk=pk, status='queued').update(
+                status='running', locked_by=worker, locked_at=now, attempts=F('attempts') + 1, updated_at=now
+            )
+        if updated:
+            claimed.append(pk)
+    return claimed
+
+
+def requeue_lost(now=None, worker=None):
+    """
+    Put back jobs whose lease expired, e.g. after a worker was killed, or
+    all running jobs of ``worker`` once it knows they were lost; returns
+    how many. Jobs out of attempts are marked failed instead.
+    """
+    now = now or timezone.now()
+    if worker is None:
+        lost = MediaJob.objects.filter(status='running', locked_at__lt=now - JOB_LEASE)
+        error = 'Lease expired'
+    else:
+        lost = MediaJob.objects.filter(status='running', locked_by=worker)
+        error = 'Worker process died'
+    exhausted = dict(lost.filter(attempts__gte=MAX_ATTEMPTS).values_list('id', 'post_id'))
+    failed = MediaJob.objects.filter(pk__in=exhausted, status='running').update(
+        status='failed', last_error=error, updated_at=now
+    )
+    requeued = lost.update(status='queued', run_after=now, updated_at=now)
+    for post_id in set(exhausted.values()):
+        settle_post(post_id)
+    return failed + requeued
+
+
+def settle_post(post_id):
+    """Mark a post ready, or failed, once none of its jobs is pending"""
+    jobs = MediaJob.objects.filter(post_id=post_id)
+    if jobs.filter(status__in=['queued', 'running']).exists():
+        return
+    media_status = 'failed' if jobs.filter(status='failed').exists() else 'ready'
+    Post.objects.filter(pk=post_id).update(media_status=media_status, updated_at=timezone.now())
+
+
+def _record_failure(job, error):
+    now = timezone.now()
+    if job.attempts >= MAX_ATTEMPTS:
+        changes = {'status': 'failed'}
+    else:
+        changes = {'status': 'queued', 'run_after': now + RETRY_DELAY * 2 ** (job.attempts - 1)}
+    MediaJob.objects.filter(pk=job.pk, status='running').update(
+        last_error=f'{type(error).__name__}: {error}'[:2000], updated_at=now, **changes
+    )
+
+
+def run_job(job_id):
+    """Run one claimed job; called in a worker process"""
+    close_old_connections()
+    try:
+        job = MediaJob.objects.select_related('post').filter(pk=job_id, status='running').first()
+        if job is None:
+            # Its post was deleted meanwhile
+            return
+        try:
+            HANDLERS[job.kind](job.post)
+        except Exception as e:
+            logger.exception('Media job %s (%s) failed for post %s', job.pk, job.kind, job.post_id)
+            _record_failure(job, e)
+        else:
+            MediaJob.objects.filter(pk=job.pk).delete()
+        settle_post(job.post_id)
+    finally:
+        close_old_connections()
+
+
+def run_pending(worker):
+    """Run jobs one at a time until none is queued, waiting for retries to fall due"""
+    while True:
+        requeue_lost()
+        claimed = claim(worker, 1)
+        if claimed:
+            run_job(claimed[0])
+            continue
+        next_run = MediaJob.objects.filter(status='queued').aggregate(next_run=Min('run_after'))['next_run']
+        if next_run is None:
+            return
+        time.sleep(min(max((next_run - timezone.now()).total_seconds(), 0), INLINE_POLL_INTERVAL))
+
+
+_inline_executor = None
+_inline_lock = threading.Lock()
+
+
+def _run_inline():
+    try:
+        run_pending(f'{socket.gethostname()}:{os.getpid()}:inline')
+    except Exception:
+        logger.exception('Inline media job runner failed')
+    finally:
+        connection.close()
+
+
+def run_inline():
+    """Drain the queue on this process's background thread"""
+    global _inline_executor
+    with _inline_lock:
+        if _inline_executor is None:
+            _inline_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='media-jobs')
+    _inline_executor.submit(_run_inline)
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+from api.models import Post
+
+class Command(BaseCommand):
+    help = 'Populate the geohash of posts saved before it was computed'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--all', action='store_true', help='Recompute every post, not only missing ones')
+
+    def handle(self, *args, **options):
+        queryset = Post.objects.filter(latitude__isnull=False, longitude__isnull=False)
+        if not options['all']:
+            queryset = queryset.filter(geohash__isnull=True)
+
+        batch = []
+        updated = 0
+        for post in queryset.only('id', 'latitude', 'longitude').iterator(chunk_size=options['batch_size']):
+            post.geohash = post.compute_geohash()
+            batch.append(post)
+            if len(batch) >= options['batch_size']:
+                updated += Post.objects.bulk_update(batch, ['geohash'])
+                batch = []
+        if batch:
+            updated += Post.objects.bulk_update(batch, ['geohash'])
+
+        self.stdout.write(self.style.SUCCESS(f'Updated geohash for {updated} posts'))
@@ -0,0 +1,34 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from PIL import Image, UnidentifiedImageError
+from api.media import generate_photo_variants
+from api.models import Post
+
+class Command(BaseCommand):
+    help = 'Generate downsized photo variants for posts that do not have them'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Regenerate variants for every post with a photo')
+        parser.add_argument('--workers', type=int, default=4)
+
+    def handle(self, *args, **options):
+        queryset = Post.objects.exclude(photo='').exclude(photo__isnull=True)
+        if not options['all']:
+            queryset = queryset.filter(photo_variants={})
+        posts = list(queryset.only('id', 'photo', 'photo_variants'))
+
+        def process(post):
+            try:
+                return bool(generate_photo_variants(post))
+            except (OSError, UnidentifiedImageError, Image.DecompressionBombError) as e:
+                self.stderr.write(f'Post {post.pk}: {e}')
+                return False
+            finally:
+                close_old_connections()
+
+        with ThreadPoolExecutor(max_workers=max(1, options['workers'])) as executor:
+            done = sum(executor.map(process, posts))
+
+        self.stdout.write(self.style.SUCCESS(f'Generated photo variants for {done} of {len(posts)} posts'))
@@ -23,10 +23,7 @@ class Command(BaseCommand):
             facebook_url="https://facebook.com/beulynk",
             twitter_url="https://twitter.com/beulynk",
             instagram_url="https://instagram.com/beulynk",
-            linkedin_url="https://linkedin.com/company/beulynk",
-            lives_impacted=10000,
-            active_donors=500,
-            communities_served=50
+            linkedin_url="https://linkedin.com/company/beulynk"
         )
 
         self.stdout.write(self.style.SUCCESS(f'Successfully created NGO information: {ngo_info.name}'))
@@ -0,0 +1,57 @@
+import multiprocessing
+import os
+import socket
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+import django
+from django.core.management.base import BaseCommand
+from api import jobs
+
+class Command(BaseCommand):
+    help = 'Run queued media jobs (photo variants and other post media work) in a process pool'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=2, help='Worker processes')
+        parser.add_argument(
+            '--poll-interval', type=float, default=2.0,
+            help='Seconds between checks for new jobs while the queue is empty',
+        )
+        parser.add_argument('--burst', action='store_true', help='Exit once no job is due')
+
+    def handle(self, *args, **options):
+        workers = max(1, options['workers'])
+        name = f'{socket.gethostname()}:{os.getpid()}'
+        done = 0
+        # Spawned, not forked, so no process inherits this one's database connection
+        context = multiprocessing.get_context('spawn')
+        pool = ProcessPoolExecutor(workers, mp_context=context, initializer=django.setup)
+        running = set()
+        try:
+            while True:
+                jobs.requeue_lost()
+                claimed = jobs.claim(name, workers - len(running))
+                running.update(pool.submit(jobs.run_job, pk) for pk in claimed)
+                if not running:
+                    if options['burst']:
+                        break
+                    time.sleep(options['poll_interval'])
+                    continue
+                finished, running = wait(running, timeout=options['poll_interval'], return_when=FIRST_COMPLETED)
+                try:
+                    for future in finished:
+                        future.result()
+                        done += 1
+                except BrokenProcessPool as e:
+                    # A worker process died (e.g. killed for memory), taking the
+                    # whole pool with it: start a new one and put back its jobs
+                    self.stderr.write(f'Media job pool broke, restarting it: {e}')
+                    pool.shutdown(wait=False, cancel_futures=True)
+                    running = set()
+                    jobs.requeue_lost(worker=name)
+                    pool = ProcessPoolExecutor(workers, mp_context=context, initializer=django.setup)
+        finally:
+            pool.shutdown()
+
+        self.stdout.write(self.style.SUCCESS(f'Ran {done} media jobs'))
@@ -0,0 +1,9 @@
+from django.core.management.base import BaseCommand
+from api.uploads import purge_stale_uploads
+
+class Command(BaseCommand):
+    help = 'Delete unfinished chunked video uploads that have expired'
+
+    def handle(self, *args, **kwargs):
+        count = purge_stale_uploads()
+        self.stdout.write(self.style.SUCCESS(f'Purged {count} stale uploads'))
@@ -0,0 +1,9 @@
+from django.core.management.base import BaseCommand
+from api.sync import purge_tombstones
+
+class Command(BaseCommand):
+    help = 'Delete delta-sync tombstones older than the retention period'
+
+    def handle(self, *args, **kwargs):
+        count = purge_tombstones()
+        self.stdout.write(self.style.SUCCESS(f'Purged {count} tombstones'))
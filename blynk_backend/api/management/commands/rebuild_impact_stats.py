@@ -0,0 +1,9 @@
+from django.core.management.base import BaseCommand
+from api import stats
+
+class Command(BaseCommand):
+    help = 'Recompute the impact statistics from donations, help requests and confirmed posts'
+
+    def handle(self, *args, **kwargs):
+        count = stats.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {count} impact counters'))
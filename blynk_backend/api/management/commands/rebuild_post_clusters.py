@@ -0,0 +1,9 @@
+from django.core.management.base import BaseCommand
+from api import clustering
+
+class Command(BaseCommand):
+    help = 'Recompute the precomputed map clusters from confirmed posts'
+
+    def handle(self, *args, **kwargs):
+        count = clustering.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {count} post clusters'))
@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from api.authentication import sweep_tokens
+from api.sync import purge_tombstones
+from api.uploads import purge_stale_uploads
+
+class Command(BaseCommand):
+    help = 'Run the periodic cleanups: expired device tokens, stale chunked uploads and old sync tombstones'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval', type=int, default=None,
+            help='Keep running and clean up every INTERVAL seconds',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            try:
+                self.run_once()
+            except Exception as e:
+                if not options['interval']:
+                    raise
+                # A database hiccup should not end the loop; the next run retries
+                self.stderr.write(f'Maintenance failed: {e}')
+            if not options['interval']:
+                return
+            close_old_connections()
+            time.sleep(options['interval'])
+
+    def run_once(self):
+        expired, excess = sweep_tokens()
+        uploads = purge_stale_uploads()
+        tombstones = purge_tombstones()
+        self.stdout.write(self.style.SUCCESS(
+            f'Deleted {expired} expired and {excess} excess device tokens, '
+            f'{uploads} stale uploads and {tombstones} tombstones'
+        ))
@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand
+from api.authentication import sweep_tokens
+
+class Command(BaseCommand):
+    help = 'Delete expired device tokens and those beyond the per-user device limit'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval', type=int, default=None,
+            help='Keep running and sweep every INTERVAL seconds',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            expired, excess = sweep_tokens()
+            self.stdout.write(self.style.SUCCESS(
+                f'Deleted {expired} expired and {excess} excess device tokens'
+            ))
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
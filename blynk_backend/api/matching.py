@@ -0,0 +1,272 @@
+"""
+Matching approved volunteers to help requests.
+
+Volunteers' free-text ``skills`` are normalized into tags (the help
+request categories plus a few cross-cutting ones such as ``transport``)
+and kept in an in-memory inverted index from tag to volunteer. A help
+request is tagged from its category, title and description, so ranking
+it only scores the volunteers sharing at least one tag instead of every
+volunteer. Candidates are scored on tag overlap (the request's category
+counts most), how much of the week their ``availability`` covers, and
+distance when both sides have a location.
+
+Each worker keeps its own ``MatchIndex``. Saves and deletes in the
+worker update it at once (see ``signals.py``); changes made by other
+workers are read incrementally every ``MATCH_REFRESH_INTERVAL`` seconds
+through the ``updated_at`` index and the delta sync tombstones. Ranked
+results are cached per help request and dropped only when a volunteer
+sharing one of its tags changes, or the request's own tags or location
+change.
+"""
+import heapq
+import re
+import threading
+import time
+from collections import OrderedDict, defaultdict, namedtuple
+from datetime import timedelta
+
+from django.utils import timezone
+
+from .geo import haversine_km
+from .models import VolunteerRequest, Tombstone
+
+# Tags and the words (or two-word phrases) in free text that imply them.
+# The first six are the help request categories.
+SKILL_TAGS = {
+    'medical': (
+        'medical', 'medicine', 'doctor', 'nurse', 'nursing', 'paramedic', 'first aid', 'emt',
+        'health', 'healthcare', 'pharmacist', 'pharmacy', 'caregiver', 'caregiving', 'midwife',
+    ),
+    'food': (
+        'food', 'cook', 'cooking', 'chef', 'kitchen', 'meal', 'meals', 'nutrition', 'baking',
+        'catering', 'groceries', 'hunger',
+    ),
+    'education': (
+        'education', 'teach', 'teacher', 'teaching', 'tutor', 'tutoring', 'mentor', 'mentoring',
+        'literacy', 'school', 'coaching', 'training',
+    ),
+    'shelter': (
+        'shelter', 'housing', 'construction', 'carpentry', 'carpenter', 'building', 'builder',
+        'plumbing', 'plumber', 'electrician', 'electrical', 'roofing', 'repair', 'repairs',
+    ),
+    'financial': (
+        'financial', 'finance', 'accounting', 'accountant', 'bookkeeping', 'budgeting', 'budget',
+        'fundraising', 'banking', 'tax', 'taxes',
+    ),
+    'other': (),
+    'transport': ('transport', 'driver', 'driving', 'delivery', 'deliveries', 'logistics'),
+    'counseling': (
+        'counseling', 'counselling', 'counselor', 'counsellor', 'psychology', 'psychologist',
+        'therapy', 'therapist', 'social work', 'trauma',
+    ),
+    'language': ('translation', 'translator', 'interpreter', 'interpreting', 'sign language'),
+}
+
+_TAG_BY_PHRASE = {phrase: tag for tag, phrases in SKILL_TAGS.items() for phrase in phrases}
+_WORD = re.compile(r'[a-z]+')
+
+# Days of the week (Monday is 0) named by availability text
+_DAYS = {
+    'monday': 0, 'mon': 0, 'tuesday': 1, 'tue': 1, 'tues': 1, 'wednesday': 2, 'wed': 2,
+    'thursday': 3, 'thu': 3, 'thur': 3, 'thurs': 3, 'friday': 4, 'fri': 4,
+    'saturday': 5, 'sat': 5, 'sunday': 6, 'sun': 6,
+}
+_DAY_GROUPS = {
+    'weekday': range(5), 'weekdays': range(5), 'weekend': (5, 6), 'weekends': (5, 6),
+    'anytime': range(7), 'everyday': range(7), 'daily': range(7), 'always': range(7),
+    'flexible': range(7), 'fulltime': range(7),
+}
+_DAY_RANGE = re.compile(r'([a-z]+)\s*(?:-|to|through|till|until)\s*([a-z]+)')
+# Assumed coverage of availability text that names no days
+UNKNOWN_AVAILABILITY = 0.5
+
+# Score of a shared tag, of the request's category, of full-week
+# availability, and of a volunteer on the spot (falling to nothing at
+# MATCH_RADIUS_KM)
+TAG_WEIGHT = 1.0
+CATEGORY_WEIGHT = 3.0
+AVAILABILITY_WEIGHT = 1.0
+DISTANCE_WEIGHT = 2.0
+MATCH_RADIUS_KM = 50
+
+MATCH_REFRESH_INTERVAL = 30
+# Re-read this far back on refresh, for writes that committed late
+MATCH_SETTLE_TIME = timedelta(seconds=5)
+# Help requests whose ranked results are cached, and matches kept for each
+MATCH_CACHE_SIZE = 1000
+MATCH_CACHE_DEPTH = 100
+
+Volunteer = namedtuple('Volunteer', 'id user_id tags availability latitude longitude')
+Match = namedtuple('Match', 'volunteer_id score tags distance_km')
+
+
+def skill_tags(*texts):
+    """Normalized tags found in free text"""
+    tags = set()
+    for text in texts:
+        words = _WORD.findall((text or '').lower())
+        tags.update(_TAG_BY_PHRASE[word] for word in words if word in _TAG_BY_PHRASE)
+        for phrase in map(' '.join, zip(words, words[1:])):
+            if phrase in _TAG_BY_PHRASE:
+                tags.add(_TAG_BY_PHRASE[phrase])
+    return frozenset(tags)
+
+
+def availability_score(text):
+    """Share of the week covered by availability text, from 0 to 1"""
+    text = (text or '').lower().replace('full time', 'fulltime').replace('any time', 'anytime')
+    text = text.replace('every day', 'everyday').replace('24/7', 'anytime')
+    days = set()
+    for start, end in _DAY_RANGE.findall(text):
+        if start in _DAYS and end in _DAYS:
+            first, last = _DAYS[start], _DAYS[end]
+            days.update(day % 7 for day in range(first, last + 1 if last >= first else last + 8))
+    for word in _WORD.findall(text):
+        days.update(_DAY_GROUPS.get(word, ()))
+        if word in _DAYS:
+            days.add(_DAYS[word])
+    return len(days) / 7 if days else UNKNOWN_AVAILABILITY
+
+
+def request_tags(help_request):
+    return skill_tags(help_request.category, help_request.title, help_request.description)
+
+
+def _volunteer(pk, user_id, skills, availability, latitude, longitude):
+    return Volunteer(pk, user_id, skill_tags(skills), availability_score(availability), latitude, longitude)
+
+
+class MatchIndex:
+    """Approved volunteers by tag, with a cache of ranked results per help request"""
+
+    def __init__(self, refresh_interval=MATCH_REFRESH_INTERVAL, cache_size=MATCH_CACHE_SIZE):
+        self.refresh_interval = refresh_interval
+        self.cache_size = cache_size
+        self._volunteers = {}
+        self._postings = defaultdict(set)
+        # help request id -> (tags, location, matches)
+        self._results = OrderedDict()
+        self._synced_at = None
+        self._checked_at = 0
+        self._lock = threading.RLock()
+
+    def _forget_results(self, tags):
+        for pk in [pk for pk, (cached_tags, _, _) in self._results.items() if cached_tags & tags]:
+            del self._results[pk]
+
+    def _put(self, volunteer):
+        if self._volunteers.get(volunteer.id) == volunteer:
+            # Refreshes re-read recent rows; unchanged ones keep the cache
+            return
+        self._drop(volunteer.id)
+        self._volunteers[volunteer.id] = volunteer
+        for tag in volunteer.tags:
+            self._postings[tag].add(volunteer.id)
+        self._forget_results(volunteer.tags)
+
+    def _drop(self, pk):
+        volunteer = self._volunteers.pop(pk, None)
+        if volunteer is None:
+            return
+        for tag in volunteer.tags:
+            self._postings[tag].discard(pk)
+        self._forget_results(volunteer.tags)
+
+    def _apply(self, rows):
+        for pk, user_id, skills, availability, latitude, longitude, status in rows:
+            if status == 'approved':
+                self._put(_volunteer(pk, user_id, skills, availability, latitude, longitude))
+            else:
+                self._drop(pk)
+
+    def _rows(self, queryset):
+        return queryset.values_list(
+            'id', 'user_id', 'skills', 'availability', 'latitude', 'longitude', 'status'
+        ).iterator(chunk_size=2000)
+
+    def refresh(self, force=False):
+        """Load the index, or catch up with changes made by other workers"""
+        with self._lock:
+            if not force and time.monotonic() - self._checked_at < self.refresh_interval:
+                return
+            now = timezone.now()
+            if self._synced_at is None:
+                self._apply(self._rows(VolunteerRequest.objects.filter(status='approved')))
+            else:
+                since = self._synced_at - MATCH_SETTLE_TIME
+                self._apply(self._rows(VolunteerRequest.objects.filter(updated_at__gt=since)))
+                deleted = Tombstone.objects.filter(
+                    collection='volunteer_requests', deleted_at__gt=since
+                ).values_list('object_id', flat=True)
+                for pk in deleted:
+                    self._drop(pk)
+            self._synced_at = now
+            self._checked_at = time.monotonic()
+
+    def update(self, volunteer_request):
+        """Apply a save made by this worker"""
+        with self._lock:
+            if self._synced_at is None:
+                return
+            row = volunteer_request
+            self._apply([
+                (row.pk, row.user_id, row.skills, row.availability, row.latitude, row.longitude, row.status)
+            ])
+
+    def remove(self, pk):
+        with self._lock:
+            self._drop(pk)
+
+    def forget_request(self, pk):
+        with self._lock:
+            self._results.pop(pk, None)
+
+    def clear(self):
+        with self._lock:
+            self._volunteers.clear()
+            self._postings.clear()
+            self._results.clear()
+            self._synced_at = None
+            self._checked_at = 0
+
+    def _rank(self, help_request, tags):
+        candidates = set().union(*(self._postings.get(tag, ()) for tag in tags)) if tags else set()
+        located = help_request.latitude is not None and help_request.longitude is not None
+        best = {}
+        for pk in candidates:
+            volunteer = self._volunteers[pk]
+            if volunteer.user_id == help_request.user_id:
+                continue
+            shared = volunteer.tags & tags
+            score = TAG_WEIGHT * len(shared) + AVAILABILITY_WEIGHT * volunteer.availability
+            if help_request.category in shared:
+                score += CATEGORY_WEIGHT
+            distance = None
+            if located and volunteer.latitude is not None and volunteer.longitude is not None:
+                distance = haversine_km(
+                    help_request.latitude, help_request.longitude, volunteer.latitude, volunteer.longitude
+                )
+                score += DISTANCE_WEIGHT * max(0.0, 1 - distance / MATCH_RADIUS_KM)
+            # A volunteer with several approved requests is listed once
+            if volunteer.user_id not in best or score > best[volunteer.user_id].score:
+                best[volunteer.user_id] = Match(pk, score, sorted(shared), distance)
+        return heapq.nlargest(MATCH_CACHE_DEPTH, best.values(), key=lambda match: (match.score, -match.volunteer_id))
+
+    def match(self, help_request, limit=20):
+        """Best ``Match``es for a help request, best first"""
+        self.refresh()
+        tags = request_tags(help_request)
+        location = (help_request.latitude, help_request.longitude)
+        with self._lock:
+            cached = self._results.get(help_request.pk)
+            if cached is not None and cached[:2] == (tags, location):
+                self._results.move_to_end(help_request.pk)
+                return cached[2][:limit]
+            matches = self._rank(help_request, tags)
+            self._results[help_request.pk] = (tags, location, matches)
+            while len(self._results) > self.cache_size:
+                self._results.popitem(last=False)
+        return matches[:limit]
+
+
+index = MatchIndex()
@@ -0,0 +1,261 @@
+"""
+Image and video processing for post media.
+
+Each uploaded photo gets a few downsized variants (WebP when Pillow
+supports it, JPEG otherwise) saved next to the original under
+``MEDIA_ROOT/posts/``. Variants are re-encoded without EXIF, so they
+never carry the phone's GPS tags or camera details.
+
+Each video is transcoded with a local ffmpeg (``FFMPEG_BINARY``) into an
+H.264/AAC MP4 of at most ``VIDEO_MAX_EDGE`` pixels and a capped bitrate,
+with the index moved to the front (``faststart``) so playback starts
+before the download ends, plus a poster JPEG; with ``VIDEO_HLS`` also
+into HLS segments. The outputs are saved next to the upload under
+``MEDIA_ROOT/posts/videos/``. Without ffmpeg videos are served as
+uploaded. Both run in the media job worker (see ``jobs.py``).
+"""
+import hashlib
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.base import ContentFile
+from django.utils import timezone
+from PIL import Image, ImageOps, features
+
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+# Longest edge in pixels of each variant
+PHOTO_VARIANT_SIZES = {
+    'thumb': 160,
+    'small': 480,
+    'medium': 1080,
+}
+
+PHOTO_VARIANT_QUALITY = 80
+
+# Longest edge in pixels of the video rendition and the poster
+VIDEO_MAX_EDGE = 1280
+# x264 constant quality, capped at VIDEO_MAX_BITRATE for mobile data
+VIDEO_CRF = 28
+VIDEO_MAX_BITRATE = '1500k'
+VIDEO_BUFFER_SIZE = '3000k'
+VIDEO_AUDIO_BITRATE = '96k'
+# JPEG quality scale of ffmpeg's mjpeg encoder, 2 (best) to 31
+POSTER_QUALITY = 4
+HLS_SEGMENT_SECONDS = 6
+# Seconds one ffmpeg run may take before the attempt fails
+FFMPEG_TIMEOUT = 20 * 60
+
+# Scales the longest edge down to VIDEO_MAX_EDGE, keeping even dimensions
+_SCALE = (
+    f"scale='if(gte(iw,ih),min({VIDEO_MAX_EDGE},iw),-2)':'if(gte(iw,ih),-2,min({VIDEO_MAX_EDGE},ih))'"
+)
+
+
+def variant_format():
+    """``(PIL format, extension)`` used for photo variants"""
+    if features.check('webp'):
+        return 'WEBP', 'webp'
+    return 'JPEG', 'jpg'
+
+
+def render_variants(source):
+    """Yield ``(name, bytes, extension)`` for each variant of an image file"""
+    fmt, extension = variant_format()
+    with Image.open(source) as image:
+        # Apply the EXIF orientation before the tags are dropped
+        image = ImageOps.exif_transpose(image)
+        if fmt == 'JPEG' or image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGB')
+        for name, size in PHOTO_VARIANT_SIZES.items():
+            variant = image.copy()
+            variant.thumbnail((size, size), Image.LANCZOS)
+            buffer = BytesIO()
+            variant.save(buffer, fmt, quality=PHOTO_VARIANT_QUALITY)
+            yield name, buffer.getvalue(), extension
+
+
+def _hashed_name(stem, name, digest, extension):
+    """A variant's storage name, carrying a hash of its content"""
+    return f'{stem}_{name}_{digest[:12]}{extension}'
+
+
+def generate_photo_variants(post):
+    """
+    Create the photo variants of a post and record them; returns them.
+    Raises ``OSError`` or a Pillow error if the photo cannot be read, so
+    the media job is retried and eventually marked failed.
+    """
+    if not post.photo:
+        return {}
+
+    storage = post.photo.storage
+    photo_name = post.photo.name
+    with storage.open(photo_name, 'rb') as source:
+        rendered = list(render_variants(source))
+
+    # Names carry a hash of the content, so regenerated variants get new
+    # URLs and clients never keep a stale copy under MEDIA_CACHE_MAX_AGE
+    stem = os.path.splitext(photo_name)[0]
+    variants = {}
+    for name, content, extension in rendered:
+        target = _hashed_name(stem, name, hashlib.sha256(content).hexdigest(), f'.{extension}')
+        # An existing file of this name already holds the same bytes
+        if not storage.exists(target):
+            target = storage.save(target, ContentFile(content))
+        variants[name] = target
+
+    # Unless the photo was replaced while this one was processed
+    updated = Post.objects.filter(pk=post.pk, photo=photo_name).update(
+        photo_variants=variants, updated_at=timezone.now()
+    )
+    if not updated:
+        _delete_photo_variants(storage, variants)
+        return {}
+    old = post.photo_variants or {}
+    post.photo_variants = variants
+    _delete_photo_variants(storage, {name: path for name, path in old.items() if path not in variants.values()})
+    return variants
+
+
+def _delete_photo_variants(storage, variants):
+    for path in set(variants.values()):
+        storage.delete(path)
+
+
+def ffmpeg_binary():
+    """Path of the ffmpeg executable, or ``None`` if there is none"""
+    return shutil.which(settings.FFMPEG_BINARY)
+
+
+def _ffmpeg(binary, *args):
+    subprocess.run(
+        [binary, '-hide_banner', '-loglevel', 'error', '-y', *args],
+        check=True, capture_output=True, timeout=FFMPEG_TIMEOUT,
+    )
+
+
+def render_video(binary, source, directory):
+    """Yield ``(name, path)`` for each rendition of the video file ``source``"""
+    mp4 = os.path.join(directory, 'rendition.mp4')
+    _ffmpeg(
+        binary, '-i', source, '-map', '0:v:0', '-map', '0:a:0?', '-vf', _SCALE,
+        '-c:v', 'libx264', '-preset', 'veryfast', '-crf', str(VIDEO_CRF), '-profile:v', 'main',
+        '-maxrate', VIDEO_MAX_BITRATE, '-bufsize', VIDEO_BUFFER_SIZE,
+        '-pix_fmt', 'yuv420p', '-c:a', 'aac', '-b:a', VIDEO_AUDIO_BITRATE, '-ac', '2',
+        '-movflags', '+faststart', mp4,
+    )
+    yield 'mp4', mp4
+
+    # The thumbnail filter picks a representative frame rather than a black first one
+    poster = os.path.join(directory, 'poster.jpg')
+    _ffmpeg(binary, '-i', mp4, '-vf', 'thumbnail', '-frames:v', '1', '-q:v', str(POSTER_QUALITY), poster)
+    yield 'poster', poster
+
+    if settings.VIDEO_HLS:
+        hls = os.path.join(directory, 'hls')
+        os.mkdir(hls)
+        _ffmpeg(
+            binary, '-i', mp4, '-c', 'copy', '-f', 'hls', '-hls_time', str(HLS_SEGMENT_SECONDS),
+            '-hls_playlist_type', 'vod', '-hls_segment_filename', os.path.join(hls, 'segment_%04d.ts'),
+            os.path.join(hls, 'index.m3u8'),
+        )
+        yield 'hls', hls
+
+
+def _local_copy(storage, name, directory):
+    """A filesystem path of a stored file, copying it locally if the storage is remote"""
+    try:
+        return storage.path(name)
+    except NotImplementedError:
+        path = os.path.join(directory, 'source' + os.path.splitext(name)[1])
+        with storage.open(name, 'rb') as source, open(path, 'wb') as target:
+            shutil.copyfileobj(source, target)
+        return path
+
+
+def _save_file(storage, name, path):
+    with open(path, 'rb') as file:
+        return storage.save(name, File(file))
+
+
+def _delete_video_variants(storage, variants):
+    for name, path in variants.items():
+        if name == 'hls':
+            # The playlist's directory also holds its segments
+            directory = os.path.dirname(path)
+            for segment in storage.listdir(directory)[1]:
+                storage.delete(f'{directory}/{segment}')
+        else:
+            storage.delete(path)
+
+
+def delete_variants(post, photo_variants=None, video_variants=None):
+    """Delete stored variant files a post no longer refers to"""
+    if photo_variants:
+        _delete_photo_variants(post._meta.get_field('photo').storage, photo_variants)
+    if video_variants:
+        _delete_video_variants(post._meta.get_field('video').storage, video_variants)
+
+
+def generate_video_variants(post):
+    """
+    Transcode a post's video and record the renditions; returns them.
+    Raises ``subprocess.CalledProcessError`` (or ``TimeoutExpired``) if
+    ffmpeg fails, so the job is retried.
+    """
+    binary = ffmpeg_binary()
+    if not post.video or binary is None:
+        if post.video:
+            logger.warning('ffmpeg not found; video of post %s is served as uploaded', post.pk)
+        return {}
+
+    storage = post.video.storage
+    video_name = post.video.name
+    stem = os.path.splitext(video_name)[0]
+    with tempfile.TemporaryDirectory(prefix='transcode-') as directory:
+        source = _local_copy(storage, video_name, directory)
+        rendered = list(render_video(binary, source, directory))
+
+        # Content-hashed names, like the photo variants
+        digests = {}
+        for name, path in rendered:
+            if name != 'hls':
+                with open(path, 'rb') as file:
+                    digests[name] = hashlib.file_digest(file, 'sha256').hexdigest()
+        variants = {}
+        for name, path in rendered:
+            if name == 'hls':
+                # Segments are cut from the MP4, so its hash names them all
+                hls_prefix = f"{stem}_hls_{digests['mp4'][:12]}"
+                for segment in sorted(os.listdir(path)):
+                    target = f'{hls_prefix}/{segment}'
+                    if not storage.exists(target):
+                        target = _save_file(storage, target, os.path.join(path, segment))
+                    if segment == 'index.m3u8':
+                        variants[name] = target
+            else:
+                target = _hashed_name(stem, name, digests[name], os.path.splitext(path)[1])
+                if not storage.exists(target):
+                    target = _save_file(storage, target, path)
+                variants[name] = target
+
+    # Unless the video was replaced while this one was transcoded
+    updated = Post.objects.filter(pk=post.pk, video=video_name).update(
+        video_variants=variants, updated_at=timezone.now()
+    )
+    if not updated:
+        _delete_video_variants(storage, variants)
+        return {}
+    old = post.video_variants or {}
+    post.video_variants = variants
+    _delete_video_variants(storage, {name: path for name, path in old.items() if path not in variants.values()})
+    return variants
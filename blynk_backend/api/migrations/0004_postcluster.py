@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:37
+
+from django.db import migrations, models
+
+
+def build_clusters(apps, schema_editor):
+    from api.clustering import cell_for, MAX_CLUSTER_ZOOM
+    from api.geo import MIN_ZOOM
+    
+    Post = apps.get_model('api', 'Post')
+    PostCluster = apps.get_model('api', 'PostCluster')
+    cells = {}
+    points = Post.objects.filter(
+        is_confirmed=True, latitude__isnull=False, longitude__isnull=False,
+    ).values_list('latitude', 'longitude')
+    for latitude, longitude in points.iterator():
+        for zoom in range(MIN_ZOOM, MAX_CLUSTER_ZOOM + 1):
+            key = (zoom, *cell_for(latitude, longitude, zoom))
+            cell = cells.setdefault(key, PostCluster(zoom=key[0], cell_x=key[1], cell_y=key[2]))
+            cell.count += 1
+            cell.latitude_sum += latitude
+            cell.longitude_sum += longitude
+    PostCluster.objects.bulk_create(cells.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_post_lat_lon_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostCluster',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('zoom', models.PositiveSmallIntegerField()),
+                ('cell_x', models.IntegerField()),
+                ('cell_y', models.IntegerField()),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('latitude_sum', models.FloatField(default=0)),
+                ('longitude_sum', models.FloatField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('zoom', 'cell_x', 'cell_y'), name='unique_post_cluster_cell')],
+            },
+        ),
+        migrations.RunPython(build_clusters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:39
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_post_geohash'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='donorrequest',
+            index=models.Index(fields=['user', 'created_at', 'id'], name='donor_req_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='helprequest',
+            index=models.Index(fields=['user', 'created_at', 'id'], name='help_req_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['created_at', 'id'], name='post_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['is_confirmed', 'created_at', 'id'], name='post_confirmed_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='volunteerrequest',
+            index=models.Index(fields=['user', 'created_at', 'id'], name='volunteer_req_user_created_idx'),
+        ),
+    ]
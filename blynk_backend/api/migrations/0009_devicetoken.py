@@ -0,0 +1,49 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:55
+
+import api.models
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def copy_auth_tokens(apps, schema_editor):
+    """Keep clients logged in: their old token becomes their default device's"""
+    from api.authentication import TOKEN_LIFETIME
+    from django.utils import timezone
+    
+    Token = apps.get_model('authtoken', 'Token')
+    DeviceToken = apps.get_model('api', 'DeviceToken')
+    expires_at = timezone.now() + TOKEN_LIFETIME
+    DeviceToken.objects.bulk_create([
+        DeviceToken(key=token.key, user_id=token.user_id, expires_at=expires_at)
+        for token in Token.objects.iterator()
+    ], batch_size=1000)
+    Token.objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_videoupload'),
+        ('authtoken', '0004_alter_tokenproxy_options'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeviceToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(default=api.models.generate_token_key, max_length=40, unique=True)),
+                ('device_id', models.CharField(default='default', max_length=64)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('last_used_at', models.DateTimeField(blank=True, null=True)),
+                ('expires_at', models.DateTimeField(db_index=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='device_tokens', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('user', 'device_id'), name='unique_user_device_token')],
+            },
+        ),
+        migrations.RunPython(copy_auth_tokens, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:57
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_devicetoken'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='donorrequest',
+            name='idempotency_key',
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name='helprequest',
+            name='idempotency_key',
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name='volunteerrequest',
+            name='idempotency_key',
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='donorrequest',
+            constraint=models.UniqueConstraint(fields=('user', 'idempotency_key'), name='donor_req_user_idempotency_key'),
+        ),
+        migrations.AddConstraint(
+            model_name='helprequest',
+            constraint=models.UniqueConstraint(fields=('user', 'idempotency_key'), name='help_req_user_idempotency_key'),
+        ),
+        migrations.AddConstraint(
+            model_name='volunteerrequest',
+            constraint=models.UniqueConstraint(fields=('user', 'idempotency_key'), name='volunteer_req_user_idempotency_key'),
+        ),
+    ]
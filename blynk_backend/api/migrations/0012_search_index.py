@@ -0,0 +1,87 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:10
+
+from django.db import migrations
+
+# The index as first installed, frozen here so later changes to
+# api/search.py do not alter this migration. SQLite fills each FTS5
+# table from its content table ('rebuild'); PostgreSQL computes the
+# generated column for existing rows itself.
+INSTALL_SQL = {
+    'sqlite': [
+        "CREATE VIRTUAL TABLE IF NOT EXISTS api_post_fts USING fts5("
+        "title, description, content='api_post', content_rowid='id', tokenize='porter unicode61')",
+        "INSERT INTO api_post_fts(api_post_fts) VALUES ('rebuild')",
+        "CREATE TRIGGER IF NOT EXISTS api_post_fts_insert AFTER INSERT ON api_post BEGIN "
+        "INSERT INTO api_post_fts(rowid, title, description) VALUES (new.id, new.title, new.description); END",
+        "CREATE TRIGGER IF NOT EXISTS api_post_fts_delete AFTER DELETE ON api_post BEGIN "
+        "INSERT INTO api_post_fts(api_post_fts, rowid, title, description) "
+        "VALUES ('delete', old.id, old.title, old.description); END",
+        "CREATE TRIGGER IF NOT EXISTS api_post_fts_update AFTER UPDATE OF title, description ON api_post BEGIN "
+        "INSERT INTO api_post_fts(api_post_fts, rowid, title, description) "
+        "VALUES ('delete', old.id, old.title, old.description); "
+        "INSERT INTO api_post_fts(rowid, title, description) VALUES (new.id, new.title, new.description); END",
+        "CREATE VIRTUAL TABLE IF NOT EXISTS api_helprequest_fts USING fts5("
+        "title, description, content='api_helprequest', content_rowid='id', tokenize='porter unicode61')",
+        "INSERT INTO api_helprequest_fts(api_helprequest_fts) VALUES ('rebuild')",
+        "CREATE TRIGGER IF NOT EXISTS api_helprequest_fts_insert AFTER INSERT ON api_helprequest BEGIN "
+        "INSERT INTO api_helprequest_fts(rowid, title, description) "
+        "VALUES (new.id, new.title, new.description); END",
+        "CREATE TRIGGER IF NOT EXISTS api_helprequest_fts_delete AFTER DELETE ON api_helprequest BEGIN "
+        "INSERT INTO api_helprequest_fts(api_helprequest_fts, rowid, title, description) "
+        "VALUES ('delete', old.id, old.title, old.description); END",
+        "CREATE TRIGGER IF NOT EXISTS api_helprequest_fts_update AFTER UPDATE OF title, description "
+        "ON api_helprequest BEGIN "
+        "INSERT INTO api_helprequest_fts(api_helprequest_fts, rowid, title, description) "
+        "VALUES ('delete', old.id, old.title, old.description); "
+        "INSERT INTO api_helprequest_fts(rowid, title, description) "
+        "VALUES (new.id, new.title, new.description); END",
+    ],
+    'postgresql': [
+        "ALTER TABLE api_post ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS ("
+        "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+        "setweight(to_tsvector('english', coalesce(description, '')), 'B')) STORED",
+        "CREATE INDEX IF NOT EXISTS api_post_search_idx ON api_post USING GIN (search_vector)",
+        "ALTER TABLE api_helprequest ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS ("
+        "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+        "setweight(to_tsvector('english', coalesce(description, '')), 'B')) STORED",
+        "CREATE INDEX IF NOT EXISTS api_helprequest_search_idx ON api_helprequest USING GIN (search_vector)",
+    ],
+}
+
+UNINSTALL_SQL = {
+    'sqlite': [
+        'DROP TRIGGER IF EXISTS api_post_fts_insert',
+        'DROP TRIGGER IF EXISTS api_post_fts_delete',
+        'DROP TRIGGER IF EXISTS api_post_fts_update',
+        'DROP TABLE IF EXISTS api_post_fts',
+        'DROP TRIGGER IF EXISTS api_helprequest_fts_insert',
+        'DROP TRIGGER IF EXISTS api_helprequest_fts_delete',
+        'DROP TRIGGER IF EXISTS api_helprequest_fts_update',
+        'DROP TABLE IF EXISTS api_helprequest_fts',
+    ],
+    'postgresql': [
+        'DROP INDEX IF EXISTS api_post_search_idx',
+        'ALTER TABLE api_post DROP COLUMN IF EXISTS search_vector',
+        'DROP INDEX IF EXISTS api_helprequest_search_idx',
+        'ALTER TABLE api_helprequest DROP COLUMN IF EXISTS search_vector',
+    ],
+}
+
+
+def run_sql(statements):
+    def run(apps, schema_editor):
+        # Other databases get no index, and search reports it unsupported
+        for sql in statements.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(sql)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_delta_sync'),
+    ]
+
+    operations = [
+        migrations.RunPython(run_sql(INSTALL_SQL), run_sql(UNINSTALL_SQL)),
+    ]
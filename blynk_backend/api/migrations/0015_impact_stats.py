@@ -0,0 +1,55 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:11
+
+from django.db import migrations, models
+
+
+def count_existing(apps, schema_editor):
+    from collections import Counter
+    from django.db.models import Count
+    from api.geo import geohash_encode
+    from api.stats import DONOR_KEY, REGION_KEY, REGION_PRECISION
+
+    DonorRequest = apps.get_model('api', 'DonorRequest')
+    HelpRequest = apps.get_model('api', 'HelpRequest')
+    Post = apps.get_model('api', 'Post')
+    ImpactStat = apps.get_model('api', 'ImpactStat')
+
+    values = Counter()
+    donors = DonorRequest.objects.filter(status='completed').values('user').annotate(donations=Count('id'))
+    for row in donors.iterator():
+        values[DONOR_KEY.format(row['user'])] = row['donations']
+        values['donations_completed'] += row['donations']
+        values['donors'] += 1
+    values['help_requests_fulfilled'] = HelpRequest.objects.filter(status='fulfilled').count()
+
+    points = Post.objects.filter(is_confirmed=True).values_list('latitude', 'longitude')
+    for latitude, longitude in points.iterator():
+        values['confirmed_posts'] += 1
+        if latitude is not None and longitude is not None:
+            region = REGION_KEY.format(geohash_encode(latitude, longitude, REGION_PRECISION))
+            if not values[region]:
+                values['communities'] += 1
+            values[region] += 1
+
+    keys = set(values) | {'donations_completed', 'help_requests_fulfilled', 'donors', 'confirmed_posts', 'communities'}
+    ImpactStat.objects.bulk_create([ImpactStat(key=key, value=values[key]) for key in keys], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0014_matching_locations'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImpactStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=64, unique=True)),
+                ('value', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(count_existing, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:39
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0017_video_variants'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='ngoinfo',
+            name='active_donors',
+        ),
+        migrations.RemoveField(
+            model_name='ngoinfo',
+            name='communities_served',
+        ),
+        migrations.RemoveField(
+            model_name='ngoinfo',
+            name='lives_impacted',
+        ),
+    ]
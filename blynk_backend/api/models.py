@@ -1,5 +1,11 @@
+import secrets
+import uuid
+
 from django.db import models
 from django.contrib.auth.models import User
+from django.utils import timezone
+
+from .geo import geohash_encode, GEOHASH_PRECISION
 
 class UserProfile(models.Model):
     """Extended user profile for BEULYNK users"""
@@ -34,11 +40,6 @@ class NGOInfo(models.Model):
     instagram_url = models.URLField(blank=True, null=True)
     linkedin_url = models.URLField(blank=True, null=True)
     
-    # Statistics
-    lives_impacted = models.IntegerField(default=10000)
-    active_donors = models.IntegerField(default=500)
-    communities_served = models.IntegerField(default=50)
-    
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -55,6 +56,9 @@ class VolunteerRequest(models.Model):
     skills = models.TextField(help_text="Skills and expertise")
     availability = models.CharField(max_length=200, help_text="Available days/hours")
     motivation = models.TextField(help_text="Why do you want to volunteer?")
+    # Optional; when both sides have a location, nearer volunteers rank higher
+    latitude = models.FloatField(blank=True, null=True)
+    longitude = models.FloatField(blank=True, null=True)
     status = models.CharField(
         max_length=20,
         choices=[
@@ -66,6 +70,19 @@ class VolunteerRequest(models.Model):
     )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Chosen by the client so a replayed submission is not stored twice
+    idempotency_key = models.CharField(max_length=64, null=True, blank=True)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'created_at', 'id'], name='volunteer_req_user_created_idx'),
+            models.Index(fields=['user', 'updated_at', 'id'], name='volunteer_req_user_updated_idx'),
+            # Lets the matching index pick up changes from other workers
+            models.Index(fields=['updated_at', 'id'], name='volunteer_req_updated_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'idempotency_key'], name='volunteer_req_user_idempotency_key'),
+        ]
     
     def __str__(self):
         return f"Volunteer Request - {self.user.username}"
@@ -94,6 +111,17 @@ class DonorRequest(models.Model):
     )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Chosen by the client so a replayed submission is not stored twice
+    idempotency_key = models.CharField(max_length=64, null=True, blank=True)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'created_at', 'id'], name='donor_req_user_created_idx'),
+            models.Index(fields=['user', 'updated_at', 'id'], name='donor_req_user_updated_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'idempotency_key'], name='donor_req_user_idempotency_key'),
+        ]
     
     def __str__(self):
         return f"Donor Request - {self.user.username}"
@@ -114,6 +142,8 @@ class HelpRequest(models.Model):
     )
     title = models.CharField(max_length=200)
     description = models.TextField()
+    latitude = models.FloatField(blank=True, null=True)
+    longitude = models.FloatField(blank=True, null=True)
     urgency = models.CharField(
         max_length=20,
         choices=[
@@ -134,8 +164,29 @@ class HelpRequest(models.Model):
         ],
         default='open'
     )
+    # The staff member or volunteer who claimed it from the triage queue
+    assigned_to = models.ForeignKey(
+        User, on_delete=models.SET_NULL, null=True, blank=True, related_name='assigned_help_requests'
+    )
+    claimed_at = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Chosen by the client so a replayed submission is not stored twice
+    idempotency_key = models.CharField(max_length=64, null=True, blank=True)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'created_at', 'id'], name='help_req_user_created_idx'),
+            models.Index(fields=['user', 'updated_at', 'id'], name='help_req_user_updated_idx'),
+            # Triage queue: one range scan per urgency level, oldest first
+            models.Index(fields=['status', 'urgency', 'created_at', 'id'], name='help_req_triage_idx'),
+            models.Index(
+                fields=['status', 'category', 'urgency', 'created_at', 'id'], name='help_req_triage_category_idx'
+            ),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'idempotency_key'], name='help_req_user_idempotency_key'),
+        ]
     
     def __str__(self):
         return f"Help Request - {self.title}"
@@ -158,14 +209,206 @@ class Post(models.Model):
     description = models.TextField()
     photo = models.ImageField(upload_to='posts/', blank=True, null=True)
     video = models.FileField(upload_to='posts/videos/', blank=True, null=True)
+    # Storage names of downsized photo variants, keyed by variant name
+    photo_variants = models.JSONField(default=dict, blank=True, editable=False)
+    # Storage names of the transcoded video and its poster, keyed by rendition name
+    video_variants = models.JSONField(default=dict, blank=True, editable=False)
+    # Whether background media jobs (see ``jobs.py``) are still working on the uploads
+    MEDIA_STATUS_CHOICES = [
+        ('ready', 'Ready'),
+        ('processing', 'Processing'),
+        ('failed', 'Failed'),
+    ]
+    media_status = models.CharField(max_length=20, choices=MEDIA_STATUS_CHOICES, default='ready', editable=False)
     latitude = models.FloatField(blank=True, null=True)
     longitude = models.FloatField(blank=True, null=True)
+    # Derived from latitude/longitude on save; indexed for prefix range scans
+    geohash = models.CharField(max_length=GEOHASH_PRECISION, blank=True, null=True, db_index=True, editable=False)
     is_confirmed = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['latitude', 'longitude'], name='post_lat_lon_idx'),
+            models.Index(fields=['created_at', 'id'], name='post_created_idx'),
+            models.Index(fields=['is_confirmed', 'created_at', 'id'], name='post_confirmed_created_idx'),
+            models.Index(fields=['updated_at', 'id'], name='post_updated_idx'),
+        ]
     
     def __str__(self):
         return f"{self.title} - {self.user.username}"
+    
+    def compute_geohash(self):
+        if self.latitude is None or self.longitude is None:
+            return None
+        return geohash_encode(self.latitude, self.longitude)
+    
+    def save(self, *args, **kwargs):
+        self.geohash = self.compute_geohash()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'latitude', 'longitude'} & set(update_fields):
+            kwargs['update_fields'] = {*update_fields, 'geohash'}
+        super().save(*args, **kwargs)
+
+class PostCluster(models.Model):
+    """Precomputed map cluster of confirmed posts for one grid cell at one zoom level"""
+    zoom = models.PositiveSmallIntegerField()
+    cell_x = models.IntegerField()
+    cell_y = models.IntegerField()
+    count = models.PositiveIntegerField(default=0)
+    # Running coordinate sums so the centroid can be updated incrementally
+    latitude_sum = models.FloatField(default=0)
+    longitude_sum = models.FloatField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['zoom', 'cell_x', 'cell_y'], name='unique_post_cluster_cell'),
+        ]
+    
+    @property
+    def latitude(self):
+        return self.latitude_sum / self.count if self.count else None
+    
+    @property
+    def longitude(self):
+        return self.longitude_sum / self.count if self.count else None
+    
+    def __str__(self):
+        return f"Cluster z{self.zoom} ({self.cell_x}, {self.cell_y}) - {self.count}"
+
+class VideoUpload(models.Model):
+    """Resumable chunked upload of a post video"""
+    STATUS_CHOICES = [
+        ('uploading', 'Uploading'),
+        ('complete', 'Complete'),
+    ]
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='video_uploads')
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='video_uploads')
+    filename = models.CharField(max_length=255)
+    total_size = models.PositiveBigIntegerField()
+    chunk_size = models.PositiveIntegerField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='uploading')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    @property
+    def total_chunks(self):
+        return max(1, -(-self.total_size // self.chunk_size))
+    
+    def expected_chunk_size(self, index):
+        if index == self.total_chunks - 1:
+            return self.total_size - index * self.chunk_size
+        return self.chunk_size
+    
+    def __str__(self):
+        return f"Video upload {self.id} - {self.filename}"
+
+def generate_token_key():
+    return secrets.token_hex(20)
+
+class DeviceToken(models.Model):
+    """API token of one of a user's devices"""
+    DEFAULT_DEVICE_ID = 'default'
+    
+    key = models.CharField(max_length=40, unique=True, default=generate_token_key)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='device_tokens')
+    device_id = models.CharField(max_length=64, default=DEFAULT_DEVICE_ID)
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Written in batches, so it lags actual use by up to a minute
+    last_used_at = models.DateTimeField(null=True, blank=True)
+    expires_at = models.DateTimeField(db_index=True)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'device_id'], name='unique_user_device_token'),
+        ]
+    
+    def is_expired(self, now):
+        return self.expires_at <= now
+    
+    def __str__(self):
+        return f"{self.user.username} - {self.device_id}"
+
+class Tombstone(models.Model):
+    """Record of a deleted row, so delta sync can tell clients to drop it"""
+    collection = models.CharField(max_length=32)
+    object_id = models.BigIntegerField()
+    # Owner of the deleted row, for collections clients only see their own of.
+    # Not a foreign key: the owner may be what is being deleted.
+    owner_id = models.BigIntegerField(null=True, blank=True)
+    deleted_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['collection', 'deleted_at', 'id'], name='tombstone_deleted_idx'),
+            models.Index(fields=['collection', 'owner_id', 'deleted_at', 'id'], name='tombstone_owner_deleted_idx'),
+        ]
+    
+    def __str__(self):
+        return f"Deleted {self.collection} {self.object_id}"
+
+class ImpactStat(models.Model):
+    """A running counter behind the NGO impact statistics (see ``stats.py``)"""
+    DONATIONS_COMPLETED = 'donations_completed'
+    HELP_REQUESTS_FULFILLED = 'help_requests_fulfilled'
+    DONORS = 'donors'
+    CONFIRMED_POSTS = 'confirmed_posts'
+    COMMUNITIES = 'communities'
+    # The counters served with the NGO information
+    HEADLINE = [DONATIONS_COMPLETED, HELP_REQUESTS_FULFILLED, DONORS, CONFIRMED_POSTS, COMMUNITIES]
+    
+    key = models.CharField(max_length=64, unique=True)
+    value = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    @classmethod
+    def headline(cls):
+        values = dict(cls.objects.filter(key__in=cls.HEADLINE).values_list('key', 'value'))
+        return {key: values.get(key, 0) for key in cls.HEADLINE}
+    
+    @classmethod
+    async def aheadline(cls):
+        rows = cls.objects.filter(key__in=cls.HEADLINE).values_list('key', 'value')
+        values = {key: value async for key, value in rows}
+        return {key: values.get(key, 0) for key in cls.HEADLINE}
+    
+    def __str__(self):
+        return f"{self.key} = {self.value}"
+
+class MediaJob(models.Model):
+    """Queued background work on a post's media (see ``jobs.py``)"""
+    KIND_CHOICES = [
+        ('photo_variants', 'Photo variants'),
+        ('video_transcode', 'Video transcode'),
+    ]
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('failed', 'Failed'),
+    ]
+    
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='media_jobs')
+    kind = models.CharField(max_length=32, choices=KIND_CHOICES)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    # Not picked up before this time; pushed back after each failed attempt
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        indexes = [
+            # Claiming: the due queued jobs, oldest first
+            models.Index(fields=['status', 'run_after', 'id'], name='media_job_queue_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.get_kind_display()} for post {self.post_id} ({self.status})"
@@ -0,0 +1,28 @@
+"""
+JSON request parsing through orjson when it is installed; see
+``renderers.py``. Bodies in a charset other than UTF-8, or any body
+without orjson, are parsed by DRF's ``JSONParser``.
+"""
+import codecs
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+
+
+class ORJSONParser(JSONParser):
+    """``JSONParser`` that decodes with orjson when available"""
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        encoding = (parser_context or {}).get('encoding', settings.DEFAULT_CHARSET)
+        if orjson is None or codecs.lookup(encoding).name != 'utf-8':
+            return super().parse(stream, media_type, parser_context)
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError(f'JSON parse error - {exc}')
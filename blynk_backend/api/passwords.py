@@ -0,0 +1,93 @@
+"""
+Password hashing off the request thread.
+
+Hashing is deliberately slow, so a burst of logins or registrations can
+take every CPU a worker has. Hashes here run on a small thread pool
+(the hashers release the GIL while they work) with a bounded number of
+pending jobs. When the pool is full, callers get ``PasswordPoolBusy``
+immediately and the view answers 503 instead of queueing more work, so
+the other endpoints keep their share of the CPU.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import authenticate
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.hashers import make_password, verify_password
+from django.contrib.auth.models import User
+
+
+class PasswordPoolBusy(Exception):
+    """Too many password hashes are already running or queued"""
+
+
+_executor = None
+_slots = None
+_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor, _slots
+    with _lock:
+        if _executor is None:
+            workers = settings.PASSWORD_WORKERS
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password')
+            _slots = threading.BoundedSemaphore(workers + settings.PASSWORD_QUEUE_SIZE)
+    return _executor
+
+
+def run_hasher(func, *args):
+    """Run ``func(*args)`` on the pool and wait for its result"""
+    executor = get_executor()
+    if not _slots.acquire(blocking=False):
+        raise PasswordPoolBusy('Too many logins in progress, try again shortly')
+    try:
+        future = executor.submit(func, *args)
+    except BaseException:
+        _slots.release()
+        raise
+    future.add_done_callback(lambda _: _slots.release())
+    return future.result()
+
+
+def hash_password(password):
+    return run_hasher(make_password, password)
+
+
+class PooledModelBackend(ModelBackend):
+    """
+    ``ModelBackend`` that checks passwords on the pool.
+
+    Only the hashing runs there; the database work stays on the calling
+    thread. A hash made with an outdated algorithm or cost is replaced
+    after a successful check.
+    """
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        if username is None:
+            username = kwargs.get(User.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        user = User._default_manager.select_related('profile').filter(username=username).first()
+        if user is None:
+            # Hash anyway so unknown usernames take as long as wrong passwords
+            hash_password(password)
+            return None
+
+        is_correct, must_update = run_hasher(verify_password, password, user.password)
+        if not is_correct or not self.user_can_authenticate(user):
+            return None
+        if must_update:
+            user.password = hash_password(password)
+            user.save(update_fields=['password'])
+        return user
+
+
+def authenticate_user(request, username, password):
+    """
+    Check a username and password with the configured authentication
+    backends, so their signals and checks apply. Raises
+    ``PasswordPoolBusy`` when ``PooledModelBackend`` has no room.
+    """
+    return authenticate(request, username=username, password=password)
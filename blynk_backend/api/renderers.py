@@ -0,0 +1,36 @@
+"""
+JSON rendering through orjson when it is installed.
+
+orjson encodes the dicts and lists of a response several times faster
+than the standard library ``json`` module behind DRF's ``JSONRenderer``.
+The output is the same compact UTF-8 JSON; anything orjson cannot encode
+natively (datetimes, decimals, lazy strings) goes through DRF's encoder
+so it is represented exactly as before. Without orjson the renderer is
+plain ``JSONRenderer``, so the dependency stays optional.
+"""
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+
+class ORJSONRenderer(JSONRenderer):
+    """``JSONRenderer`` that encodes with orjson when available"""
+    encoder = JSONEncoder()
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        # Indented (browsable) output is rare; leave it to the stdlib
+        if orjson is None or self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        if data is None:
+            return b''
+        content = orjson.dumps(
+            data,
+            default=self.encoder.default,
+            option=orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME,
+        )
+        # Like JSONRenderer, escape the separators JavaScript treats as line breaks
+        return content.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
@@ -0,0 +1,210 @@
+"""
+Ranked full-text search over posts and help requests.
+
+The index lives in the database and is maintained by it, so every write
+path (``save()``, ``bulk_create``, ``queryset.update()``) keeps it
+current one row at a time:
+
+- PostgreSQL: a generated ``search_vector`` tsvector column with a GIN
+  index, ranked with ``ts_rank``.
+- SQLite: an external-content FTS5 table per model, kept in step by
+  triggers and ranked with ``bm25``.
+
+Both use stemming, weight titles above descriptions, and treat each
+query word as a prefix so partial words match while typing. A query
+reads only the index entries of its terms, so its cost follows the
+number of matches rather than the size of the table.
+
+SQLite drops triggers when a migration rebuilds a table, so
+``install()`` also runs after every ``migrate`` and recreates whatever
+is missing. On PostgreSQL, changing the type of an indexed column needs
+the generated column dropped and re-added around it.
+"""
+import re
+
+from django.db import connection
+
+from .models import Post, HelpRequest
+
+# Indexed text columns per model, most important first
+INDEXED = {
+    Post: ('title', 'description'),
+    HelpRequest: ('title', 'description'),
+}
+
+# Query words beyond this are ignored
+MAX_QUERY_TERMS = 8
+
+_WORD = re.compile(r'\w+', re.UNICODE)
+
+
+def query_terms(query):
+    return _WORD.findall(query.lower())[:MAX_QUERY_TERMS]
+
+
+class SQLiteSearch:
+    """FTS5 tables named ``<table>_fts`` with insert/update/delete triggers"""
+    # bm25 weight of each indexed column, in INDEXED order
+    weights = (10.0, 1.0)
+
+    def _names(self, model):
+        table = model._meta.db_table
+        return table, f'{table}_fts', INDEXED[model]
+
+    def install_sql(self, model):
+        table, fts, columns = self._names(model)
+        cols = ', '.join(columns)
+        new = ', '.join(f'new.{column}' for column in columns)
+        old = ', '.join(f'old.{column}' for column in columns)
+        exists = f"SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = '{fts}'"
+        return exists, [
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+            f"{cols}, content='{table}', content_rowid='id', tokenize='porter unicode61')",
+            f"INSERT INTO {fts}({fts}) VALUES ('rebuild')",
+        ], [
+            f"CREATE TRIGGER IF NOT EXISTS {fts}_insert AFTER INSERT ON {table} BEGIN "
+            f"INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new}); END",
+            f"CREATE TRIGGER IF NOT EXISTS {fts}_delete AFTER DELETE ON {table} BEGIN "
+            f"INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old}); END",
+            # Only text changes touch the index, not approvals or timestamps
+            f"CREATE TRIGGER IF NOT EXISTS {fts}_update AFTER UPDATE OF {cols} ON {table} BEGIN "
+            f"INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old}); "
+            f"INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new}); END",
+        ]
+
+    def uninstall_sql(self, model):
+        _, fts, _ = self._names(model)
+        return [f'DROP TRIGGER IF EXISTS {fts}_{event}' for event in ('insert', 'delete', 'update')] + [
+            f'DROP TABLE IF EXISTS {fts}'
+        ]
+
+    def match(self, terms):
+        # Quoting each term keeps FTS5 operators in user input inert
+        return ' '.join(f'"{term}"*' for term in terms)
+
+    def ranked_sql(self, model, terms, owner_id):
+        table, fts, columns = self._names(model)
+        weights = ', '.join(str(weight) for weight in self.weights[:len(columns)])
+        sql = f'SELECT rowid, -bm25({fts}, {weights}) AS score FROM {fts} WHERE {fts} MATCH %s'
+        params = [self.match(terms)]
+        if owner_id is not None:
+            sql += f' AND rowid IN (SELECT id FROM {table} WHERE user_id = %s)'
+            params.append(owner_id)
+        return sql + ' ORDER BY score DESC, rowid DESC LIMIT %s OFFSET %s', params
+
+    def matching_sql(self, model, terms):
+        _, fts, _ = self._names(model)
+        return f'SELECT rowid FROM {fts} WHERE {fts} MATCH %s', [self.match(terms)]
+
+
+class PostgreSQLSearch:
+    """A generated ``search_vector`` column with a GIN index on each table"""
+    config = 'english'
+
+    def install_sql(self, model):
+        table = model._meta.db_table
+        # Columns get weights A, B, ... which ts_rank scores 1.0, 0.4, ...
+        vector = ' || '.join(
+            f"setweight(to_tsvector('{self.config}', coalesce({column}, '')), '{weight}')"
+            for column, weight in zip(INDEXED[model], 'ABCD')
+        )
+        return None, [], [
+            f'ALTER TABLE {table} ADD COLUMN IF NOT EXISTS search_vector tsvector '
+            f'GENERATED ALWAYS AS ({vector}) STORED',
+            f'CREATE INDEX IF NOT EXISTS {table}_search_idx ON {table} USING GIN (search_vector)',
+        ]
+
+    def uninstall_sql(self, model):
+        table = model._meta.db_table
+        return [
+            f'DROP INDEX IF EXISTS {table}_search_idx',
+            f'ALTER TABLE {table} DROP COLUMN IF EXISTS search_vector',
+        ]
+
+    def match(self, terms):
+        return ' & '.join(f'{term}:*' for term in terms)
+
+    def ranked_sql(self, model, terms, owner_id):
+        table = model._meta.db_table
+        sql = (
+            f"SELECT id, ts_rank(search_vector, query) AS score "
+            f"FROM {table}, to_tsquery('{self.config}', %s) query WHERE search_vector @@ query"
+        )
+        params = [self.match(terms)]
+        if owner_id is not None:
+            sql += ' AND user_id = %s'
+            params.append(owner_id)
+        return sql + ' ORDER BY score DESC, id DESC LIMIT %s OFFSET %s', params
+
+    def matching_sql(self, model, terms):
+        table = model._meta.db_table
+        return (
+            f"SELECT id FROM {table} WHERE search_vector @@ to_tsquery('{self.config}', %s)",
+            [self.match(terms)],
+        )
+
+
+BACKENDS = {
+    'sqlite': SQLiteSearch(),
+    'postgresql': PostgreSQLSearch(),
+}
+
+
+def get_backend(conn=None):
+    backend = BACKENDS.get((conn or connection).vendor)
+    if backend is None:
+        raise NotImplementedError(f'Search is not supported on {(conn or connection).vendor}')
+    return backend
+
+
+def install(conn=None):
+    """Create any missing part of the search index; safe to repeat"""
+    conn = conn or connection
+    backend = BACKENDS.get(conn.vendor)
+    if backend is None:
+        return
+    with conn.cursor() as cursor:
+        for model in INDEXED:
+            exists_sql, create, always = backend.install_sql(model)
+            exists = False
+            if exists_sql is not None:
+                cursor.execute(exists_sql)
+                exists = cursor.fetchone() is not None
+            if not exists:
+                for sql in create:
+                    cursor.execute(sql)
+            for sql in always:
+                cursor.execute(sql)
+
+
+def uninstall(conn=None):
+    conn = conn or connection
+    backend = BACKENDS.get(conn.vendor)
+    if backend is None:
+        return
+    with conn.cursor() as cursor:
+        for model in INDEXED:
+            for sql in backend.uninstall_sql(model):
+                cursor.execute(sql)
+
+
+def search(model, query, owner_id=None, limit=20, offset=0):
+    """
+    ``(id, score)`` pairs of the best matches for ``query``, best first.
+    ``owner_id`` restricts the results to one user's rows.
+    """
+    terms = query_terms(query)
+    if not terms:
+        return []
+    sql, params = get_backend().ranked_sql(model, terms, owner_id)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params + [limit, offset])
+        return cursor.fetchall()
+
+
+def matching_ids_sql(model, query):
+    """``(sql, params)`` selecting the ids of every match, for ``id__in=RawSQL(...)``"""
+    terms = query_terms(query)
+    if not terms:
+        return None
+    return get_backend().matching_sql(model, terms)
@@ -1,8 +1,15 @@
+import os
+
 from rest_framework import serializers
 from django.contrib.auth.models import User
 from .models import (
     UserProfile, NGOInfo, VolunteerRequest,
-    DonorRequest, HelpRequest, ContactMessage, Post
+    DonorRequest, HelpRequest, ContactMessage, Post, PostCluster, VideoUpload, DeviceToken, ImpactStat
+)
+from .passwords import hash_password
+from .projections import ValuesSerializer
+from .uploads import (
+    received_chunks, DEFAULT_CHUNK_SIZE, MIN_CHUNK_SIZE, MAX_CHUNK_SIZE, MAX_VIDEO_SIZE
 )
 
 class UserSerializer(serializers.ModelSerializer):
@@ -26,10 +33,13 @@ class RegisterSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True, min_length=6)
     confirm_password = serializers.CharField(write_only=True)
     role = serializers.ChoiceField(choices=UserProfile.ROLE_CHOICES)
+    device_id = serializers.CharField(
+        write_only=True, required=False, max_length=64, default=DeviceToken.DEFAULT_DEVICE_ID
+    )
     
     class Meta:
         model = User
-        fields = ['username', 'email', 'password', 'confirm_password', 'first_name', 'last_name', 'role']
+        fields = ['username', 'email', 'password', 'confirm_password', 'first_name', 'last_name', 'role', 'device_id']
     
     def validate(self, data):
         if data['password'] != data['confirm_password']:
@@ -39,16 +49,19 @@ class RegisterSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         # Remove confirm_password and role from validated_data
         validated_data.pop('confirm_password')
+        validated_data.pop('device_id')
         role = validated_data.pop('role')
         
-        # Create user
-        user = User.objects.create_user(
-            username=validated_data['username'],
-            email=validated_data['email'],
-            password=validated_data['password'],
+        # Create user; the password is hashed on the bounded password pool
+        # rather than by create_user on the request thread
+        user = User(
+            username=User.normalize_username(validated_data['username']),
+            email=User.objects.normalize_email(validated_data['email']),
+            password=hash_password(validated_data['password']),
             first_name=validated_data.get('first_name', ''),
             last_name=validated_data.get('last_name', '')
         )
+        user.save()
         
         # Create user profile
         UserProfile.objects.create(user=user, role=role)
@@ -59,48 +72,109 @@ class LoginSerializer(serializers.Serializer):
     """Serializer for user login"""
     username = serializers.CharField()
     password = serializers.CharField(write_only=True)
+    # Identifies the client so each device keeps its own token
+    device_id = serializers.CharField(required=False, max_length=64, default=DeviceToken.DEFAULT_DEVICE_ID)
 
 class NGOInfoSerializer(serializers.ModelSerializer):
-    """Serializer for NGO information"""
+    """
+    Serializer for NGO information. The headline figures are the live
+    ``ImpactStat`` counters; pass them as ``context['statistics']`` when
+    they are already loaded.
+    """
     class Meta:
         model = NGOInfo
         fields = [
             'id', 'name', 'full_name', 'tagline', 'mission', 'description',
             'email', 'phone', 'address', 'facebook_url', 'twitter_url',
-            'instagram_url', 'linkedin_url', 'lives_impacted',
-            'active_donors', 'communities_served', 'created_at', 'updated_at'
+            'instagram_url', 'linkedin_url', 'created_at', 'updated_at'
         ]
         read_only_fields = ['id', 'created_at', 'updated_at']
+    
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        statistics = self.context.get('statistics')
+        if statistics is None:
+            statistics = ImpactStat.headline()
+        data['lives_impacted'] = statistics[ImpactStat.HELP_REQUESTS_FULFILLED]
+        data['active_donors'] = statistics[ImpactStat.DONORS]
+        data['communities_served'] = statistics[ImpactStat.COMMUNITIES]
+        data['statistics'] = statistics
+        return data
 
 class VolunteerRequestSerializer(serializers.ModelSerializer):
     """Serializer for volunteer requests"""
     user = UserSerializer(read_only=True)
+    idempotency_key = serializers.CharField(max_length=64, required=False)
     
     class Meta:
         model = VolunteerRequest
-        fields = ['id', 'user', 'skills', 'availability', 'motivation', 'status', 'created_at', 'updated_at']
+        fields = [
+            'id', 'user', 'skills', 'availability', 'motivation', 'latitude', 'longitude',
+            'status', 'created_at', 'updated_at', 'idempotency_key'
+        ]
         read_only_fields = ['id', 'user', 'status', 'created_at', 'updated_at']
 
+class VolunteerRequestValuesSerializer(ValuesSerializer):
+    """``VolunteerRequestSerializer`` output for list endpoints, built from ``.values()`` rows"""
+    serializer_class = VolunteerRequestSerializer
+
 class DonorRequestSerializer(serializers.ModelSerializer):
     """Serializer for donor requests"""
     user = UserSerializer(read_only=True)
+    idempotency_key = serializers.CharField(max_length=64, required=False)
     
     class Meta:
         model = DonorRequest
-        fields = ['id', 'user', 'donation_type', 'amount', 'message', 'status', 'created_at', 'updated_at']
+        fields = [
+            'id', 'user', 'donation_type', 'amount', 'message', 'status',
+            'created_at', 'updated_at', 'idempotency_key'
+        ]
         read_only_fields = ['id', 'user', 'status', 'created_at', 'updated_at']
 
+class DonorRequestValuesSerializer(ValuesSerializer):
+    """``DonorRequestSerializer`` output for list endpoints, built from ``.values()`` rows"""
+    serializer_class = DonorRequestSerializer
+
 class HelpRequestSerializer(serializers.ModelSerializer):
     """Serializer for help requests"""
     user = UserSerializer(read_only=True)
+    idempotency_key = serializers.CharField(max_length=64, required=False)
     
     class Meta:
         model = HelpRequest
         fields = [
-            'id', 'user', 'category', 'title', 'description',
-            'urgency', 'status', 'created_at', 'updated_at'
+            'id', 'user', 'category', 'title', 'description', 'latitude', 'longitude',
+            'urgency', 'status', 'assigned_to', 'claimed_at',
+            'created_at', 'updated_at', 'idempotency_key'
         ]
-        read_only_fields = ['id', 'user', 'status', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'user', 'status', 'assigned_to', 'claimed_at', 'created_at', 'updated_at']
+
+class HelpRequestTriageSerializer(serializers.ModelSerializer):
+    """
+    Help requests as listed in the triage queue, which every approved
+    volunteer can read: nothing about the requester, and the location
+    rounded to about a kilometre. Claiming a request returns it in full.
+    """
+    LOCATION_DECIMALS = 2
+    
+    class Meta:
+        model = HelpRequest
+        fields = [
+            'id', 'category', 'title', 'description', 'latitude', 'longitude',
+            'urgency', 'status', 'assigned_to', 'claimed_at', 'created_at'
+        ]
+        read_only_fields = fields
+    
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        for field in ('latitude', 'longitude'):
+            if data[field] is not None:
+                data[field] = round(data[field], self.LOCATION_DECIMALS)
+        return data
+
+class HelpRequestValuesSerializer(ValuesSerializer):
+    """``HelpRequestSerializer`` output for list endpoints, built from ``.values()`` rows"""
+    serializer_class = HelpRequestSerializer
 
 class ContactMessageSerializer(serializers.ModelSerializer):
     """Serializer for contact messages"""
@@ -109,12 +183,140 @@ class ContactMessageSerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'email', 'message', 'is_read', 'created_at']
         read_only_fields = ['id', 'is_read', 'created_at']
 
+def variant_urls(storage, variants, request):
+    """URLs of stored media variants, keyed by variant name"""
+    urls = {}
+    for name, path in variants.items():
+        url = storage.url(path)
+        urls[name] = request.build_absolute_uri(url) if request is not None else url
+    return urls
+
 class PostSerializer(serializers.ModelSerializer):
     """Serializer for posts"""
     user = UserSerializer(read_only=True)
+    photo_variants = serializers.SerializerMethodField()
+    video_variants = serializers.SerializerMethodField()
     
     class Meta:
         model = Post
         fields = '__all__'
         read_only_fields = ['id', 'created_at', 'updated_at']
+    
+    def get_photo_variants(self, obj):
+        """URLs of the downsized photos, keyed by variant name"""
+        if not obj.photo or not obj.photo_variants:
+            return {}
+        return variant_urls(obj.photo.storage, obj.photo_variants, self.context.get('request'))
+    
+    def get_video_variants(self, obj):
+        """URLs of the transcoded video (``mp4``, ``hls``) and its ``poster``"""
+        if not obj.video or not obj.video_variants:
+            return {}
+        return variant_urls(obj.video.storage, obj.video_variants, self.context.get('request'))
+
+
+class PostValuesSerializer(ValuesSerializer):
+    """``PostSerializer`` output for list endpoints, built from ``.values()`` rows"""
+    serializer_class = PostSerializer
+    method_lookups = {
+        'photo_variants': ['photo', 'photo_variants'],
+        'video_variants': ['video', 'video_variants'],
+    }
+    
+    def get_photo_variants(self, row):
+        if not row['photo'] or not row['photo_variants']:
+            return {}
+        storage = Post._meta.get_field('photo').storage
+        return variant_urls(storage, row['photo_variants'], self.context.get('request'))
+    
+    def get_video_variants(self, row):
+        if not row['video'] or not row['video_variants']:
+            return {}
+        storage = Post._meta.get_field('video').storage
+        return variant_urls(storage, row['video_variants'], self.context.get('request'))
 
+
+
+class MapPostSerializer(serializers.ModelSerializer):
+    """Slim serializer for map markers (no description or nested user)"""
+    
+    class Meta:
+        model = Post
+        fields = ['id', 'title', 'latitude', 'longitude', 'photo', 'created_at']
+        read_only_fields = fields
+    
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        precision = self.context.get('coordinate_precision')
+        if precision is not None:
+            for field in ('latitude', 'longitude'):
+                if data[field] is not None:
+                    data[field] = round(data[field], precision)
+        return data
+
+
+class MapPostValuesSerializer(ValuesSerializer):
+    """``MapPostSerializer`` output built from ``.values()`` rows"""
+    serializer_class = MapPostSerializer
+    
+    def to_representation(self, row):
+        data = super().to_representation(row)
+        precision = self.context.get('coordinate_precision')
+        if precision is not None:
+            for field in ('latitude', 'longitude'):
+                if data[field] is not None:
+                    data[field] = round(data[field], precision)
+        return data
+
+
+class PostClusterSerializer(serializers.ModelSerializer):
+    """Serializer for precomputed map clusters"""
+    latitude = serializers.FloatField(read_only=True)
+    longitude = serializers.FloatField(read_only=True)
+    
+    class Meta:
+        model = PostCluster
+        fields = ['latitude', 'longitude', 'count']
+        read_only_fields = fields
+
+
+class VideoUploadSerializer(serializers.ModelSerializer):
+    """Serializer for resumable video uploads"""
+    total_chunks = serializers.IntegerField(read_only=True)
+    received_chunks = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = VideoUpload
+        fields = [
+            'id', 'post', 'filename', 'total_size', 'chunk_size',
+            'total_chunks', 'received_chunks', 'status', 'created_at', 'updated_at'
+        ]
+        read_only_fields = ['id', 'status', 'created_at', 'updated_at']
+        extra_kwargs = {'chunk_size': {'required': False}}
+    
+    def get_received_chunks(self, obj):
+        return received_chunks(obj)
+    
+    def validate_post(self, post):
+        request = self.context.get('request')
+        if request is None or post.user_id != request.user.id:
+            raise serializers.ValidationError("You can only upload videos to your own posts")
+        return post
+    
+    def validate_filename(self, filename):
+        filename = os.path.basename(filename)
+        if not filename:
+            raise serializers.ValidationError("Invalid filename")
+        return filename
+    
+    def validate(self, data):
+        chunk_size = data.setdefault('chunk_size', DEFAULT_CHUNK_SIZE)
+        if not MIN_CHUNK_SIZE <= chunk_size <= MAX_CHUNK_SIZE:
+            raise serializers.ValidationError(
+                {"chunk_size": f"Must be between {MIN_CHUNK_SIZE} and {MAX_CHUNK_SIZE} bytes"}
+            )
+        if not 0 < data['total_size'] <= MAX_VIDEO_SIZE:
+            raise serializers.ValidationError(
+                {"total_size": f"Videos must be between 1 and {MAX_VIDEO_SIZE} bytes"}
+            )
+        return data
@@ -0,0 +1,188 @@
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete, post_migrate
+from django.contrib.auth.models import User
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.migrations.recorder import MigrationRecorder
+from django.dispatch import receiver
+
+from . import caching, clustering, events, matching, search, stats, sync
+from .authentication import revoke_token, revoke_user
+from .models import (
+    DeviceToken, NGOInfo, Post, UserProfile, HelpRequest, VolunteerRequest, DonorRequest
+)
+
+# The migration that first installs the search index
+SEARCH_INDEX_MIGRATION = '0012_search_index'
+
+
+def _stored_state(post):
+    # Read from the database: the instance may be stale after queryset.update()
+    if post.pk is None:
+        return None
+    return Post.objects.filter(pk=post.pk).values_list(
+        'is_confirmed', 'latitude', 'longitude'
+    ).first()
+
+
+@receiver(pre_save, sender=Post)
+def remember_post_state(sender, instance, **kwargs):
+    """Record where the post sat in the clusters, and whether it was approved, before this save"""
+    stored = _stored_state(instance)
+    instance._old_state = stored
+    instance._old_cluster_point = clustering.cluster_point(*stored) if stored else None
+    instance._was_confirmed = bool(stored and stored[0])
+
+
+@receiver(post_save, sender=Post)
+def update_post_clusters(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    new = clustering.cluster_point(instance.is_confirmed, instance.latitude, instance.longitude)
+    clustering.move_point(getattr(instance, '_old_cluster_point', None), new)
+
+
+@receiver(post_save, sender=Post)
+def update_post_stats(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    old = stats.post_region(*instance._old_state) if getattr(instance, '_old_state', None) else None
+    stats.move_post(old, stats.post_region(instance.is_confirmed, instance.latitude, instance.longitude))
+
+
+@receiver(post_save, sender=Post)
+def publish_post_approval(sender, instance, raw=False, **kwargs):
+    if raw or instance.is_confirmed == getattr(instance, '_was_confirmed', False):
+        return
+    event_type = events.POST_APPROVED if instance.is_confirmed else events.POST_UNAPPROVED
+    events.publish_posts(event_type, [instance])
+
+
+@receiver(pre_delete, sender=Post)
+def remove_post_from_clusters(sender, instance, **kwargs):
+    stored = _stored_state(instance)
+    point = clustering.cluster_point(*stored) if stored else None
+    if point:
+        clustering.remove_points([point])
+    if stored:
+        stats.move_post(stats.post_region(*stored), None)
+    if stored and stored[0]:
+        # Only approved posts are on clients' maps
+        events.publish_posts(events.POST_DELETED, [instance])
+
+
+@receiver(post_delete, sender=Post)
+@receiver(post_delete, sender=HelpRequest)
+@receiver(post_delete, sender=VolunteerRequest)
+@receiver(post_delete, sender=DonorRequest)
+def record_tombstone(sender, instance, **kwargs):
+    """Let delta sync tell clients about the deletion"""
+    sync.record_deletion(instance)
+
+
+@receiver(post_save, sender=VolunteerRequest)
+def update_match_index(sender, instance, raw=False, **kwargs):
+    if not raw:
+        transaction.on_commit(lambda: matching.index.update(instance))
+
+
+@receiver(post_delete, sender=VolunteerRequest)
+def remove_from_match_index(sender, instance, **kwargs):
+    transaction.on_commit(lambda: matching.index.remove(instance.pk))
+
+
+@receiver(post_save, sender=HelpRequest)
+@receiver(post_delete, sender=HelpRequest)
+def forget_cached_matches(sender, instance, **kwargs):
+    matching.index.forget_request(instance.pk)
+
+
+def _stored_status(model, instance):
+    if instance.pk is None:
+        return None
+    return model.objects.filter(pk=instance.pk).values_list('user_id', 'status').first()
+
+
+@receiver(pre_save, sender=DonorRequest)
+@receiver(pre_save, sender=HelpRequest)
+def remember_request_status(sender, instance, **kwargs):
+    instance._old_status = _stored_status(sender, instance)
+
+
+@receiver(post_save, sender=DonorRequest)
+def update_donation_stats(sender, instance, raw=False, **kwargs):
+    if not raw:
+        stats.donation_changed(getattr(instance, '_old_status', None), (instance.user_id, instance.status))
+
+
+@receiver(post_delete, sender=DonorRequest)
+def remove_donation_stats(sender, instance, **kwargs):
+    stats.donation_changed((instance.user_id, instance.status), None)
+
+
+@receiver(post_save, sender=HelpRequest)
+def update_help_request_stats(sender, instance, raw=False, **kwargs):
+    if not raw:
+        old = getattr(instance, '_old_status', None)
+        stats.help_request_changed(old and old[1], instance.status)
+
+
+@receiver(post_delete, sender=HelpRequest)
+def remove_help_request_stats(sender, instance, **kwargs):
+    stats.help_request_changed(instance.status, None)
+
+
+@receiver(post_save, sender=HelpRequest)
+@receiver(post_save, sender=VolunteerRequest)
+@receiver(post_save, sender=DonorRequest)
+@receiver(post_delete, sender=HelpRequest)
+@receiver(post_delete, sender=VolunteerRequest)
+@receiver(post_delete, sender=DonorRequest)
+def invalidate_user_list_cache(sender, instance, **kwargs):
+    """Drop the owner's cached list pages, and the previous owner's if it changed"""
+    collection = sync.COLLECTION_NAMES[sender]
+    owners = {instance.user_id}
+    old = getattr(instance, '_old_status', None)
+    if old:
+        owners.add(old[0])
+
+    def invalidate():
+        for user_id in owners:
+            caching.invalidate_user_list(collection, user_id)
+    # After commit, so a concurrent read cannot cache the old rows anew
+    transaction.on_commit(invalidate)
+
+
+@receiver(post_save, sender=NGOInfo)
+@receiver(post_delete, sender=NGOInfo)
+def invalidate_ngo_info_cache(sender, **kwargs):
+    caching.invalidate_ngo_info()
+
+
+@receiver(post_delete, sender=DeviceToken)
+def revoke_cached_token(sender, instance, **kwargs):
+    """Logout and the token sweeper delete tokens; forget them at once"""
+    revoke_token(instance.key)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def revoke_cached_user_tokens(sender, instance, update_fields=None, **kwargs):
+    # Logging in only stamps last_login, which authentication doesn't use
+    if update_fields is not None and set(update_fields) == {'last_login'}:
+        return
+    revoke_user(instance.pk)
+
+
+@receiver(post_save, sender=UserProfile)
+@receiver(post_delete, sender=UserProfile)
+def revoke_cached_profile_tokens(sender, instance, **kwargs):
+    revoke_user(instance.user_id)
+
+
+@receiver(post_migrate)
+def reinstall_search_index(sender, using=DEFAULT_DB_ALIAS, **kwargs):
+    """Migrations that rebuild a SQLite table drop its search triggers"""
+    if sender.name != 'api':
+        return
+    connection = connections[using]
+    if ('api', SEARCH_INDEX_MIGRATION) in MigrationRecorder(connection).applied_migrations():
+        search.install(connection)
@@ -0,0 +1,187 @@
+"""
+Impact statistics served with the NGO information.
+
+Computing them live (counting completed donations, fulfilled help
+requests, distinct donors and the regions with confirmed posts) would
+aggregate over whole tables on every ``NGOInfoView`` miss. Instead each
+figure is an ``ImpactStat`` row, updated from model signals (see
+``signals.py``) by applying deltas the way ``clustering`` maintains its
+grid, so reading the headline figures is one lookup of a few rows.
+
+Distinct counts are kept with sub-counters: ``donor:<user id>`` counts
+one donor's completed donations and ``region:<geohash>`` the confirmed
+posts in one region. ``DONORS`` and ``COMMUNITIES`` change only when a
+sub-counter becomes or stops being zero; zero rows are deleted. The
+region counters are served as they are by ``ImpactRegionView``.
+
+Bulk writes that skip signals must call these functions themselves
+(the post approval admin actions do). ``rebuild()`` (the
+``rebuild_impact_stats`` command) recomputes everything from the source
+tables and can run periodically to correct any drift.
+"""
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Count, F
+from django.utils import timezone
+
+from . import caching
+from .geo import geohash_encode
+from .models import ImpactStat, DonorRequest, HelpRequest, Post
+
+# Geohash length of a region; 4 gives cells of about 39 x 20 km
+REGION_PRECISION = 4
+
+DONOR_KEY = 'donor:{}'
+REGION_KEY = 'region:{}'
+
+# Sub-counter prefixes and the distinct count of their non-zero rows
+_DISTINCT = {
+    DONOR_KEY.format(''): ImpactStat.DONORS,
+    REGION_KEY.format(''): ImpactStat.COMMUNITIES,
+}
+
+
+def _distinct_key(key):
+    for prefix, distinct in _DISTINCT.items():
+        if key.startswith(prefix):
+            return distinct
+    return None
+
+
+def _apply(deltas):
+    """Add ``{key: delta}`` to the counters, keeping the distinct counts in step"""
+    deltas = {key: delta for key, delta in deltas.items() if delta}
+    if not deltas:
+        return
+
+    with transaction.atomic():
+        keys = set(deltas) | {_distinct_key(key) for key in deltas} - {None}
+        _create_keys(keys)
+        # Locked in key order so concurrent updates cannot deadlock
+        existing = {
+            row.key: row.value
+            for row in ImpactStat.objects.select_for_update().filter(key__in=keys).order_by('key')
+        }
+
+        totals = Counter()
+        for key, delta in deltas.items():
+            distinct = _distinct_key(key)
+            totals[key] += delta
+            if distinct is None:
+                continue
+            before = existing[key]
+            if (before > 0) != (before + delta > 0):
+                totals[distinct] += 1 if before + delta > 0 else -1
+
+        now = timezone.now()
+        to_delete = []
+        for key in sorted(keys):
+            value = existing[key] + totals[key]
+            if value <= 0 and _distinct_key(key) is not None:
+                to_delete.append(key)
+            elif totals[key]:
+                ImpactStat.objects.filter(key=key).update(value=F('value') + totals[key], updated_at=now)
+
+        if to_delete:
+            ImpactStat.objects.filter(key__in=to_delete).delete()
+        transaction.on_commit(caching.invalidate_ngo_info)
+
+
+def _create_keys(keys):
+    """
+    Insert empty rows for counters that do not exist yet. Another
+    transaction may create the same key meanwhile, so conflicts are
+    skipped; the rows are then locked and the deltas added in place.
+    """
+    ImpactStat.objects.bulk_create([ImpactStat(key=key, value=0) for key in keys], ignore_conflicts=True)
+
+
+def post_region(is_confirmed, latitude, longitude):
+    """
+    What a post contributes: ``None`` unless it is confirmed, otherwise
+    its region (``''`` when it has no location).
+    """
+    if not is_confirmed:
+        return None
+    if latitude is None or longitude is None:
+        return ''
+    return geohash_encode(latitude, longitude, REGION_PRECISION)
+
+
+def _post_deltas(regions, sign):
+    deltas = Counter()
+    for region in regions:
+        if region is None:
+            continue
+        deltas[ImpactStat.CONFIRMED_POSTS] += sign
+        if region:
+            deltas[REGION_KEY.format(region)] += sign
+    return deltas
+
+
+def move_post(old, new):
+    """Replace the contribution of one post; see ``post_region``"""
+    if old != new:
+        deltas = _post_deltas([old], -1)
+        deltas.update(_post_deltas([new], 1))
+        _apply(deltas)
+
+
+def add_posts(posts):
+    """Count posts that were just confirmed"""
+    _apply(_post_deltas((post_region(True, post.latitude, post.longitude) for post in posts), 1))
+
+
+def remove_posts(posts):
+    """Stop counting posts that are no longer confirmed"""
+    _apply(_post_deltas((post_region(True, post.latitude, post.longitude) for post in posts), -1))
+
+
+def donation_changed(old, new):
+    """``old`` and ``new`` are ``(user_id, status)`` of a donation, or ``None``"""
+    deltas = Counter()
+    for state, sign in ((old, -1), (new, 1)):
+        if state is not None and state[1] == 'completed':
+            deltas[ImpactStat.DONATIONS_COMPLETED] += sign
+            deltas[DONOR_KEY.format(state[0])] += sign
+    _apply(deltas)
+
+
+def help_request_changed(old_status, new_status):
+    fulfilled = (new_status == 'fulfilled') - (old_status == 'fulfilled')
+    _apply({ImpactStat.HELP_REQUESTS_FULFILLED: fulfilled})
+
+
+def regions(limit):
+    """``(geohash, confirmed posts)`` of up to ``limit`` regions, busiest first"""
+    rows = ImpactStat.objects.filter(key__startswith=REGION_KEY.format('')).order_by('-value', 'key')
+    prefix = len(REGION_KEY.format(''))
+    return [(key[prefix:], value) for key, value in rows.values_list('key', 'value')[:limit]]
+
+
+def rebuild():
+    """Recompute every counter from the source tables; returns the row count"""
+    values = Counter()
+    donors = DonorRequest.objects.filter(status='completed').values('user').annotate(donations=Count('id'))
+    for row in donors.iterator():
+        values[DONOR_KEY.format(row['user'])] = row['donations']
+        values[ImpactStat.DONATIONS_COMPLETED] += row['donations']
+        values[ImpactStat.DONORS] += 1
+    values[ImpactStat.HELP_REQUESTS_FULFILLED] = HelpRequest.objects.filter(status='fulfilled').count()
+
+    points = Post.objects.filter(is_confirmed=True).values_list('latitude', 'longitude')
+    for latitude, longitude in points.iterator():
+        region = post_region(True, latitude, longitude)
+        values[ImpactStat.CONFIRMED_POSTS] += 1
+        if region:
+            if not values[REGION_KEY.format(region)]:
+                values[ImpactStat.COMMUNITIES] += 1
+            values[REGION_KEY.format(region)] += 1
+
+    keys = set(values) | set(ImpactStat.HEADLINE)
+    with transaction.atomic():
+        ImpactStat.objects.all().delete()
+        ImpactStat.objects.bulk_create([ImpactStat(key=key, value=values[key]) for key in keys], batch_size=1000)
+        transaction.on_commit(caching.invalidate_ngo_info)
+    return len(keys)
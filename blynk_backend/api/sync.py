@@ -0,0 +1,188 @@
+"""
+Delta sync for offline-first clients.
+
+A client sends the ``change_token`` from its previous sync and receives
+only the rows created or updated since then (by ``updated_at``) and the
+ids of rows deleted since then (from ``Tombstone``). Each collection
+keeps its own ``(timestamp, id)`` positions in the token, one for
+updates and one for deletions, and each is read with a range scan over
+a composite index, like keyset pagination.
+
+Rows written in the last ``SYNC_SETTLE_TIME`` are left for the next
+sync, so a write whose transaction commits after this read cannot end
+up behind the returned token. Tombstones are kept for
+``TOMBSTONE_RETENTION``; an older token gets ``TokenExpired`` and the
+client must start over with a full sync.
+"""
+import base64
+import binascii
+import json
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Post, HelpRequest, VolunteerRequest, DonorRequest, Tombstone
+from .serializers import (
+    PostSerializer, HelpRequestSerializer, VolunteerRequestSerializer, DonorRequestSerializer
+)
+
+# Most updated rows, and most deleted ids, per collection in one response
+SYNC_PAGE_SIZE = 200
+SYNC_SETTLE_TIME = timedelta(seconds=2)
+TOMBSTONE_RETENTION = timedelta(days=90)
+
+
+class InvalidToken(ValueError):
+    """A change token or timestamp that cannot be read"""
+
+
+class TokenExpired(InvalidToken):
+    """The deletions since the token have already been purged"""
+
+
+class Collection:
+    """A synced list: public (posts) or only the user's own rows"""
+
+    def __init__(self, name, model, serializer_class, owned):
+        self.name = name
+        self.model = model
+        self.serializer_class = serializer_class
+        self.owned = owned
+
+    def rows(self, user):
+        queryset = self.model.objects.select_related('user')
+        return queryset.filter(user=user) if self.owned else queryset
+
+    def tombstones(self, user):
+        queryset = Tombstone.objects.filter(collection=self.name)
+        return queryset.filter(owner_id=user.pk) if self.owned else queryset
+
+
+COLLECTIONS = {
+    collection.name: collection for collection in [
+        Collection('posts', Post, PostSerializer, owned=False),
+        Collection('help_requests', HelpRequest, HelpRequestSerializer, owned=True),
+        Collection('volunteer_requests', VolunteerRequest, VolunteerRequestSerializer, owned=True),
+        Collection('donor_requests', DonorRequest, DonorRequestSerializer, owned=True),
+    ]
+}
+
+# Collection name by model, for recording tombstones
+COLLECTION_NAMES = {collection.model: name for name, collection in COLLECTIONS.items()}
+
+
+def encode_token(positions):
+    raw = json.dumps(positions, separators=(',', ':'), sort_keys=True)
+    return base64.urlsafe_b64encode(raw.encode('ascii')).decode('ascii')
+
+
+def _position(value):
+    timestamp, pk = value
+    timestamp = datetime.fromisoformat(timestamp)
+    if timezone.is_naive(timestamp):
+        # Tokens are always written with an offset
+        raise ValueError('Naive timestamp in change token')
+    return timestamp, int(pk)
+
+
+def decode_token(value, now=None):
+    """
+    Positions per collection from a change token, or from a plain ISO
+    timestamp (applied to every collection). ``None`` means full sync.
+    """
+    if not value:
+        return None
+    try:
+        # '+' in an unencoded query string arrives as a space
+        since = datetime.fromisoformat(value.replace(' ', '+'))
+    except ValueError:
+        try:
+            raw = json.loads(base64.urlsafe_b64decode(value.encode('ascii')))
+            positions = {
+                name: {kind: _position(raw[name][kind]) for kind in ('updated', 'deleted')}
+                for name in raw if name in COLLECTIONS
+            }
+        except (TypeError, KeyError, ValueError, UnicodeError, binascii.Error):
+            raise InvalidToken('Invalid change token')
+    else:
+        if timezone.is_naive(since):
+            since = timezone.make_aware(since, dt_timezone.utc)
+        positions = {name: {'updated': (since, 0), 'deleted': (since, 0)} for name in COLLECTIONS}
+
+    oldest = (now or timezone.now()) - TOMBSTONE_RETENTION
+    if any(position['deleted'][0] < oldest for position in positions.values()):
+        raise TokenExpired('Change token expired, a full sync is required')
+    return positions
+
+
+def _page(queryset, field, position, upper):
+    """Rows after ``position`` up to ``upper`` in index order, and the next position"""
+    queryset = queryset.filter(**{f'{field}__lte': upper})
+    if position is not None:
+        timestamp, pk = position
+        queryset = queryset.filter(Q(**{f'{field}__gt': timestamp}) | Q(**{field: timestamp, 'id__gt': pk}))
+    rows = list(queryset.order_by(field, 'id')[:SYNC_PAGE_SIZE + 1])
+    if len(rows) > SYNC_PAGE_SIZE:
+        rows = rows[:SYNC_PAGE_SIZE]
+        last = rows[-1]
+        return rows, (getattr(last, field), last.id), True
+    return rows, (upper, 0), False
+
+
+def changes(user, names, token=None, context=None):
+    """
+    Changes in the ``names`` collections since ``token``; returns
+    ``(changes, next_token, has_more)``. Raises ``InvalidToken``.
+    """
+    now = timezone.now()
+    upper = now - SYNC_SETTLE_TIME
+    positions = decode_token(token, now) or {}
+
+    result, next_positions, has_more = {}, {}, False
+    for name in names:
+        collection = COLLECTIONS[name]
+        position = positions.get(name)
+
+        rows, next_updated, more_rows = _page(
+            collection.rows(user), 'updated_at', position and position['updated'], upper
+        )
+        if position is None:
+            # A full sync sends every live row, so no deletions are needed
+            deleted, next_deleted, more_deleted = [], (upper, 0), False
+        else:
+            tombstones, next_deleted, more_deleted = _page(
+                collection.tombstones(user), 'deleted_at', position['deleted'], upper
+            )
+            deleted = [tombstone.object_id for tombstone in tombstones]
+
+        result[name] = {
+            'updated': collection.serializer_class(rows, many=True, context=context or {}).data,
+            'deleted': deleted,
+        }
+        next_positions[name] = {
+            'updated': [next_updated[0].isoformat(), next_updated[1]],
+            'deleted': [next_deleted[0].isoformat(), next_deleted[1]],
+        }
+        has_more = has_more or more_rows or more_deleted
+
+    # Collections not requested this time keep their positions
+    for name, position in positions.items():
+        if name not in next_positions:
+            next_positions[name] = {kind: [ts.isoformat(), pk] for kind, (ts, pk) in position.items()}
+    return result, encode_token(next_positions), has_more
+
+
+def record_deletion(instance):
+    Tombstone.objects.create(
+        collection=COLLECTION_NAMES[type(instance)],
+        object_id=instance.pk,
+        owner_id=instance.user_id,
+    )
+
+
+def purge_tombstones(now=None):
+    """Delete tombstones past ``TOMBSTONE_RETENTION``; returns how many"""
+    cutoff = (now or timezone.now()) - TOMBSTONE_RETENTION
+    count, _ = Tombstone.objects.filter(deleted_at__lt=cutoff).delete()
+    return count
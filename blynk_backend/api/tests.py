@@ -1,3 +1,1136 @@
-from django.test import TestCase
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+from datetime import timedelta
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.apps import apps
+from django.contrib import admin
+from django.contrib.auth.hashers import PBKDF2SHA1PasswordHasher
+from django.contrib.auth.models import User
+from django.contrib.auth.signals import user_login_failed
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import F, QuerySet
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import AsyncRequestFactory, Client, RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from PIL import Image
+from rest_framework.test import APIClient
+
+from . import caching, clustering, delivery, jobs, matching, media, signals, stats, sync, triage, uploads
+from .async_views import AsyncApprovedPostListView
+from .authentication import MAX_DEVICES_PER_USER, TOKEN_LIFETIME, issue_token, sweep_tokens, token_cache
+from .models import (
+    UserProfile, NGOInfo, VolunteerRequest, DonorRequest, HelpRequest, Post, PostCluster, MediaJob, ImpactStat,
+    DeviceToken, VideoUpload
+)
+
+
+@override_settings(
+    SECURE_SSL_REDIRECT=False,
+    PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'],
+)
+class APITestCase(TestCase):
+    """
+    Base for the tests here: plain HTTP, a fast password hasher, and
+    factories for the rows most tests need.
+    """
+
+    def create_user(self, username, role=None, **fields):
+        user = User.objects.create_user(username, f'{username}@example.com', 'password123', **fields)
+        if role is not None:
+            UserProfile.objects.create(user=user, role=role)
+        return user
+
+    def client_for(self, user):
+        """A client authenticated with a fresh token of ``user``"""
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {issue_token(user).key}')
+        return client
+
+    def create_post(self, user, **fields):
+        return Post.objects.create(user=user, **{'title': 'Post', 'description': 'Description', **fields})
+
+    def create_help_request(self, user, **fields):
+        return HelpRequest.objects.create(
+            user=user, **{'category': 'food', 'title': 'Help', 'description': 'Description', **fields}
+        )
+
+    def create_volunteer_request(self, user, **fields):
+        return VolunteerRequest.objects.create(
+            user=user, **{'skills': 'First aid', 'availability': 'Weekends', 'motivation': 'Help', **fields}
+        )
+
+    def override_settings(self, **settings):
+        """Override settings until the end of this test"""
+        override = override_settings(**settings)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def temporary_directory(self):
+        path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, path, ignore_errors=True)
+        return path
+
+
+class ListQueryCountTests(APITestCase):
+    """
+    Guard against N+1 queries: every list endpoint must issue the same
+    number of queries whatever the size of its result.
+    """
+
+    def setUp(self):
+        self.user = self.create_user('owner', role='volunteer')
+        self.client = self.client_for(self.user)
+        self.created = 0
+
+    def create_posts(self, count):
+        # A different author per post, so a missing join shows up
+        for _ in range(count):
+            self.created += 1
+            author = self.create_user(f'author{self.created}')
+            self.create_post(author, title=f'Post {self.created}', latitude=1.0, longitude=1.0, is_confirmed=True)
+
+    def create_requests(self, count):
+        for i in range(count):
+            self.create_volunteer_request(self.user)
+            DonorRequest.objects.create(user=self.user, donation_type='one_time', amount=10)
+            self.create_help_request(self.user, title=f'Help {i}')
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, response.content)
+        return len(context.captured_queries)
+
+    def assertConstantQueries(self, url, create):
+        # Warm up per-process caches (e.g. the token cache) first
+        self.client.get(url)
+        create(2)
+        small = self.count_queries(url)
+        create(8)
+        large = self.count_queries(url)
+        self.assertEqual(small, large, f'{url} query count grows with result size')
+
+    def test_posts(self):
+        self.assertConstantQueries('/api/posts/', self.create_posts)
+
+    def test_approved_posts(self):
+        self.assertConstantQueries('/api/approved-posts/', self.create_posts)
+
+    def test_approved_posts_bbox(self):
+        self.assertConstantQueries('/api/approved-posts/?bbox=0,0,2,2&zoom=10', self.create_posts)
+
+    def test_nearby_posts(self):
+        self.assertConstantQueries('/api/posts/nearby/?lat=1&lon=1&radius_km=5', self.create_posts)
+
+    def test_volunteer_requests(self):
+        self.assertConstantQueries('/api/volunteer/', self.create_requests)
+
+    def test_donor_requests(self):
+        self.assertConstantQueries('/api/donor/', self.create_requests)
+
+    def test_help_requests(self):
+        self.assertConstantQueries('/api/help-request/', self.create_requests)
+
+
+class PaginationTests(APITestCase):
+    """Keyset cursors on the lists, numbered pages for nearby posts"""
+
+    def setUp(self):
+        self.user = self.create_user('author')
+        self.client = self.client_for(self.user)
+        created_at = timezone.now()
+        self.posts = [self.create_post(self.user, title=f'Post {i}', latitude=1.0, longitude=1.0) for i in range(5)]
+        # Same timestamp for all, so only the id orders them
+        Post.objects.update(created_at=created_at)
+
+    def follow(self, url):
+        """Titles of every page, following the ``Link`` header"""
+        titles = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200, response.content)
+            titles.extend(post['title'] for post in response.data)
+            url = response.get('Link', '').partition('>')[0].lstrip('<') or None
+        return titles
+
+    def test_link_header_follows_ties_in_order(self):
+        expected = [f'Post {i}' for i in reversed(range(5))]
+        self.assertEqual(self.follow('/api/posts/?page_size=2'), expected)
+        self.assertNotIn('Link', self.client.get('/api/posts/').headers)
+
+    def test_next_in_envelope(self):
+        for i in range(3):
+            self.create_help_request(self.user, title=f'Help {i}')
+        first = self.client.get('/api/help-request/', {'page_size': 2})
+        self.assertEqual([row['title'] for row in first.data['requests']], ['Help 2', 'Help 1'])
+        second = self.client.get(first.data['next'])
+        self.assertEqual([row['title'] for row in second.data['requests']], ['Help 0'])
+        self.assertIsNone(second.data['next'])
+
+    def test_bad_cursor(self):
+        self.assertEqual(self.client.get('/api/posts/', {'cursor': 'not-a-cursor'}).status_code, 404)
+
+    def test_nearby_pages(self):
+        near = self.create_post(self.user, title='Nearest', latitude=1.001, longitude=1.001)
+        url = '/api/posts/nearby/?lat=1.001&lon=1.001&radius_km=5&page_size=4'
+        first = self.client.get(url)
+        # Posts at the same distance stay newest first
+        ids = [near.pk] + [post.pk for post in reversed(self.posts)]
+        self.assertEqual([post['id'] for post in first.data['posts']], ids[:4])
+        second = self.client.get(first.data['next'])
+        self.assertEqual([post['id'] for post in second.data['posts']], ids[4:])
+        self.assertIsNone(second.data['next'])
+        self.assertEqual(self.client.get(url + '&page=0').status_code, 400)
+
+
+class ClusteringTests(APITestCase):
+    """Incremental map clusters"""
+
+    def test_cell_created_concurrently_is_added_to(self):
+        # Another transaction created the cell after this one looked for it
+        PostCluster.objects.create(zoom=3, cell_x=1, cell_y=2, count=1, latitude_sum=10.0, longitude_sum=20.0)
+        clustering._create_cells({(3, 1, 2): (2, 4.0, 6.0)})
+        cell = PostCluster.objects.get(zoom=3, cell_x=1, cell_y=2)
+        self.assertEqual((cell.count, cell.latitude_sum, cell.longitude_sum), (3, 14.0, 26.0))
+
+    def test_updated_cell_is_stamped(self):
+        cell = PostCluster.objects.create(zoom=3, cell_x=1, cell_y=2, count=1, latitude_sum=1.0, longitude_sum=1.0)
+        PostCluster.objects.filter(pk=cell.pk).update(updated_at=cell.updated_at - timedelta(days=1))
+        clustering._apply({(3, 1, 2): [1, 1.0, 1.0]})
+        refreshed = PostCluster.objects.get(pk=cell.pk)
+        self.assertEqual(refreshed.count, 2)
+        self.assertGreaterEqual(refreshed.updated_at, cell.updated_at)
+
+    def test_approved_posts_share_a_cell(self):
+        user = self.create_user('author')
+        for _ in range(2):
+            self.create_post(user, latitude=1.0, longitude=1.0, is_confirmed=True)
+        counts = set(PostCluster.objects.values_list('count', flat=True))
+        self.assertEqual(counts, {2})
+        self.assertEqual(clustering.rebuild(), PostCluster.objects.count())
+        self.assertEqual(set(PostCluster.objects.values_list('count', flat=True)), {2})
+
+
+class MediaJobTests(APITestCase):
+    """Photo variants generated through the media job queue"""
+
+    def setUp(self):
+        self.override_settings(MEDIA_ROOT=self.temporary_directory())
+        self.user = self.create_user('author')
+
+    def image(self, color):
+        buffer = BytesIO()
+        Image.new('RGB', (800, 600), color).save(buffer, 'JPEG')
+        return ContentFile(buffer.getvalue(), 'photo.jpg')
+
+    def create_photo_post(self, photo):
+        post = Post(user=self.user, title='Post', description='Description')
+        post.photo.save('photo.jpg', photo, save=False)
+        post.save()
+        jobs.enqueue_post_media(post)
+        return post
+
+    def run_jobs(self):
+        for pk in jobs.claim('test', 10):
+            jobs.run_job(pk)
+
+    def test_variants_are_generated(self):
+        post = self.create_photo_post(self.image('red'))
+        self.assertEqual(Post.objects.get(pk=post.pk).media_status, 'processing')
+        self.run_jobs()
+        post.refresh_from_db()
+        self.assertEqual(post.media_status, 'ready')
+        self.assertEqual(set(post.photo_variants), set(media.PHOTO_VARIANT_SIZES))
+        self.assertFalse(MediaJob.objects.exists())
+
+    def test_inline_runner(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            post = self.create_photo_post(self.image('red'))
+        self.assertEqual(callbacks, [jobs.run_inline])
+        # What the runner's thread does
+        with mock.patch.object(jobs.time, 'sleep') as sleep:
+            jobs.run_pending('test')
+        sleep.assert_not_called()
+        self.assertEqual(Post.objects.get(pk=post.pk).media_status, 'ready')
+
+    def test_inline_runner_waits_for_retries(self):
+        post = self.create_photo_post(ContentFile(b'not an image', 'photo.jpg'))
+
+        def retry_now(seconds):
+            MediaJob.objects.update(run_after=timezone.now())
+
+        with mock.patch.object(jobs.time, 'sleep', side_effect=retry_now) as sleep:
+            jobs.run_pending('test')
+        self.assertEqual(sleep.call_count, jobs.MAX_ATTEMPTS - 1)
+        self.assertEqual(Post.objects.get(pk=post.pk).media_status, 'failed')
+
+    def test_unreadable_photo_is_retried(self):
+        post = self.create_photo_post(ContentFile(b'not an image', 'photo.jpg'))
+        self.run_jobs()
+        job = MediaJob.objects.get()
+        self.assertEqual((job.status, job.attempts), ('queued', 1))
+        self.assertIn('UnidentifiedImageError', job.last_error)
+        self.assertEqual(Post.objects.get(pk=post.pk).media_status, 'processing')
+
+    def test_unreadable_photo_fails_after_last_attempt(self):
+        post = self.create_photo_post(ContentFile(b'not an image', 'photo.jpg'))
+        for _ in range(jobs.MAX_ATTEMPTS):
+            MediaJob.objects.update(run_after=post.created_at)
+            self.run_jobs()
+        self.assertEqual(MediaJob.objects.get().status, 'failed')
+        self.assertEqual(Post.objects.get(pk=post.pk).media_status, 'failed')
+
+    def test_regenerated_variants_get_new_names(self):
+        post = self.create_photo_post(self.image('red'))
+        first = media.generate_photo_variants(post)
+        with post.photo.storage.open(post.photo.name, 'wb') as photo:
+            photo.write(self.image('blue').read())
+        second = media.generate_photo_variants(post)
+        self.assertTrue(set(first.values()).isdisjoint(second.values()))
+        self.assertFalse(any(post.photo.storage.exists(path) for path in first.values()))
+        # The same content keeps its names
+        self.assertEqual(media.generate_photo_variants(post), second)
+
+    def test_replaced_photo_is_regenerated(self):
+        post = self.create_photo_post(self.image('red'))
+        self.run_jobs()
+        post.refresh_from_db()
+        old = post.photo_variants
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client_for(self.user).patch(
+                f'/api/posts/{post.pk}/', {'photo': self.image('blue')}, format='multipart'
+            )
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(response.data['photo_variants'], {})
+        post.refresh_from_db()
+        self.assertEqual((post.photo_variants, post.media_status), ({}, 'processing'))
+        self.assertFalse(any(post.photo.storage.exists(path) for path in old.values()))
+
+        self.run_jobs()
+        post.refresh_from_db()
+        self.assertEqual(post.media_status, 'ready')
+        self.assertEqual(set(post.photo_variants), set(media.PHOTO_VARIANT_SIZES))
+
+    def test_worker_restarts_a_broken_pool(self):
+        post = self.create_photo_post(self.image('red'))
+        pools = []
+
+        class Pool:
+            # The first pool loses its worker process; later ones run jobs here
+            def __init__(self, *args, **kwargs):
+                self.broken = not pools
+                pools.append(self)
+
+            def submit(self, function, *args):
+                future = Future()
+                if self.broken:
+                    future.set_exception(BrokenProcessPool('A worker process died'))
+                else:
+                    future.set_result(function(*args))
+                return future
+
+            def shutdown(self, wait=True, cancel_futures=False):
+                pass
+
+        stderr = StringIO()
+        with mock.patch('api.management.commands.process_media_jobs.ProcessPoolExecutor', Pool):
+            call_command('process_media_jobs', '--burst', stdout=StringIO(), stderr=stderr)
+        self.assertEqual(len(pools), 2)
+        self.assertIn('A worker process died', stderr.getvalue())
+        self.assertEqual(Post.objects.get(pk=post.pk).media_status, 'ready')
+        self.assertFalse(MediaJob.objects.exists())
+
+    def test_variants_of_a_replaced_photo_are_discarded(self):
+        post = self.create_photo_post(self.image('red'))
+        stale = Post.objects.get(pk=post.pk)
+        Post.objects.filter(pk=post.pk).update(photo='posts/other.jpg')
+        self.assertEqual(media.generate_photo_variants(stale), {})
+        self.assertEqual(Post.objects.get(pk=post.pk).photo_variants, {})
+        self.assertEqual(post.photo.storage.listdir(os.path.dirname(post.photo.name))[1], [os.path.basename(post.photo.name)])
+
+
+class TranscodeTests(APITestCase):
+    """Video renditions, with ffmpeg replaced by a stand-in"""
+
+    def setUp(self):
+        self.override_settings(MEDIA_ROOT=self.temporary_directory(), VIDEO_HLS=True)
+        self.post = Post(user=self.create_user('author'), title='Post', description='Description')
+        self.post.video.save('clip.mov', ContentFile(b'original'), save=False)
+        self.post.save()
+        self.storage = self.post.video.storage
+        self.rendition = b'rendition'
+        patch = mock.patch.multiple(media, ffmpeg_binary=mock.Mock(return_value='ffmpeg'), render_video=self.render_video)
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    def render_video(self, binary, source, directory):
+        for name, content in (('rendition.mp4', self.rendition), ('poster.jpg', b'poster')):
+            with open(os.path.join(directory, name), 'wb') as file:
+                file.write(content)
+        hls = os.path.join(directory, 'hls')
+        os.mkdir(hls)
+        for name in ('index.m3u8', 'segment_0000.ts'):
+            with open(os.path.join(hls, name), 'wb') as file:
+                file.write(name.encode())
+        yield 'mp4', os.path.join(directory, 'rendition.mp4')
+        yield 'poster', os.path.join(directory, 'poster.jpg')
+        yield 'hls', hls
+
+    def test_variant_names(self):
+        variants = media.generate_video_variants(self.post)
+        stem = os.path.splitext(self.post.video.name)[0]
+        digest = hashlib.sha256(self.rendition).hexdigest()[:12]
+        self.assertEqual(variants['mp4'], f'{stem}_mp4_{digest}.mp4')
+        self.assertEqual(variants['poster'], f"{stem}_poster_{hashlib.sha256(b'poster').hexdigest()[:12]}.jpg")
+        self.assertEqual(variants['hls'], f'{stem}_hls_{digest}/index.m3u8')
+        self.assertTrue(self.storage.exists(f'{stem}_hls_{digest}/segment_0000.ts'))
+        self.assertEqual(Post.objects.get(pk=self.post.pk).video_variants, variants)
+
+    def test_new_rendition_replaces_old_files(self):
+        first = media.generate_video_variants(self.post)
+        self.rendition = b'new rendition'
+        second = media.generate_video_variants(self.post)
+        self.assertNotEqual(first['hls'], second['hls'])
+        self.assertFalse(self.storage.exists(first['mp4']))
+        self.assertEqual(self.storage.listdir(os.path.dirname(first['hls']))[1], [])
+        # The poster did not change, so its file stays
+        self.assertEqual(first['poster'], second['poster'])
+        self.assertTrue(self.storage.exists(second['poster']))
+
+    def test_replaced_video_is_discarded(self):
+        Post.objects.filter(pk=self.post.pk).update(video='posts/videos/other.mov')
+        self.assertEqual(media.generate_video_variants(self.post), {})
+        self.assertEqual(Post.objects.get(pk=self.post.pk).video_variants, {})
+        stem = os.path.splitext(self.post.video.name)[0]
+        digest = hashlib.sha256(self.rendition).hexdigest()[:12]
+        self.assertEqual(self.storage.listdir(os.path.dirname(stem))[1], [os.path.basename(self.post.video.name)])
+        self.assertEqual(self.storage.listdir(f'{stem}_hls_{digest}')[1], [])
+
+
+class AsyncViewTests(APITestCase):
+    """The ASGI read paths answer like their DRF counterparts"""
+
+    async def test_invalid_cursor(self):
+        request = AsyncRequestFactory().get('/api/approved-posts/', {'cursor': 'zzz'})
+        response = await AsyncApprovedPostListView.as_view()(request)
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(json.loads(response.content), {'detail': 'Invalid cursor'})
+
+
+@override_settings(
+    PASSWORD_HASHERS=[
+        'django.contrib.auth.hashers.MD5PasswordHasher',
+        'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    ],
+)
+class LoginTests(APITestCase):
+    """Logins go through the authentication backends"""
+
+    def setUp(self):
+        self.user = self.create_user('member')
+        self.client = APIClient()
+
+    def login(self, password):
+        return self.client.post('/api/auth/login/', {'username': 'member', 'password': password}, format='json')
+
+    def test_login(self):
+        response = self.login('password123')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertTrue(response.data['token'])
+
+    def test_wrong_password_signals_failure(self):
+        failures = []
+        handler = lambda sender, credentials, **kwargs: failures.append(credentials['username'])
+        user_login_failed.connect(handler)
+        self.addCleanup(user_login_failed.disconnect, handler)
+        self.assertEqual(self.login('wrong').status_code, 401)
+        self.assertEqual(failures, ['member'])
+
+    def test_outdated_hash_is_replaced(self):
+        outdated = PBKDF2SHA1PasswordHasher().encode('password123', 'salt', iterations=1)
+        User.objects.filter(pk=self.user.pk).update(password=outdated)
+        self.assertEqual(self.login('password123').status_code, 200)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith('md5$'))
+
+
+class IdempotencyTests(APITestCase):
+    """Resubmitting an idempotency key returns the stored request"""
+
+    def setUp(self):
+        self.user = self.create_user('member')
+        self.client = self.client_for(self.user)
+
+    def help_request(self, key, title='Water'):
+        return {'category': 'food', 'title': title, 'description': 'Description', 'idempotency_key': key}
+
+    def test_single_replay(self):
+        first = self.client.post('/api/help-request/', self.help_request('k1'), format='json')
+        second = self.client.post('/api/help-request/', self.help_request('k1'), format='json')
+        self.assertEqual((first.status_code, second.status_code), (201, 200))
+        self.assertEqual(first.data['request']['id'], second.data['request']['id'])
+        self.assertEqual(HelpRequest.objects.count(), 1)
+
+    def test_concurrent_single_replay(self):
+        stored = self.create_help_request(self.user, title='Water', idempotency_key='k1')
+        # The other submission commits between the replay check and the insert
+        with mock.patch('api.views.replayed_request', side_effect=[None, stored]):
+            response = self.client.post('/api/help-request/', self.help_request('k1'), format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(response.data['request']['id'], stored.id)
+        self.assertEqual(HelpRequest.objects.count(), 1)
+
+    def test_batch_replay(self):
+        batch = [self.help_request('k1'), self.help_request('k2'), self.help_request(None, 'Unkeyed')]
+        batch[2].pop('idempotency_key')
+        first = self.client.post('/api/help-request/batch/', batch, format='json')
+        self.assertEqual(first.status_code, 201, first.content)
+        second = self.client.post('/api/help-request/batch/', batch[:2] + [self.help_request('k3')], format='json')
+        self.assertEqual(second.status_code, 201)
+        self.assertEqual([result['status'] for result in second.data['results']], ['duplicate', 'duplicate', 'created'])
+        self.assertEqual(
+            [result['request']['id'] for result in second.data['results'][:2]],
+            [result['request']['id'] for result in first.data['results'][:2]],
+        )
+        self.assertEqual(HelpRequest.objects.count(), 4)
+
+
+class SyncTests(APITestCase):
+    """Delta sync tokens"""
+
+    def setUp(self):
+        self.user = self.create_user('member')
+        self.client = self.client_for(self.user)
+        # Read rows as soon as they are written
+        patcher = mock.patch.object(sync, 'SYNC_SETTLE_TIME', timedelta(0))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def sync(self, since=None):
+        params = {'collections': 'help_requests'}
+        if since is not None:
+            params['since'] = since
+        return self.client.get('/api/sync/', params)
+
+    def test_changes_and_deletions(self):
+        kept = self.create_help_request(self.user, title='Kept')
+        first = self.sync()
+        self.assertEqual([row['id'] for row in first.data['changes']['help_requests']['updated']], [kept.id])
+
+        deleted = self.create_help_request(self.user, title='Deleted')
+        deleted_id = deleted.id
+        deleted.delete()
+        second = self.sync(first.data['change_token'])
+        self.assertEqual(second.status_code, 200, second.content)
+        self.assertEqual(second.data['changes']['help_requests'], {'updated': [], 'deleted': [deleted_id]})
+
+    def test_invalid_token(self):
+        response = self.sync('not a token')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(response.data['success'])
+
+    def test_naive_token_timestamp(self):
+        token = sync.encode_token({
+            'help_requests': {'updated': ['2026-01-01T00:00:00', 0], 'deleted': ['2026-01-01T00:00:00', 0]}
+        })
+        self.assertEqual(self.sync(token).status_code, 400)
+
+    def test_naive_since_is_utc(self):
+        self.assertEqual(self.sync(timezone.now().replace(tzinfo=None).isoformat()).status_code, 200)
+
+    def test_expired_token(self):
+        old = (timezone.now() - sync.TOMBSTONE_RETENTION - timedelta(days=1)).isoformat()
+        token = sync.encode_token({'help_requests': {'updated': [old, 0], 'deleted': [old, 0]}})
+        self.assertEqual(self.sync(token).status_code, 410)
+
+
+class APIRootTests(APITestCase):
+    """The API root lists only mounted routes"""
+
+    def test_event_stream_not_listed_under_wsgi(self):
+        client = APIClient()
+        client.force_authenticate(self.create_user('member'))
+        response = client.get('/api/')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('events', response.data['posts'])
+        self.assertEqual(client.get('/api/events/posts/').status_code, 404)
+
+
+class SearchTests(APITestCase):
+    """Ranked full-text search and the index behind it"""
+
+    def setUp(self):
+        self.user = self.create_user('author')
+        self.client = self.client_for(self.user)
+
+    def search_titles(self, query, **params):
+        response = self.client.get('/api/posts/search/', {'q': query, **params})
+        self.assertEqual(response.status_code, 200, response.content)
+        return [post['title'] for post in response.data['posts']]
+
+    def test_titles_rank_above_descriptions(self):
+        self.create_post(self.user, title='Supplies', description='Clean water for the village')
+        self.create_post(self.user, title='Water tank', description='Repairs')
+        self.assertEqual(self.search_titles('water'), ['Water tank', 'Supplies'])
+
+    def test_stemming_and_prefixes(self):
+        self.create_post(self.user, title='Flooded roads')
+        self.assertEqual(self.search_titles('flooding'), ['Flooded roads'])
+        self.assertEqual(self.search_titles('roa'), ['Flooded roads'])
+
+    def test_query_operators_are_inert(self):
+        self.create_post(self.user, title='Water')
+        self.create_post(self.user, title='Food')
+        # Every word must match, so OR is just a word and nothing has it
+        self.assertEqual(self.search_titles('water OR food'), [])
+        self.assertEqual(self.search_titles('water -food'), [])
+        self.assertEqual(self.search_titles('("water*'), ['Water'])
+        self.assertEqual(self.search_titles('*^:'), [])
+
+    def test_index_follows_updates_and_deletes(self):
+        post = self.create_post(self.user, title='Blankets')
+        post.title = 'Tents'
+        post.save()
+        self.assertEqual(self.search_titles('blankets'), [])
+        self.assertEqual(self.search_titles('tents'), ['Tents'])
+        Post.objects.filter(pk=post.pk).update(description='Sleeping bags')
+        self.assertEqual(self.search_titles('sleeping'), ['Tents'])
+        # Fields outside the index leave it alone
+        Post.objects.filter(pk=post.pk).update(is_confirmed=True)
+        self.assertEqual(self.search_titles('tents'), ['Tents'])
+        post.delete()
+        self.assertEqual(self.search_titles('tents'), [])
+
+    def test_pages(self):
+        for number in range(3):
+            self.create_post(self.user, title=f'Water {number}')
+        first = self.client.get('/api/posts/search/', {'q': 'water', 'page_size': 2})
+        self.assertEqual(len(first.data['posts']), 2)
+        second = self.client.get(first.data['next'])
+        self.assertEqual(len(second.data['posts']), 1)
+        self.assertIsNone(second.data['next'])
+        self.assertEqual(self.client.get('/api/posts/search/', {'q': 'water', 'page': 0}).status_code, 400)
+
+    def test_help_requests_of_others_are_staff_only(self):
+        self.create_help_request(self.user, title='Medicine')
+        self.create_help_request(self.create_user('other'), title='Medicine')
+        response = self.client.get('/api/help-request/search/', {'q': 'medicine'})
+        self.assertEqual(len(response.data['requests']), 1)
+        staff = self.client_for(self.create_user('staff', is_staff=True))
+        self.assertEqual(len(staff.get('/api/help-request/search/', {'q': 'medicine'}).data['requests']), 2)
+
+    def test_admin_search(self):
+        match = self.create_post(self.user, title='Water tank')
+        other = self.create_post(self.create_user('water'), title='Food')
+        self.create_post(self.user, title='Food')
+        model_admin = admin.site._registry[Post]
+        results, _ = model_admin.get_search_results(None, Post.objects.all(), 'water')
+        # Full-text matches plus the user of that exact name
+        self.assertEqual(set(results), {match, other})
+
+    def test_triggers_are_reinstalled_after_migrate(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('Only SQLite table rebuilds drop the triggers')
+        with connection.cursor() as cursor:
+            for event in ('insert', 'delete', 'update'):
+                cursor.execute(f'DROP TRIGGER api_post_fts_{event}')
+        signals.reinstall_search_index(sender=apps.get_app_config('api'), using='default')
+        self.create_post(self.user, title='Generator')
+        self.assertEqual(self.search_titles('generator'), ['Generator'])
+
+
+class TriageTests(APITestCase):
+    """The help request queue and claiming from it"""
+
+    def setUp(self):
+        self.owner = self.create_user('owner')
+        self.first = self.create_help_request(
+            self.owner, title='First', urgency='high', latitude=12.34567, longitude=76.54321
+        )
+        self.second = self.create_help_request(self.owner, title='Second', urgency='high')
+
+    def volunteer(self, username, approved=True):
+        user = self.create_user(username, role='volunteer')
+        self.create_volunteer_request(user, status='approved' if approved else 'pending')
+        return user, self.client_for(user)
+
+    def test_volunteer_role_alone_is_forbidden(self):
+        _, client = self.volunteer('newcomer', approved=False)
+        self.assertEqual(client.get('/api/help-request/queue/').status_code, 403)
+        self.assertEqual(client.post('/api/help-request/queue/claim/').status_code, 403)
+
+    def test_queue_omits_requester(self):
+        _, client = self.volunteer('volunteer')
+        response = client.get('/api/help-request/queue/')
+        self.assertEqual(response.status_code, 200, response.content)
+        head = response.data['requests'][0]
+        self.assertEqual(head['id'], self.first.id)
+        self.assertNotIn('user', head)
+        self.assertEqual((head['latitude'], head['longitude']), (12.35, 76.54))
+
+    def test_claim(self):
+        user, client = self.volunteer('volunteer')
+        response = client.post('/api/help-request/queue/claim/')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(response.data['request']['id'], self.first.id)
+        self.first.refresh_from_db()
+        self.assertEqual((self.first.status, self.first.assigned_to_id), ('in_progress', user.id))
+
+    def test_claim_contention(self):
+        winner, _ = self.volunteer('winner')
+        loser, _ = self.volunteer('loser')
+        self.assertEqual(triage.claim_next(winner), self.first)
+        # The loser had picked the same candidate before the winner's update
+        with mock.patch.object(triage, '_lock_candidate', side_effect=[self.first.id, self.second.id]):
+            self.assertEqual(triage.claim_next(loser), self.second)
+        self.first.refresh_from_db()
+        self.assertEqual(self.first.assigned_to_id, winner.id)
+        self.assertIsNone(triage.claim_next(loser))
+
+
+class MatchingTests(APITestCase):
+    """Volunteer matches for help requests, from the in-memory index"""
+
+    def setUp(self):
+        matching.index.clear()
+        self.addCleanup(matching.index.clear)
+        self.client = self.client_for(self.create_user('staff', is_staff=True))
+        self.requester = self.create_user('requester')
+
+    def volunteer(self, username, status='approved', **fields):
+        return self.create_volunteer_request(
+            self.create_user(username), status=status, **{'skills': 'Nurse, first aid', **fields}
+        )
+
+    def matches(self, help_request):
+        response = self.client.get(f'/api/help-request/{help_request.pk}/matches/')
+        self.assertEqual(response.status_code, 200, response.content)
+        return [match['volunteer']['id'] for match in response.data['matches']]
+
+    def test_nearest_first(self):
+        far = self.volunteer('far', latitude=0.3, longitude=0.0)
+        near = self.volunteer('near', latitude=0.01, longitude=0.0)
+        self.volunteer('cook', skills='Cooking')
+        help_request = self.create_help_request(self.requester, category='medical', latitude=0.0, longitude=0.0)
+        response = self.client.get(f'/api/help-request/{help_request.pk}/matches/')
+        self.assertEqual([match['volunteer']['id'] for match in response.data['matches']], [near.pk, far.pk])
+        self.assertEqual(response.data['matches'][0]['distance_km'], 1.1)
+        self.assertIn('medical', response.data['matches'][0]['tags'])
+
+    def test_status_changes_update_the_index(self):
+        volunteer = self.volunteer('nurse', status='pending')
+        help_request = self.create_help_request(self.requester, category='medical')
+        self.assertEqual(self.matches(help_request), [])
+
+        for status, expected in (('approved', [volunteer.pk]), ('rejected', [])):
+            volunteer.status = status
+            with self.captureOnCommitCallbacks(execute=True):
+                volunteer.save()
+            self.assertEqual(self.matches(help_request), expected)
+
+        volunteer.status = 'approved'
+        with self.captureOnCommitCallbacks(execute=True):
+            volunteer.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            volunteer.delete()
+        self.assertEqual(self.matches(help_request), [])
+
+    def test_created_and_closed_requests(self):
+        volunteer = self.volunteer('nurse')
+        help_request = self.create_help_request(self.requester, category='other', title='Need a doctor')
+        self.assertEqual(self.matches(help_request), [volunteer.pk])
+        other = self.create_help_request(self.requester, category='food')
+        self.assertEqual(self.matches(other), [])
+
+        help_request.status = 'fulfilled'
+        help_request.save()
+        self.assertNotIn(help_request.pk, matching.index._results)
+        self.assertEqual(self.client.get(f'/api/help-request/{help_request.pk}/matches/').status_code, 404)
+
+    def test_staff_only(self):
+        help_request = self.create_help_request(self.requester)
+        response = self.client_for(self.requester).get(f'/api/help-request/{help_request.pk}/matches/')
+        self.assertEqual(response.status_code, 403)
+
+
+class DeliveryTests(APITestCase):
+    """Media serving with ranges and revalidation, and response compression"""
+
+    def setUp(self):
+        root = self.temporary_directory()
+        self.override_settings(MEDIA_ROOT=root)
+        with open(os.path.join(root, 'clip.mp4'), 'wb') as file:
+            file.write(b'0123456789')
+        self.client = Client()
+
+    def get(self, **headers):
+        response = self.client.get('/media/clip.mp4', headers=headers)
+        return response, b''.join(response.streaming_content) if response.streaming else response.content
+
+    def test_whole_file(self):
+        response, content = self.get()
+        self.assertEqual((response.status_code, content), (200, b'0123456789'))
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertIn('max-age', response['Cache-Control'])
+
+    def test_ranges(self):
+        for header, content, content_range in (
+            ('bytes=2-4', b'234', 'bytes 2-4/10'),
+            ('bytes=7-', b'789', 'bytes 7-9/10'),
+            ('bytes=8-20', b'89', 'bytes 8-9/10'),
+            # Suffix ranges count from the end
+            ('bytes=-3', b'789', 'bytes 7-9/10'),
+            ('bytes=-20', b'0123456789', 'bytes 0-9/10'),
+        ):
+            response, body = self.get(Range=header)
+            self.assertEqual((response.status_code, body, response['Content-Range']), (206, content, content_range))
+            self.assertEqual(response['Content-Length'], str(len(content)))
+
+    def test_unsatisfiable_ranges(self):
+        for header in ('bytes=10-', 'bytes=-0'):
+            response, _ = self.get(Range=header)
+            self.assertEqual(response.status_code, 416)
+            self.assertEqual(response['Content-Range'], 'bytes */10')
+
+    def test_other_ranges_get_the_whole_file(self):
+        # Several ranges, reversed or malformed ones
+        for header in ('bytes=0-1,4-5', 'bytes=5-2', 'items=0-1', 'bytes=-'):
+            response, content = self.get(Range=header)
+            self.assertEqual((response.status_code, content), (200, b'0123456789'))
+
+    def test_stale_if_range_gets_the_whole_file(self):
+        etag = self.get()[0]['ETag']
+        self.assertEqual(self.get(Range='bytes=0-1', If_Range=etag)[0].status_code, 206)
+        self.assertEqual(self.get(Range='bytes=0-1', If_Range='"stale"')[0].status_code, 200)
+
+    def test_revalidation(self):
+        response, _ = self.get()
+        revalidated, content = self.get(If_None_Match=response['ETag'])
+        self.assertEqual((revalidated.status_code, content), (304, b''))
+        self.assertEqual(revalidated['ETag'], response['ETag'])
+        self.assertEqual(self.get(If_Modified_Since=response['Last-Modified'])[0].status_code, 304)
+
+    def test_missing_file_and_path_traversal(self):
+        self.assertEqual(self.client.get('/media/missing.mp4').status_code, 404)
+        self.assertEqual(self.client.get('/media/..%2F..%2Fetc%2Fpasswd').status_code, 400)
+
+    def compressed(self, response, accept_encoding='gzip, deflate, br'):
+        request = RequestFactory().get('/', headers={'Accept-Encoding': accept_encoding})
+        return delivery.CompressionMiddleware(lambda request: response).process_response(request, response)
+
+    def test_gzip(self):
+        content = json.dumps([{'title': 'Post', 'description': 'Description'}] * 100).encode()
+        response = self.compressed(HttpResponse(content, content_type='application/json', headers={'ETag': '"1"'}))
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.content), content)
+        self.assertEqual(response['Content-Length'], str(len(response.content)))
+        self.assertEqual(response['ETag'], 'W/"1"')
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+
+    def test_brotli_is_preferred_when_installed(self):
+        brotli = mock.Mock(compress=mock.Mock(return_value=b'br'))
+        with mock.patch.object(delivery, 'brotli', brotli):
+            response = self.compressed(HttpResponse(b'{}' * 1000, content_type='application/json'))
+            self.assertEqual((response['Content-Encoding'], response.content), ('br', b'br'))
+            # Unless the client rates it lower
+            response = self.compressed(
+                HttpResponse(b'{}' * 1000, content_type='application/json'), 'br;q=0.5, gzip'
+            )
+            self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIsNone(delivery.choose_encoding('identity, gzip;q=0'))
+
+    def test_left_alone(self):
+        for response in (
+            HttpResponse(b'{}', content_type='application/json'),
+            HttpResponse(b'x' * 2000, content_type='image/png'),
+            StreamingHttpResponse([b'{}' * 1000], content_type='application/json'),
+            HttpResponse(b'{}' * 1000, content_type='application/json', headers={'Cache-Control': 'no-transform'}),
+        ):
+            self.assertNotIn('Content-Encoding', self.compressed(response))
+        # Nothing acceptable to the client
+        self.assertNotIn('Content-Encoding', self.compressed(
+            HttpResponse(b'{}' * 1000, content_type='application/json'), 'identity'
+        ))
+
+
+class ImpactStatTests(APITestCase):
+    """The NGO impact figures come from the live counters"""
+
+    def setUp(self):
+        caching.invalidate_ngo_info()
+        self.addCleanup(caching.invalidate_ngo_info)
+        NGOInfo.objects.create(
+            mission='Mission', description='Description', email='ngo@example.com', phone='1', address='Here'
+        )
+        user = self.create_user('author')
+        for latitude in (1.0, 1.0, 40.0):
+            self.create_post(user, latitude=latitude, longitude=1.0, is_confirmed=True)
+        self.client = APIClient()
+
+    def test_ngo_info(self):
+        response = self.client.get('/api/ngo-info/')
+        self.assertEqual(response.status_code, 200, response.content)
+        ngo_info = response.data['ngo_info']
+        self.assertEqual(ngo_info['communities_served'], 2)
+        self.assertEqual(ngo_info['statistics'][ImpactStat.CONFIRMED_POSTS], 3)
+
+    def test_ngo_info_revalidation(self):
+        etag = self.client.get('/api/ngo-info/')['ETag']
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get('/api/ngo-info/', HTTP_IF_NONE_MATCH=etag, HTTP_AUTHORIZATION='Token ignored')
+        self.assertEqual((response.status_code, response.content), (304, b''))
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(len(context.captured_queries), 0)
+
+    def test_etag_follows_counters(self):
+        etag = self.client.get('/api/ngo-info/')['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create_post(self.create_user('other'), latitude=-30.0, longitude=1.0, is_confirmed=True)
+        response = self.client.get('/api/ngo-info/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.data['ngo_info']['communities_served'], 3)
+
+    def test_regions(self):
+        response = self.client.get('/api/ngo-info/regions/')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual([region['posts'] for region in response.data['regions']], [2, 1])
+        self.assertEqual(self.client.get('/api/ngo-info/regions/', {'limit': 1}).data['regions'][0]['posts'], 2)
+        self.assertEqual(self.client.get('/api/ngo-info/regions/', {'limit': 0}).status_code, 400)
+
+    def test_concurrent_new_key(self):
+        # Another transaction adds the same region after this one looked
+        real_bulk_create = ImpactStat.objects.bulk_create
+
+        def bulk_create(rows, **kwargs):
+            ImpactStat.objects.create(key=stats.REGION_KEY.format('zzzz'), value=1)
+            ImpactStat.objects.filter(key=ImpactStat.COMMUNITIES).update(value=F('value') + 1)
+            return real_bulk_create(rows, **kwargs)
+
+        with mock.patch.object(ImpactStat.objects, 'bulk_create', side_effect=bulk_create):
+            stats._apply({stats.REGION_KEY.format('zzzz'): 1, ImpactStat.CONFIRMED_POSTS: 1})
+
+        values = dict(ImpactStat.objects.values_list('key', 'value'))
+        self.assertEqual(values[stats.REGION_KEY.format('zzzz')], 2)
+        self.assertEqual(values[ImpactStat.COMMUNITIES], 3)
+        self.assertEqual(values[ImpactStat.CONFIRMED_POSTS], 4)
+
+    def test_emptied_region_is_deleted(self):
+        stale = timezone.now() - timedelta(days=1)
+        ImpactStat.objects.update(updated_at=stale)
+        post = Post.objects.get(latitude=40.0)
+        stats.remove_posts([post])
+        values = dict(ImpactStat.objects.values_list('key', 'value'))
+        self.assertEqual(values[ImpactStat.COMMUNITIES], 1)
+        self.assertEqual(len([key for key in values if key.startswith(stats.REGION_KEY.format(''))]), 1)
+        self.assertGreater(ImpactStat.objects.get(key=ImpactStat.CONFIRMED_POSTS).updated_at, stale)
+
+
+class PostApprovalAdminTests(APITestCase):
+    """The admin actions that approve posts in bulk"""
+
+    def setUp(self):
+        user = self.create_user('author')
+        self.posts = [self.create_post(user, latitude=1.0, longitude=1.0) for _ in range(2)]
+        self.model_admin = admin.site._registry[Post]
+        self.request = RequestFactory().post('/admin/api/post/')
+        patch = mock.patch.object(self.model_admin, 'message_user')
+        self.message_user = patch.start()
+        self.addCleanup(patch.stop)
+
+    def confirmed_posts(self):
+        return ImpactStat.objects.get(key=ImpactStat.CONFIRMED_POSTS).value
+
+    def test_approve_and_unapprove(self):
+        self.model_admin.approve_posts(self.request, Post.objects.all())
+        self.assertEqual(self.confirmed_posts(), 2)
+        self.assertEqual(PostCluster.objects.get(zoom=0).count, 2)
+        # Already approved posts are not counted again
+        self.model_admin.approve_posts(self.request, Post.objects.all())
+        self.assertEqual(self.confirmed_posts(), 2)
+        self.message_user.assert_called_with(self.request, '0 posts approved')
+
+        self.model_admin.unapprove_posts(self.request, Post.objects.all())
+        self.assertEqual(self.confirmed_posts(), 0)
+        self.assertFalse(PostCluster.objects.filter(zoom=0, count__gt=0).exists())
+
+    def test_overlapping_approvals_count_once(self):
+        real_only = QuerySet.only
+
+        def only(queryset, *fields):
+            # Another admin approves the first post (and counts it) right
+            # after this action read its selection
+            posts = list(real_only(queryset, *fields))
+            Post.objects.filter(pk=self.posts[0].pk).update(is_confirmed=True)
+            stats.add_posts([self.posts[0]])
+            return posts
+
+        with mock.patch.object(QuerySet, 'only', autospec=True, side_effect=only):
+            self.model_admin.approve_posts(self.request, Post.objects.all())
+        self.assertEqual(self.confirmed_posts(), 2)
+        self.message_user.assert_called_with(self.request, '1 posts approved')
+
+
+class UserListCacheTests(APITestCase):
+    """Revalidating the user's own request lists"""
+
+    def setUp(self):
+        self.user = self.create_user('member')
+        self.client = self.client_for(self.user)
+
+    def assertRevalidates(self):
+        first = self.client.get('/api/help-request/')
+        self.assertEqual(first.status_code, 200, first.content)
+        self.assertEqual(self.client.get('/api/help-request/', HTTP_IF_NONE_MATCH=first['ETag']).status_code, 304)
+
+        # The cache is invalidated once the write commits
+        with self.captureOnCommitCallbacks(execute=True):
+            created = self.client.post(
+                '/api/help-request/', {'category': 'food', 'title': 'Water', 'description': 'Description'}, format='json'
+            )
+        self.assertEqual(created.status_code, 201)
+        after = self.client.get('/api/help-request/', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(after.status_code, 200)
+        self.assertEqual([row['title'] for row in after.data['requests']], ['Water'])
+        self.assertEqual(self.client.get('/api/help-request/', HTTP_IF_NONE_MATCH=after['ETag']).status_code, 304)
+
+    def test_per_process_cache_is_bypassed(self):
+        self.assertFalse(caching.shared_cache())
+        self.assertRevalidates()
+
+    def test_shared_cache(self):
+        self.override_settings(CACHES={
+            'default': {
+                'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+                'LOCATION': self.temporary_directory(),
+            }
+        })
+        self.assertTrue(caching.shared_cache())
+        self.assertRevalidates()
+
+
+class TokenTests(APITestCase):
+    """Per-device tokens and their cache"""
+
+    def setUp(self):
+        token_cache.clear()
+        self.addCleanup(token_cache.clear)
+        self.user = self.create_user('member', role='donor')
+
+    def token_client(self, token):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        return client
+
+    def test_expired_token(self):
+        token = issue_token(self.user)
+        DeviceToken.objects.filter(pk=token.pk).update(expires_at=timezone.now() - timedelta(seconds=1))
+        response = self.token_client(token).get('/api/auth/profile/')
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(str(response.data['detail']), 'Token has expired.')
+
+    def test_cached_token_expires(self):
+        token = issue_token(self.user)
+        client = self.token_client(token)
+        self.assertEqual(client.get('/api/auth/profile/').status_code, 200)
+        later = timezone.now() + TOKEN_LIFETIME + timedelta(seconds=1)
+        with mock.patch('api.authentication.timezone.now', return_value=later):
+            self.assertEqual(client.get('/api/auth/profile/').status_code, 401)
+
+    def test_logout_revokes_cached_token(self):
+        client = self.token_client(issue_token(self.user))
+        self.assertEqual(client.get('/api/auth/profile/').status_code, 200)
+        self.assertEqual(client.post('/api/auth/logout/').status_code, 200)
+        self.assertEqual(client.get('/api/auth/profile/').status_code, 401)
+
+    def test_new_login_replaces_device_token(self):
+        old = self.token_client(issue_token(self.user, 'phone'))
+        other = self.token_client(issue_token(self.user, 'browser'))
+        self.assertEqual(old.get('/api/auth/profile/').status_code, 200)
+        issue_token(self.user, 'phone')
+        self.assertEqual(old.get('/api/auth/profile/').status_code, 401)
+        self.assertEqual(other.get('/api/auth/profile/').status_code, 200)
+
+    def test_deactivated_user(self):
+        client = self.token_client(issue_token(self.user))
+        self.assertEqual(client.get('/api/auth/profile/').status_code, 200)
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(client.get('/api/auth/profile/').status_code, 401)
+
+    def test_sweep(self):
+        expired = issue_token(self.user, 'old')
+        DeviceToken.objects.filter(pk=expired.pk).update(expires_at=timezone.now())
+        for device in range(MAX_DEVICES_PER_USER + 1):
+            issue_token(self.user, f'device{device}')
+        self.assertEqual(sweep_tokens(), (1, 1))
+        self.assertEqual(DeviceToken.objects.filter(user=self.user).count(), MAX_DEVICES_PER_USER)
+
+
+class VideoUploadTests(APITestCase):
+    """Resumable chunked video uploads"""
+
+    def setUp(self):
+        self.override_settings(MEDIA_ROOT=self.temporary_directory(), CHUNKED_UPLOAD_ROOT=self.temporary_directory())
+        self.user = self.create_user('author')
+        self.post = self.create_post(self.user)
+        self.client = self.client_for(self.user)
+        self.video = bytes(range(256)) * ((uploads.MIN_CHUNK_SIZE * 2 + 100) // 256 + 1)
+
+    def start(self):
+        response = self.client.post('/api/uploads/videos/', {
+            'post': self.post.id, 'filename': 'clip.mp4',
+            'total_size': len(self.video), 'chunk_size': uploads.MIN_CHUNK_SIZE,
+        }, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        return f"/api/uploads/videos/{response.data['upload']['id']}/"
+
+    def put_chunk(self, url, index, data=None):
+        if data is None:
+            size = uploads.MIN_CHUNK_SIZE
+            data = self.video[index * size:(index + 1) * size]
+        return self.client.put(f'{url}chunks/{index}/', data, content_type='application/octet-stream')
+
+    def test_resume_after_missing_chunk(self):
+        url = self.start()
+        self.assertEqual(self.put_chunk(url, 0).status_code, 200)
+        self.assertEqual(self.put_chunk(url, 2).status_code, 200)
+
+        response = self.client.post(f'{url}finalize/')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['missing_chunks'], [1])
+        self.assertEqual(self.client.get(url).data['upload']['received_chunks'], [0, 2])
+
+        self.assertEqual(self.put_chunk(url, 1).status_code, 200)
+        response = self.client.post(f'{url}finalize/')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.post.refresh_from_db()
+        with self.post.video.open('rb') as video:
+            self.assertEqual(video.read(), self.video)
+        self.assertEqual(self.client.post(f'{url}finalize/').status_code, 409)
+
+    def test_short_chunk_is_rejected(self):
+        url = self.start()
+        self.assertEqual(self.put_chunk(url, 0, b'short').status_code, 400)
+        self.assertEqual(self.client.get(url).data['upload']['received_chunks'], [])
+
+    def test_stale_upload_is_purged(self):
+        url = self.start()
+        self.assertEqual(self.put_chunk(url, 0).status_code, 200)
+        upload = VideoUpload.objects.get()
+        later = timezone.now() + uploads.UPLOAD_EXPIRY + timedelta(seconds=1)
+        self.assertEqual(uploads.purge_stale_uploads(later), 1)
+        self.assertFalse(VideoUpload.objects.exists())
+        self.assertEqual(uploads.received_chunks(upload), [])
@@ -0,0 +1,32 @@
+"""
+Rate limits for the password endpoints.
+
+Counters live in the default cache, so with ``REDIS_URL`` the limits
+apply across workers and with the per-process cache they apply per
+worker.
+"""
+from rest_framework.throttling import SimpleRateThrottle
+
+
+class LoginIPRateThrottle(SimpleRateThrottle):
+    """Login attempts per client address"""
+    scope = 'login_ip'
+
+    def get_cache_key(self, request, view):
+        return self.cache_format % {'scope': self.scope, 'ident': self.get_ident(request)}
+
+
+class LoginUsernameRateThrottle(SimpleRateThrottle):
+    """Login attempts per username, whichever address they come from"""
+    scope = 'login_username'
+
+    def get_cache_key(self, request, view):
+        username = request.data.get('username') if hasattr(request.data, 'get') else None
+        if not username or not isinstance(username, str):
+            return None
+        return self.cache_format % {'scope': self.scope, 'ident': username.lower()}
+
+
+class RegisterIPRateThrottle(LoginIPRateThrottle):
+    """Registrations per client address"""
+    scope = 'register_ip'
@@ -0,0 +1,147 @@
+"""
+Triage queue of help requests for staff and volunteers.
+
+The queue is ordered by urgency (critical first), then age (oldest
+first). ``urgency`` is stored as text, so ordering by its rank with a
+``CASE`` expression would sort every matching row. Instead each urgency
+level is read in turn with a range scan over
+``(status, urgency, created_at, id)``, or
+``(status, category, urgency, created_at, id)`` with a category filter,
+until the page is full. A page therefore reads about as many index
+entries as it returns, however long the queue is, and the cursor is a
+``(urgency, created_at, id)`` position like keyset pagination.
+
+``claim_next`` hands out the head of the queue. Where the database
+supports it, the candidate row is locked with
+``SELECT ... FOR UPDATE SKIP LOCKED``, so concurrent volunteers each get
+a different row without waiting for one another. The assignment itself
+is an ``UPDATE`` conditional on the row still being open, so a request
+is never assigned twice even without row locks (SQLite); losing a race
+just moves on to the next candidate.
+"""
+import base64
+import binascii
+import json
+from datetime import datetime
+
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from . import caching
+from .models import HelpRequest
+
+# Urgency levels, most urgent first
+URGENCY_ORDER = ('critical', 'high', 'medium', 'low')
+STATUSES = [value for value, _ in HelpRequest._meta.get_field('status').choices]
+CATEGORIES = [value for value, _ in HelpRequest._meta.get_field('category').choices]
+
+QUEUE_PAGE_SIZE = 20
+MAX_QUEUE_PAGE_SIZE = 100
+# Candidates tried when other volunteers keep claiming them first
+CLAIM_ATTEMPTS = 5
+
+
+def _choices(value, allowed, name):
+    values = [item for item in (value or '').split(',') if item]
+    unknown = [item for item in values if item not in allowed]
+    if unknown:
+        raise ValueError(f"Unknown {name}: {', '.join(unknown)}")
+    return values
+
+
+def parse_filters(params):
+    """
+    ``(status, category, urgencies)`` from ``status``, ``category`` and a
+    comma-separated ``urgency``. Raises ``ValueError``.
+    """
+    status = params.get('status') or 'open'
+    if status not in STATUSES:
+        raise ValueError(f'Unknown status: {status}')
+    category = params.get('category') or None
+    if category is not None and category not in CATEGORIES:
+        raise ValueError(f'Unknown category: {category}')
+    urgencies = _choices(params.get('urgency'), URGENCY_ORDER, 'urgency')
+    return status, category, tuple(u for u in URGENCY_ORDER if u in urgencies) or URGENCY_ORDER
+
+
+def encode_cursor(position):
+    urgency, created_at, pk = position
+    raw = json.dumps([urgency, created_at.isoformat(), pk], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('ascii')).decode('ascii')
+
+
+def decode_cursor(value):
+    if not value:
+        return None
+    try:
+        urgency, created_at, pk = json.loads(base64.urlsafe_b64decode(value.encode('ascii')))
+        position = urgency, datetime.fromisoformat(created_at), int(pk)
+    except (TypeError, ValueError, UnicodeError, binascii.Error):
+        raise ValueError('Invalid cursor')
+    if urgency not in URGENCY_ORDER:
+        raise ValueError('Invalid cursor')
+    return position
+
+
+def _levels(status, category, urgencies):
+    queryset = HelpRequest.objects.filter(status=status)
+    if category is not None:
+        queryset = queryset.filter(category=category)
+    for urgency in urgencies:
+        yield urgency, queryset.filter(urgency=urgency).order_by('created_at', 'id')
+
+
+def queue(status='open', category=None, urgencies=URGENCY_ORDER, limit=QUEUE_PAGE_SIZE, position=None):
+    """One page of the queue after ``position``; returns ``(rows, next_position)``"""
+    if position is not None:
+        urgencies = urgencies[urgencies.index(position[0]):] if position[0] in urgencies else ()
+
+    rows = []
+    for urgency, level in _levels(status, category, urgencies):
+        if position is not None and position[0] == urgency:
+            _, created_at, pk = position
+            level = level.filter(Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=pk))
+        rows += level[:limit + 1 - len(rows)]
+        if len(rows) > limit:
+            break
+
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        return rows, (last.urgency, last.created_at, last.id)
+    return rows, None
+
+
+def _lock_candidate(level):
+    if connection.features.has_select_for_update_skip_locked:
+        level = level.select_for_update(skip_locked=True)
+    return level.values_list('id', flat=True).first()
+
+
+def claim_next(user, category=None, urgencies=URGENCY_ORDER):
+    """
+    Assign the most urgent, oldest open request to ``user`` and mark it
+    in progress. Returns it, or ``None`` if the queue is empty.
+    """
+    for _ in range(CLAIM_ATTEMPTS):
+        with transaction.atomic():
+            pk = None
+            for _, level in _levels('open', category, urgencies):
+                pk = _lock_candidate(level)
+                if pk is not None:
+                    break
+            if pk is None:
+                return None
+
+            now = timezone.now()
+            # queryset.update() skips auto_now, so updated_at is set here for sync
+            claimed = HelpRequest.objects.filter(pk=pk, status='open').update(
+                status='in_progress', assigned_to=user, claimed_at=now, updated_at=now
+            )
+        if claimed:
+            help_request = HelpRequest.objects.select_related('user').get(pk=pk)
+            # The owner sees the new status in their list
+            caching.invalidate_user_list('help_requests', help_request.user_id)
+            return help_request
+    return None
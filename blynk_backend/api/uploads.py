@@ -0,0 +1,149 @@
+"""
+Resumable chunked uploads for post videos.
+
+Chunks are streamed from the request straight into numbered part files
+under ``CHUNKED_UPLOAD_ROOT/<upload id>/`` in small blocks, so a chunk
+is never held in memory or copied through a temporary upload file. On
+finalize the parts are concatenated into one file that is then moved
+into media storage as the post's video.
+"""
+import os
+import shutil
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.utils import timezone
+
+from .models import VideoUpload
+
+# Bytes copied per read while streaming a chunk to disk
+STREAM_BLOCK_SIZE = 64 * 1024
+
+DEFAULT_CHUNK_SIZE = 5 * 1024 * 1024
+MIN_CHUNK_SIZE = 256 * 1024
+MAX_CHUNK_SIZE = 10 * 1024 * 1024
+MAX_VIDEO_SIZE = 500 * 1024 * 1024
+
+# Unfinished uploads older than this are removed by purge_stale_uploads
+UPLOAD_EXPIRY = timedelta(days=1)
+
+
+class ChunkError(Exception):
+    """A chunk could not be accepted"""
+
+
+class AssembledFile(File):
+    """
+    A finished upload on local disk. ``temporary_file_path`` lets
+    ``FileSystemStorage`` move it into place instead of copying it.
+    """
+
+    def __init__(self, file, name, path):
+        super().__init__(file, name)
+        self.path = path
+
+    def temporary_file_path(self):
+        return self.path
+
+
+def upload_dir(upload):
+    return os.path.join(settings.CHUNKED_UPLOAD_ROOT, str(upload.id))
+
+
+def chunk_path(upload, index):
+    return os.path.join(upload_dir(upload), f'{index}.part')
+
+
+def received_chunks(upload):
+    """Sorted indexes of the chunks already stored"""
+    try:
+        names = os.listdir(upload_dir(upload))
+    except FileNotFoundError:
+        return []
+    indexes = []
+    for name in names:
+        stem, ext = os.path.splitext(name)
+        if ext == '.part' and stem.isdigit():
+            indexes.append(int(stem))
+    return sorted(indexes)
+
+
+def write_chunk(upload, index, stream):
+    """Stream one chunk to disk, replacing any earlier copy of it"""
+    if not 0 <= index < upload.total_chunks:
+        raise ChunkError(f'Chunk index must be between 0 and {upload.total_chunks - 1}')
+
+    expected = upload.expected_chunk_size(index)
+    os.makedirs(upload_dir(upload), exist_ok=True)
+    final_path = chunk_path(upload, index)
+    partial_path = final_path + '.tmp'
+
+    written = 0
+    try:
+        with open(partial_path, 'wb') as out:
+            while stream is not None and written <= expected:
+                block = stream.read(min(STREAM_BLOCK_SIZE, expected + 1 - written))
+                if not block:
+                    break
+                out.write(block)
+                written += len(block)
+        if written != expected:
+            raise ChunkError(f'Chunk {index} must be {expected} bytes')
+        # Only a complete chunk becomes visible as received
+        os.replace(partial_path, final_path)
+    finally:
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+
+    # Keep active uploads from being purged as stale
+    VideoUpload.objects.filter(pk=upload.pk).update(updated_at=timezone.now())
+
+
+def missing_chunks(upload):
+    received = set(received_chunks(upload))
+    return [index for index in range(upload.total_chunks) if index not in received]
+
+
+def finalize(upload):
+    """Concatenate the chunks and attach the video to the upload's post"""
+    missing = missing_chunks(upload)
+    if missing:
+        raise ChunkError(f'Missing chunks: {missing}')
+
+    directory = upload_dir(upload)
+    assembled_path = os.path.join(directory, 'assembled')
+    with open(assembled_path, 'wb') as out:
+        for index in range(upload.total_chunks):
+            with open(chunk_path(upload, index), 'rb') as part:
+                shutil.copyfileobj(part, out, STREAM_BLOCK_SIZE)
+
+    if os.path.getsize(assembled_path) != upload.total_size:
+        raise ChunkError('Assembled video does not match the declared size')
+
+    post = upload.post
+    with open(assembled_path, 'rb') as assembled:
+        post.video.save(upload.filename, AssembledFile(assembled, upload.filename, assembled_path), save=False)
+    post.save(update_fields=['video', 'updated_at'])
+
+    upload.status = 'complete'
+    upload.save(update_fields=['status', 'updated_at'])
+    discard(upload)
+    return post
+
+
+def discard(upload):
+    """Remove the stored chunks of an upload"""
+    shutil.rmtree(upload_dir(upload), ignore_errors=True)
+
+
+def purge_stale_uploads(now=None):
+    """Delete unfinished uploads past ``UPLOAD_EXPIRY``; returns how many"""
+    cutoff = (now or timezone.now()) - UPLOAD_EXPIRY
+    stale = VideoUpload.objects.filter(status='uploading', updated_at__lt=cutoff)
+    count = 0
+    for upload in stale.iterator():
+        discard(upload)
+        upload.delete()
+        count += 1
+    return count
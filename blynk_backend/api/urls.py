@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from rest_framework.decorators import api_view
@@ -5,14 +6,21 @@ from rest_framework.response import Response
 
 from .views import (
     RegisterView, LoginView, LogoutView, UserProfileView,
-    NGOInfoView, VolunteerRequestView, DonorRequestView,
-    HelpRequestView, ContactMessageView, PostViewSet, ApprovedPostViewSet
+    NGOInfoView, ImpactRegionView, VolunteerRequestView, DonorRequestView,
+    HelpRequestView, HelpRequestQueueView, HelpRequestClaimView, HelpRequestMatchView, HelpRequestSearchView,
+    VolunteerRequestBatchView, DonorRequestBatchView, HelpRequestBatchView,
+    SyncView, ContactMessageView, PostViewSet, ApprovedPostViewSet,
+    VideoUploadView, VideoUploadDetailView, VideoUploadChunkView, VideoUploadFinalizeView
+)
+from .async_views import (
+    AsyncNGOInfoView, AsyncApprovedPostListView, AsyncApprovedPostDetailView, AsyncUserProfileView,
+    PostEventStreamView
 )
 
 # API root view
 @api_view(['GET'])
 def api_root(request):
-    return Response({
+    endpoints = {
         'auth': {
             'register': '/api/auth/register/',
             'login': '/api/auth/login/',
@@ -22,14 +30,33 @@ def api_root(request):
         'posts': {
             'list': '/api/posts/',
             'create': '/api/posts/',
+            'nearby': '/api/posts/nearby/?lat=&lon=&radius_km=',
+            'search': '/api/posts/search/?q=',
             'approved': '/api/posts/approved/',
+            'clusters': '/api/approved-posts/clusters/',
         },
+        'video-uploads': '/api/uploads/videos/',
         'ngo-info': '/api/ngo-info/',
+        'impact-regions': '/api/ngo-info/regions/',
         'volunteer': '/api/volunteer/',
         'donor': '/api/donor/',
         'help-request': '/api/help-request/',
+        'help-request-search': '/api/help-request/search/?q=',
+        'help-request-queue': '/api/help-request/queue/?category=&urgency=',
+        'help-request-claim': '/api/help-request/queue/claim/',
+        'help-request-matches': '/api/help-request/{id}/matches/',
+        'batch': {
+            'volunteer': '/api/volunteer/batch/',
+            'donor': '/api/donor/batch/',
+            'help-request': '/api/help-request/batch/',
+        },
         'contact': '/api/contact/',
-    })
+        'sync': '/api/sync/?since=',
+    }
+    if settings.SERVER_MODE == 'asgi':
+        # Only mounted under ASGI, see below
+        endpoints['posts']['events'] = '/api/events/posts/?bbox='
+    return Response(endpoints)
 
 # Router for ViewSets
 router = DefaultRouter()
@@ -50,15 +77,46 @@ urlpatterns = [
     
     # NGO information
     path('ngo-info/', NGOInfoView.as_view(), name='ngo-info'),
+    path('ngo-info/regions/', ImpactRegionView.as_view(), name='impact-regions'),
     
     # Volunteer, Donor, and Help Request endpoints
     path('volunteer/', VolunteerRequestView.as_view(), name='volunteer'),
     path('donor/', DonorRequestView.as_view(), name='donor'),
     path('help-request/', HelpRequestView.as_view(), name='help-request'),
+    path('help-request/queue/', HelpRequestQueueView.as_view(), name='help-request-queue'),
+    path('help-request/queue/claim/', HelpRequestClaimView.as_view(), name='help-request-claim'),
+    path('help-request/<int:pk>/matches/', HelpRequestMatchView.as_view(), name='help-request-matches'),
+    path('help-request/search/', HelpRequestSearchView.as_view(), name='help-request-search'),
+    path('volunteer/batch/', VolunteerRequestBatchView.as_view(), name='volunteer-batch'),
+    path('donor/batch/', DonorRequestBatchView.as_view(), name='donor-batch'),
+    path('help-request/batch/', HelpRequestBatchView.as_view(), name='help-request-batch'),
+    
+    # Delta sync for offline clients
+    path('sync/', SyncView.as_view(), name='sync'),
     
     # Contact
     path('contact/', ContactMessageView.as_view(), name='contact'),
     
+    # Resumable video uploads
+    path('uploads/videos/', VideoUploadView.as_view(), name='video-upload'),
+    path('uploads/videos/<uuid:upload_id>/', VideoUploadDetailView.as_view(), name='video-upload-detail'),
+    path('uploads/videos/<uuid:upload_id>/chunks/<int:index>/', VideoUploadChunkView.as_view(), name='video-upload-chunk'),
+    path('uploads/videos/<uuid:upload_id>/finalize/', VideoUploadFinalizeView.as_view(), name='video-upload-finalize'),
+    
+]
+
+if settings.SERVER_MODE == 'asgi':
+    # Async read paths take precedence over their sync DRF equivalents
+    urlpatterns = [
+        path('auth/profile/', AsyncUserProfileView.as_view(), name='profile'),
+        path('ngo-info/', AsyncNGOInfoView.as_view(), name='ngo-info'),
+        path('approved-posts/', AsyncApprovedPostListView.as_view(), name='approved-posts-list'),
+        path('approved-posts/<int:pk>/', AsyncApprovedPostDetailView.as_view(), name='approved-posts-detail'),
+        # Long-lived streams would each pin a sync worker, so ASGI only
+        path('events/posts/', PostEventStreamView.as_view(), name='post-events'),
+    ] + urlpatterns
+
+urlpatterns += [
     # Include router URLs
     path('', include(router.urls)),
 ]
@@ -1,31 +1,79 @@
 from rest_framework import status, generics, permissions, viewsets
+from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from rest_framework.authtoken.models import Token
-from django.contrib.auth import authenticate
+from rest_framework.utils.urls import replace_query_param
 from django.contrib.auth.models import User
+from django.db import IntegrityError, transaction
+from django.shortcuts import get_object_or_404
+from django.utils.cache import patch_cache_control, patch_vary_headers
 
 from .models import (
     UserProfile, NGOInfo, VolunteerRequest,
-    DonorRequest, HelpRequest, ContactMessage, Post
+    DonorRequest, HelpRequest, ContactMessage, Post, VideoUpload, DeviceToken
 )
 from .serializers import (
     RegisterSerializer, LoginSerializer, UserSerializer,
     UserProfileSerializer, NGOInfoSerializer, VolunteerRequestSerializer,
-    DonorRequestSerializer, HelpRequestSerializer, ContactMessageSerializer,
-    PostSerializer
+    DonorRequestSerializer, HelpRequestSerializer, HelpRequestTriageSerializer, ContactMessageSerializer,
+    PostSerializer, PostClusterSerializer, VideoUploadSerializer,
+    VolunteerRequestValuesSerializer, DonorRequestValuesSerializer, HelpRequestValuesSerializer,
+    PostValuesSerializer, MapPostValuesSerializer
 )
+from . import caching, clustering, jobs, matching, media, search, stats, sync, triage, uploads
+from .authentication import issue_token
+from .passwords import PasswordPoolBusy, authenticate_user
+from .pagination import KeysetPagination
+from .throttling import LoginIPRateThrottle, LoginUsernameRateThrottle, RegisterIPRateThrottle
+from .geo import (
+    parse_bbox, parse_zoom, parse_viewport, bbox_q, coordinate_precision,
+    geohash_prefixes, geohash_prefix_q, haversine_km
+)
+
+# Upper bound for nearby searches so one request cannot scan the world
+MAX_NEARBY_RADIUS_KM = 500
+# Nearby posts per page, by default and at most
+NEARBY_PAGE_SIZE = 50
+MAX_NEARBY_PAGE_SIZE = 200
+
+# Regions listed by the impact map, by default and at most
+REGION_PAGE_SIZE = 100
+MAX_REGION_PAGE_SIZE = 1000
+
+# Search results per page, by default and at most
+SEARCH_PAGE_SIZE = 20
+MAX_SEARCH_PAGE_SIZE = 100
+
+# Volunteer matches per help request, by default and at most
+MATCH_PAGE_SIZE = 20
+MAX_MATCH_PAGE_SIZE = matching.MATCH_CACHE_DEPTH
+
+# Most items one batch request may carry
+MAX_BATCH_SIZE = 100
+
+# Seconds clients are asked to wait when password hashing is saturated
+PASSWORD_RETRY_AFTER = 5
+
+def password_pool_busy(e):
+    return Response({
+        'success': False,
+        'message': str(e)
+    }, status=status.HTTP_503_SERVICE_UNAVAILABLE, headers={'Retry-After': str(PASSWORD_RETRY_AFTER)})
 
 class RegisterView(APIView):
     """User registration endpoint"""
     permission_classes = [permissions.AllowAny]
+    throttle_classes = [RegisterIPRateThrottle]
     
     def post(self, request):
         serializer = RegisterSerializer(data=request.data)
         if serializer.is_valid():
-            user = serializer.save()
-            # Create a unique token for the new user
-            token = Token.objects.create(user=user)
+            try:
+                user = serializer.save()
+            except PasswordPoolBusy as e:
+                return password_pool_busy(e)
+            # Create a unique token for the device the user registered on
+            token = issue_token(user, serializer.validated_data['device_id'])
             
             return Response({
                 'success': True,
@@ -49,6 +97,7 @@ class RegisterView(APIView):
 class LoginView(APIView):
     """User login endpoint"""
     permission_classes = [permissions.AllowAny]
+    throttle_classes = [LoginIPRateThrottle, LoginUsernameRateThrottle]
     
     def post(self, request):
         serializer = LoginSerializer(data=request.data)
@@ -56,12 +105,14 @@ class LoginView(APIView):
             username = serializer.validated_data['username']
             password = serializer.validated_data['password']
             
-            user = authenticate(username=username, password=password)
+            try:
+                user = authenticate_user(request, username, password)
+            except PasswordPoolBusy as e:
+                return password_pool_busy(e)
             
             if user:
-                # Delete old token if it exists and create a new one for security
-                Token.objects.filter(user=user).delete()
-                token = Token.objects.create(user=user)
+                # Replace this device's token; other devices stay logged in
+                token = issue_token(user, serializer.validated_data['device_id'])
                 
                 return Response({
                     'success': True,
@@ -92,7 +143,9 @@ class LogoutView(APIView):
     permission_classes = [permissions.IsAuthenticated]
     
     def post(self, request):
-        request.user.auth_token.delete()
+        # Only this device's token; session-authenticated requests have none
+        if isinstance(request.auth, DeviceToken):
+            request.auth.delete()
         return Response({
             'success': True,
             'message': 'Logged out successfully'
@@ -110,7 +163,14 @@ class UserProfileView(APIView):
         }, status=status.HTTP_200_OK)
 
 class NGOInfoView(generics.ListAPIView):
-    """Get NGO information"""
+    """
+    Get NGO information
+    
+    The payload is served from cache with a strong ETag, so clients sending
+    a matching ``If-None-Match`` get a bodiless 304 without a database hit.
+    """
+    # Public data: skip authentication so a token header costs no query
+    authentication_classes = []
     permission_classes = [permissions.AllowAny]
     serializer_class = NGOInfoSerializer
     
@@ -118,99 +178,492 @@ class NGOInfoView(generics.ListAPIView):
         return NGOInfo.objects.all()
     
     def list(self, request, *args, **kwargs):
-        queryset = self.get_queryset().first()
-        if queryset:
-            serializer = self.get_serializer(queryset)
+        cached = caching.get_ngo_info()
+        if cached is None:
             return Response({
+                'success': False,
+                'message': 'NGO information not found'
+            }, status=status.HTTP_404_NOT_FOUND)
+        
+        etag, data = cached
+        if caching.etag_matches(request, etag):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = Response({
                 'success': True,
-                'ngo_info': serializer.data
+                'ngo_info': data
             }, status=status.HTTP_200_OK)
+        response['ETag'] = etag
+        patch_cache_control(response, public=True, max_age=caching.NGO_INFO_MAX_AGE)
+        return response
+
+class ImpactRegionView(APIView):
+    """
+    Confirmed posts per region (a geohash of ``stats.REGION_PRECISION``
+    characters), busiest first; the regions behind ``communities_served``
+    """
+    authentication_classes = []
+    permission_classes = [permissions.AllowAny]
+    
+    def get(self, request):
+        try:
+            limit = int(request.query_params.get('limit', REGION_PAGE_SIZE))
+            if limit < 1:
+                raise ValueError('limit must be positive')
+        except ValueError as e:
+            return Response({
+                'success': False,
+                'message': str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
         
-        return Response({
-            'success': False,
-            'message': 'NGO information not found'
-        }, status=status.HTTP_404_NOT_FOUND)
+        response = Response({
+            'success': True,
+            'regions': [
+                {'geohash': geohash, 'posts': posts}
+                for geohash, posts in stats.regions(min(limit, MAX_REGION_PAGE_SIZE))
+            ]
+        }, status=status.HTTP_200_OK)
+        patch_cache_control(response, public=True, max_age=caching.NGO_INFO_MAX_AGE)
+        return response
+
+def replayed_request(model, user, data):
+    """The row an earlier submission with the same idempotency key created"""
+    key = data.get('idempotency_key') if hasattr(data, 'get') else None
+    if not key:
+        return None
+    return model.objects.filter(user=user, idempotency_key=key).select_related('user').first()
+
+def save_request(serializer, user):
+    """
+    Store a validated request for ``user``. Returns ``None``, or the row
+    a concurrent submission with the same idempotency key stored first.
+    """
+    try:
+        with transaction.atomic():
+            serializer.save(user=user)
+    except IntegrityError:
+        existing = replayed_request(serializer.Meta.model, user, serializer.validated_data)
+        if existing is None:
+            raise
+        return existing
+    return None
+
+class IsStaffOrApprovedVolunteer(permissions.BasePermission):
+    """
+    Staff, and users with an approved volunteer request. The profile role
+    is chosen at signup, so it grants nothing by itself.
+    """
+    
+    def has_permission(self, request, view):
+        user = request.user
+        if not (user and user.is_authenticated):
+            return False
+        if user.is_staff:
+            return True
+        return VolunteerRequest.objects.filter(user=user, status='approved').exists()
+
+def page_params(request, page_size, max_page_size):
+    """
+    ``(page, page_size)`` of a numbered page from the query string.
+    Raises ``ValueError`` for a bad ``page`` or ``page_size``.
+    """
+    page = int(request.query_params.get('page', 1))
+    page_size = int(request.query_params.get('page_size', page_size))
+    if page < 1 or page_size < 1:
+        raise ValueError('page and page_size must be positive')
+    return page, min(page_size, max_page_size)
+
+def ranked_search(request, queryset, owner_id=None):
+    """
+    One page of ``search.search`` results for ``?q=`` as instances of
+    ``queryset``, best match first, and the link to the next page.
+    Raises ``ValueError`` for a bad ``page`` or ``page_size``.
+    """
+    page, page_size = page_params(request, SEARCH_PAGE_SIZE, MAX_SEARCH_PAGE_SIZE)
+    hits = search.search(
+        queryset.model, request.query_params.get('q', ''), owner_id=owner_id,
+        limit=page_size + 1, offset=(page - 1) * page_size
+    )
+    next_link = None
+    if len(hits) > page_size:
+        hits = hits[:page_size]
+        next_link = replace_query_param(request.build_absolute_uri(), 'page', page + 1)
+    rows = queryset.in_bulk([pk for pk, _ in hits])
+    return [rows[pk] for pk, _ in hits if pk in rows], next_link
+
+def user_list_response(request, view, model, serializer_class):
+    """
+    A page of the user's own rows of ``model``, from the per-user cache.
+    Clients revalidate with ``If-None-Match`` and get a 304 if unchanged.
+    """
+    def build():
+        paginator = KeysetPagination()
+        serializer = serializer_class()
+        rows = paginator.paginate_queryset(
+            serializer.values(model.objects.filter(user=request.user)), request, view=view
+        )
+        return {
+            'success': True,
+            'requests': serializer.to_list(rows),
+            'next': paginator.get_next_link()
+        }
+    
+    etag, payload = caching.get_user_list(sync.COLLECTION_NAMES[model], request, build)
+    if caching.etag_matches(request, etag):
+        response = Response(status=status.HTTP_304_NOT_MODIFIED)
+    else:
+        response = Response(payload, status=status.HTTP_200_OK)
+    response['ETag'] = etag
+    patch_cache_control(response, private=True, no_cache=True)
+    patch_vary_headers(response, ('Authorization',))
+    return response
 
 class VolunteerRequestView(APIView):
     """Create and list volunteer requests"""
     permission_classes = [permissions.IsAuthenticated]
     
     def get(self, request):
-        requests = VolunteerRequest.objects.filter(user=request.user)
-        serializer = VolunteerRequestSerializer(requests, many=True)
+        return user_list_response(request, self, VolunteerRequest, VolunteerRequestValuesSerializer)
+    
+    def post(self, request):
+        existing = replayed_request(VolunteerRequest, request.user, request.data)
+        if existing is None:
+            serializer = VolunteerRequestSerializer(data=request.data)
+            if not serializer.is_valid():
+                return Response({
+                    'success': False,
+                    'errors': serializer.errors
+                }, status=status.HTTP_400_BAD_REQUEST)
+            
+            existing = save_request(serializer, request.user)
+            if existing is None:
+                return Response({
+                    'success': True,
+                    'message': 'Volunteer request submitted successfully',
+                    'request': serializer.data
+                }, status=status.HTTP_201_CREATED)
+        
         return Response({
             'success': True,
-            'requests': serializer.data
+            'message': 'Volunteer request already submitted',
+            'request': VolunteerRequestSerializer(existing).data
         }, status=status.HTTP_200_OK)
+
+class DonorRequestView(APIView):
+    """Create and list donor requests"""
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def get(self, request):
+        return user_list_response(request, self, DonorRequest, DonorRequestValuesSerializer)
     
     def post(self, request):
-        serializer = VolunteerRequestSerializer(data=request.data)
-        if serializer.is_valid():
-            serializer.save(user=request.user)
-            return Response({
-                'success': True,
-                'message': 'Volunteer request submitted successfully',
-                'request': serializer.data
-            }, status=status.HTTP_201_CREATED)
+        existing = replayed_request(DonorRequest, request.user, request.data)
+        if existing is None:
+            serializer = DonorRequestSerializer(data=request.data)
+            if not serializer.is_valid():
+                return Response({
+                    'success': False,
+                    'errors': serializer.errors
+                }, status=status.HTTP_400_BAD_REQUEST)
+            
+            existing = save_request(serializer, request.user)
+            if existing is None:
+                return Response({
+                    'success': True,
+                    'message': 'Donation request submitted successfully',
+                    'request': serializer.data
+                }, status=status.HTTP_201_CREATED)
         
         return Response({
-            'success': False,
-            'errors': serializer.errors
-        }, status=status.HTTP_400_BAD_REQUEST)
+            'success': True,
+            'message': 'Donor request already submitted',
+            'request': DonorRequestSerializer(existing).data
+        }, status=status.HTTP_200_OK)
 
-class DonorRequestView(APIView):
-    """Create and list donor requests"""
+class HelpRequestView(APIView):
+    """Create and list help requests"""
     permission_classes = [permissions.IsAuthenticated]
     
     def get(self, request):
-        requests = DonorRequest.objects.filter(user=request.user)
-        serializer = DonorRequestSerializer(requests, many=True)
+        return user_list_response(request, self, HelpRequest, HelpRequestValuesSerializer)
+    
+    def post(self, request):
+        existing = replayed_request(HelpRequest, request.user, request.data)
+        if existing is None:
+            serializer = HelpRequestSerializer(data=request.data)
+            if not serializer.is_valid():
+                return Response({
+                    'success': False,
+                    'errors': serializer.errors
+                }, status=status.HTTP_400_BAD_REQUEST)
+            
+            existing = save_request(serializer, request.user)
+            if existing is None:
+                return Response({
+                    'success': True,
+                    'message': 'Help request submitted successfully',
+                    'request': serializer.data
+                }, status=status.HTTP_201_CREATED)
+        
         return Response({
             'success': True,
-            'requests': serializer.data
+            'message': 'Help request already submitted',
+            'request': HelpRequestSerializer(existing).data
         }, status=status.HTTP_200_OK)
+
+class HelpRequestQueueView(APIView):
+    """
+    Triage queue of help requests, most urgent first and oldest first
+    within each urgency. Filters: ``status`` (default open),
+    ``category`` and a comma-separated ``urgency``.
+    """
+    permission_classes = [IsStaffOrApprovedVolunteer]
+    
+    def get(self, request):
+        try:
+            status_filter, category, urgencies = triage.parse_filters(request.query_params)
+            position = triage.decode_cursor(request.query_params.get('cursor'))
+            limit = int(request.query_params.get('page_size', triage.QUEUE_PAGE_SIZE))
+            if limit < 1:
+                raise ValueError('page_size must be positive')
+        except ValueError as e:
+            return Response({
+                'success': False,
+                'message': str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        requests, next_position = triage.queue(
+            status_filter, category, urgencies, min(limit, triage.MAX_QUEUE_PAGE_SIZE), position
+        )
+        next_link = None
+        if next_position is not None:
+            next_link = replace_query_param(
+                request.build_absolute_uri(), 'cursor', triage.encode_cursor(next_position)
+            )
+        serializer = HelpRequestTriageSerializer(requests, many=True)
+        return Response({
+            'success': True,
+            'requests': serializer.data,
+            'next': next_link
+        }, status=status.HTTP_200_OK)
+
+class HelpRequestClaimView(APIView):
+    """Claim the head of the triage queue, optionally within a ``category`` or ``urgency``"""
+    permission_classes = [IsStaffOrApprovedVolunteer]
     
     def post(self, request):
-        serializer = DonorRequestSerializer(data=request.data)
-        if serializer.is_valid():
-            serializer.save(user=request.user)
+        try:
+            _, category, urgencies = triage.parse_filters(request.data)
+        except ValueError as e:
             return Response({
-                'success': True,
-                'message': 'Donation request submitted successfully',
-                'request': serializer.data
-            }, status=status.HTTP_201_CREATED)
+                'success': False,
+                'message': str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
         
+        help_request = triage.claim_next(request.user, category, urgencies)
+        if help_request is None:
+            return Response({
+                'success': False,
+                'message': 'No open help requests to claim'
+            }, status=status.HTTP_404_NOT_FOUND)
         return Response({
-            'success': False,
-            'errors': serializer.errors
-        }, status=status.HTTP_400_BAD_REQUEST)
+            'success': True,
+            'request': HelpRequestSerializer(help_request).data
+        }, status=status.HTTP_200_OK)
 
-class HelpRequestView(APIView):
-    """Create and list help requests"""
+class HelpRequestMatchView(APIView):
+    """Approved volunteers best suited to an open help request (staff only)"""
+    permission_classes = [permissions.IsAdminUser]
+    
+    def get(self, request, pk):
+        help_request = get_object_or_404(HelpRequest.objects.select_related('user'), pk=pk, status='open')
+        try:
+            limit = int(request.query_params.get('limit', MATCH_PAGE_SIZE))
+            if limit < 1:
+                raise ValueError('limit must be positive')
+        except ValueError as e:
+            return Response({
+                'success': False,
+                'message': str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        matches = matching.index.match(help_request, min(limit, MAX_MATCH_PAGE_SIZE))
+        volunteers = VolunteerRequest.objects.select_related('user').in_bulk(
+            [match.volunteer_id for match in matches]
+        )
+        return Response({
+            'success': True,
+            'request': HelpRequestSerializer(help_request).data,
+            'matches': [{
+                'volunteer': VolunteerRequestSerializer(volunteers[match.volunteer_id]).data,
+                'score': round(match.score, 3),
+                'tags': match.tags,
+                'distance_km': None if match.distance_km is None else round(match.distance_km, 1)
+            } for match in matches if match.volunteer_id in volunteers]
+        }, status=status.HTTP_200_OK)
+
+class HelpRequestSearchView(APIView):
+    """Ranked full-text search over help requests (staff see everyone's)"""
     permission_classes = [permissions.IsAuthenticated]
     
     def get(self, request):
-        requests = HelpRequest.objects.filter(user=request.user)
+        owner_id = None if request.user.is_staff else request.user.id
+        try:
+            requests, next_link = ranked_search(
+                request, HelpRequest.objects.select_related('user'), owner_id=owner_id
+            )
+        except ValueError as e:
+            return Response({
+                'success': False,
+                'message': str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
         serializer = HelpRequestSerializer(requests, many=True)
         return Response({
             'success': True,
-            'requests': serializer.data
+            'requests': serializer.data,
+            'next': next_link
         }, status=status.HTTP_200_OK)
+
+class BatchCreateView(APIView):
+    """
+    Create many requests of one kind in a single transaction.
+
+    The body is a JSON array of items shaped like the single-item POST.
+    Items whose ``idempotency_key`` the user already submitted are not
+    stored again; their result carries the existing row instead.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    model = None
+    serializer_class = None
     
     def post(self, request):
-        serializer = HelpRequestSerializer(data=request.data)
-        if serializer.is_valid():
-            serializer.save(user=request.user)
+        items = request.data
+        if not isinstance(items, list) or not items:
             return Response({
-                'success': True,
-                'message': 'Help request submitted successfully',
-                'request': serializer.data
-            }, status=status.HTTP_201_CREATED)
+                'success': False,
+                'message': 'Expected a non-empty JSON array of items'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        if len(items) > MAX_BATCH_SIZE:
+            return Response({
+                'success': False,
+                'message': f'At most {MAX_BATCH_SIZE} items per batch'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        serializer = self.serializer_class(data=items, many=True)
+        if not serializer.is_valid():
+            return Response({
+                'success': False,
+                'errors': serializer.errors
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        for attempt in range(2):
+            try:
+                with transaction.atomic():
+                    results = self.create_items(request.user, serializer.validated_data)
+                break
+            except IntegrityError:
+                # A concurrent replay stored some keys first; the retry
+                # reports those items as duplicates
+                if attempt:
+                    raise
         
+        created = any(result['status'] == 'created' for result in results)
         return Response({
-            'success': False,
-            'errors': serializer.errors
-        }, status=status.HTTP_400_BAD_REQUEST)
+            'success': True,
+            'results': results
+        }, status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
+    
+    def create_items(self, user, items):
+        keys = {item['idempotency_key'] for item in items if item.get('idempotency_key')}
+        stored = {}
+        if keys:
+            stored = {
+                row.idempotency_key: row
+                for row in self.model.objects.filter(user=user, idempotency_key__in=keys).select_related('user')
+            }
+        
+        rows, new_rows = [], []
+        for item in items:
+            key = item.get('idempotency_key')
+            if key in stored:
+                rows.append((stored[key], 'duplicate'))
+                continue
+            row = self.model(user=user, **item)
+            if key:
+                # The same key may repeat within the batch
+                stored[key] = row
+            rows.append((row, 'created'))
+            new_rows.append(row)
+        self.model.objects.bulk_create(new_rows)
+        if new_rows:
+            # bulk_create sends no post_save
+            collection = sync.COLLECTION_NAMES[self.model]
+            transaction.on_commit(lambda: caching.invalidate_user_list(collection, user.pk))
+        
+        data = self.serializer_class([row for row, _ in rows], many=True).data
+        return [
+            {'index': index, 'status': result, 'request': item}
+            for index, ((_, result), item) in enumerate(zip(rows, data))
+        ]
+
+class VolunteerRequestBatchView(BatchCreateView):
+    """Submit many volunteer requests at once"""
+    model = VolunteerRequest
+    serializer_class = VolunteerRequestSerializer
+
+class DonorRequestBatchView(BatchCreateView):
+    """Submit many donor requests at once"""
+    model = DonorRequest
+    serializer_class = DonorRequestSerializer
+
+class HelpRequestBatchView(BatchCreateView):
+    """Submit many help requests at once, e.g. queued while offline"""
+    model = HelpRequest
+    serializer_class = HelpRequestSerializer
+
+class SyncView(APIView):
+    """
+    Changes since the client's last sync, for offline-first clients.
+
+    ``since`` is the ``change_token`` of the previous response (or an ISO
+    timestamp); without it every row is sent. ``collections`` limits the
+    response to some of ``sync.COLLECTIONS``. While ``has_more`` is true
+    the client should call again with the new token straight away.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def get(self, request):
+        names = request.query_params.get('collections')
+        names = names.split(',') if names else list(sync.COLLECTIONS)
+        unknown = [name for name in names if name not in sync.COLLECTIONS]
+        if unknown:
+            return Response({
+                'success': False,
+                'message': f"Unknown collections: {', '.join(unknown)}"
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            changes, token, has_more = sync.changes(
+                request.user, names, request.query_params.get('since'), context={'request': request}
+            )
+        except sync.TokenExpired as e:
+            return Response({
+                'success': False,
+                'message': str(e)
+            }, status=status.HTTP_410_GONE)
+        except sync.InvalidToken as e:
+            return Response({
+                'success': False,
+                'message': str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response({
+            'success': True,
+            'changes': changes,
+            'change_token': token,
+            'has_more': has_more
+        }, status=status.HTTP_200_OK)
 
 class ContactMessageView(APIView):
     """Submit contact messages"""
@@ -236,15 +689,259 @@ class PostViewSet(viewsets.ModelViewSet):
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
     
     def get_queryset(self):
-        return Post.objects.all().order_by('-created_at')
+        return Post.objects.select_related('user').order_by('-created_at', '-id')
+    
+    def list(self, request, *args, **kwargs):
+        serializer = PostValuesSerializer(context=self.get_serializer_context())
+        page = self.paginate_queryset(serializer.values(self.get_queryset()))
+        return self.get_paginated_response(serializer.to_list(page))
     
     def perform_create(self, serializer):
-        serializer.save(user=self.request.user)
+        post = serializer.save(user=self.request.user)
+        # Variants and other media work run as queued media jobs
+        jobs.enqueue_post_media(post)
+    
+    def perform_update(self, serializer):
+        # A new photo or video makes its variants stale; they are dropped
+        # and regenerated by a fresh media job
+        replaced = [field for field in ('photo', 'video') if field in serializer.validated_data]
+        stale = {f'{field}_variants': getattr(serializer.instance, f'{field}_variants') for field in replaced}
+        post = serializer.save(**{name: {} for name in stale})
+        jobs.enqueue(post, jobs.post_job_kinds(post, replaced))
+        transaction.on_commit(lambda: media.delete_variants(post, **stale))
+    
+    @action(detail=False, methods=['get'])
+    def nearby(self, request):
+        """Posts within ``radius_km`` of ``lat``/``lon``, nearest first, in numbered pages"""
+        try:
+            lat = float(request.query_params['lat'])
+            lon = float(request.query_params['lon'])
+            radius_km = float(request.query_params.get('radius_km', 10))
+        except (KeyError, ValueError):
+            return Response({
+                'success': False,
+                'message': 'lat and lon are required and must be numbers'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        if not (-90 <= lat <= 90 and -180 <= lon <= 180) or not (0 < radius_km <= MAX_NEARBY_RADIUS_KM):
+            return Response({
+                'success': False,
+                'message': f'lat/lon must be valid coordinates and radius_km between 0 and {MAX_NEARBY_RADIUS_KM}'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            page, page_size = page_params(request, NEARBY_PAGE_SIZE, MAX_NEARBY_PAGE_SIZE)
+        except ValueError as e:
+            return Response({
+                'success': False,
+                'message': str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        # Narrow to a few geohash prefix ranges, then check exact distances
+        candidates = self.get_queryset().filter(geohash__isnull=False)
+        prefixes = geohash_prefixes(lat, lon, radius_km)
+        if prefixes:
+            candidates = candidates.filter(geohash_prefix_q(prefixes))
+        
+        matches = []
+        for post in candidates:
+            distance = haversine_km(lat, lon, post.latitude, post.longitude)
+            if distance <= radius_km:
+                matches.append((distance, post))
+        # Ties (e.g. posts at the same spot) keep the list order, newest first
+        matches.sort(key=lambda match: match[0])
+        
+        # Numbered pages of the distance ordering; the keyset cursor only
+        # follows (created_at, id)
+        next_link = None
+        start = (page - 1) * page_size
+        if len(matches) > start + page_size:
+            next_link = replace_query_param(request.build_absolute_uri(), 'page', page + 1)
+        matches = matches[start:start + page_size]
+        
+        serializer = self.get_serializer([post for _, post in matches], many=True)
+        posts = serializer.data
+        for item, (distance, _) in zip(posts, matches):
+            item['distance_km'] = round(distance, 3)
+        return Response({
+            'success': True,
+            'posts': posts,
+            'next': next_link
+        }, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        """Ranked full-text search over post titles and descriptions"""
+        try:
+            posts, next_link = ranked_search(request, self.get_queryset())
+        except ValueError as e:
+            return Response({
+                'success': False,
+                'message': str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        serializer = self.get_serializer(posts, many=True)
+        return Response({
+            'success': True,
+            'posts': serializer.data,
+            'next': next_link
+        }, status=status.HTTP_200_OK)
 
 class ApprovedPostViewSet(viewsets.ReadOnlyModelViewSet):
-    """Read-only viewset for approved posts (for map)"""
+    """
+    Read-only viewset for approved posts (for map)
+    
+    Pass ``bbox=minLon,minLat,maxLon,maxLat`` (and optionally ``zoom``) to
+    only get the posts inside the map viewport, as slim marker objects.
+    Use ``clusters/?zoom=`` for pre-aggregated markers at low zoom levels.
+    """
     serializer_class = PostSerializer
     permission_classes = [permissions.AllowAny]
     
     def get_queryset(self):
-        return Post.objects.filter(is_confirmed=True).order_by('-created_at')
+        return Post.objects.filter(is_confirmed=True).select_related('user').order_by('-created_at', '-id')
+    
+    def list(self, request, *args, **kwargs):
+        bbox = request.query_params.get('bbox')
+        if bbox is None:
+            serializer = PostValuesSerializer(context=self.get_serializer_context())
+            page = self.paginate_queryset(serializer.values(self.get_queryset()))
+            return self.get_paginated_response(serializer.to_list(page))
+        
+        try:
+            bounds, zoom = parse_viewport(request.query_params)
+        except ValueError as e:
+            return Response({
+                'success': False,
+                'message': str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        context = self.get_serializer_context()
+        if zoom is not None:
+            context['coordinate_precision'] = coordinate_precision(zoom)
+        # The slim projection has no nested user, so no join
+        serializer = MapPostValuesSerializer(context=context)
+        page = self.paginate_queryset(serializer.values(self.get_queryset().filter(bbox_q(*bounds))))
+        return self.get_paginated_response(serializer.to_list(page))
+    
+    @action(detail=False, methods=['get'])
+    def clusters(self, request):
+        """Precomputed marker clusters (centroid and count per grid cell)"""
+        try:
+            zoom = parse_zoom(request.query_params.get('zoom'))
+            bbox = request.query_params.get('bbox')
+            bbox = parse_bbox(bbox) if bbox is not None else None
+        except ValueError as e:
+            return Response({
+                'success': False,
+                'message': str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        zoom, queryset = clustering.clusters_for(zoom, bbox)
+        serializer = PostClusterSerializer(queryset, many=True)
+        return Response({
+            'success': True,
+            'zoom': zoom,
+            'clusters': serializer.data
+        }, status=status.HTTP_200_OK)
+
+
+class VideoUploadView(APIView):
+    """
+    Start a resumable chunked video upload for one of the user's posts
+    
+    Send each chunk as the raw body of ``PUT chunks/<index>/`` (0-based,
+    ``chunk_size`` bytes except the last), then ``POST finalize/``. After a
+    dropped connection, ``GET`` the upload to see which chunks arrived.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def post(self, request):
+        serializer = VideoUploadSerializer(data=request.data, context={'request': request})
+        if serializer.is_valid():
+            serializer.save(user=request.user)
+            return Response({
+                'success': True,
+                'upload': serializer.data
+            }, status=status.HTTP_201_CREATED)
+        
+        return Response({
+            'success': False,
+            'errors': serializer.errors
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+class VideoUploadDetailView(APIView):
+    """Get the progress of a video upload, or abort it"""
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def get(self, request, upload_id):
+        upload = get_object_or_404(VideoUpload, pk=upload_id, user=request.user)
+        return Response({
+            'success': True,
+            'upload': VideoUploadSerializer(upload).data
+        }, status=status.HTTP_200_OK)
+    
+    def delete(self, request, upload_id):
+        upload = get_object_or_404(VideoUpload, pk=upload_id, user=request.user)
+        uploads.discard(upload)
+        upload.delete()
+        return Response({
+            'success': True,
+            'message': 'Upload cancelled'
+        }, status=status.HTTP_200_OK)
+
+class VideoUploadChunkView(APIView):
+    """Receive one chunk of a video upload as the raw request body"""
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def put(self, request, upload_id, index):
+        upload = get_object_or_404(VideoUpload, pk=upload_id, user=request.user)
+        if upload.status != 'uploading':
+            return Response({
+                'success': False,
+                'message': 'Upload is already complete'
+            }, status=status.HTTP_409_CONFLICT)
+        
+        # Read the body stream directly; request.data would buffer it
+        try:
+            uploads.write_chunk(upload, index, request.stream)
+        except uploads.ChunkError as e:
+            return Response({
+                'success': False,
+                'message': str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response({
+            'success': True,
+            'index': index,
+            'received_chunks': uploads.received_chunks(upload)
+        }, status=status.HTTP_200_OK)
+
+class VideoUploadFinalizeView(APIView):
+    """Assemble the uploaded chunks and attach the video to the post"""
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def post(self, request, upload_id):
+        upload = get_object_or_404(VideoUpload.objects.select_related('post'), pk=upload_id, user=request.user)
+        if upload.status != 'uploading':
+            return Response({
+                'success': False,
+                'message': 'Upload is already complete'
+            }, status=status.HTTP_409_CONFLICT)
+        
+        try:
+            post = uploads.finalize(upload)
+        except uploads.ChunkError as e:
+            return Response({
+                'success': False,
+                'message': str(e),
+                'missing_chunks': uploads.missing_chunks(upload)
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        # Transcoding and the poster frame run as a queued media job
+        jobs.enqueue(post, ['video_transcode'])
+        return Response({
+            'success': True,
+            'message': 'Video uploaded successfully',
+            'post': PostSerializer(post, context={'request': request}).data
+        }, status=status.HTTP_200_OK)
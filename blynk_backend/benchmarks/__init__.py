@@ -0,0 +1 @@
+"""Benchmarks for the BEULYNK API. Run modules with ``python -m benchmarks.<name>``."""
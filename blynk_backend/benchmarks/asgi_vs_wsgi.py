@@ -0,0 +1,65 @@
+"""
+Compare the WSGI (sync workers) and ASGI (uvicorn workers, async views)
+serving modes on the hot read endpoints.
+
+    python -m benchmarks.asgi_vs_wsgi --workers 2 --concurrency 32 --slow-clients 4
+
+A throwaway SQLite database is migrated and seeded, then gunicorn is
+started once per mode with ``gunicorn.conf.py`` and the same workload is
+driven against each. ``--slow-clients`` adds connections that trickle
+their headers, which pin sync workers but not async ones.
+"""
+import argparse
+import json
+import tempfile
+from pathlib import Path
+
+from .load import run_load, SlowClients
+from .seed import prepare_database, server_env
+from .server import serve
+
+
+def workload(data):
+    auth = {'Authorization': f"Token {data['token']}"}
+    return [
+        ('GET', '/api/ngo-info/', None, {}),
+        ('GET', '/api/approved-posts/?page_size=20', None, {}),
+        ('GET', '/api/approved-posts/?bbox=35,-2,38,1&zoom=12&page_size=50', None, {}),
+        ('GET', f"/api/approved-posts/{data['post_ids'][0]}/", None, {}),
+        ('GET', '/api/auth/profile/', None, auth),
+    ]
+
+
+def run_mode(mode, env, args, requests):
+    with serve(env, mode, args.workers) as base_url:
+        run_load(base_url, requests, concurrency=2, duration=1.0)  # warm up
+        with SlowClients(base_url, args.slow_clients):
+            return run_load(base_url, requests, concurrency=args.concurrency, duration=args.duration)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--slow-clients', type=int, default=0)
+    parser.add_argument('--posts', type=int, default=2000)
+    parser.add_argument('--output', help='Write the results as JSON to this file')
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database_url = f'sqlite:///{tmp}/bench.sqlite3'
+        data = prepare_database(database_url, users=100, posts=args.posts, help_requests=100)
+        env = server_env(database_url)
+        requests = workload(data)
+        results = {mode: run_mode(mode, env, args, requests) for mode in ('wsgi', 'asgi')}
+
+    print(f"{'mode':<6} {'rps':>9} {'p50 ms':>9} {'p99 ms':>9} {'errors':>7}")
+    for mode, stats in results.items():
+        print(f"{mode:<6} {stats['rps']:>9} {stats['p50_ms']:>9} {stats['p99_ms']:>9} {stats['errors']:>7}")
+    if args.output:
+        Path(args.output).write_text(json.dumps({'config': vars(args), 'results': results}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+"""
+Diff two benchmark baselines written by ``benchmarks.run``.
+
+    python -m benchmarks.compare old.json new.json --threshold 0.10
+
+Exits with status 1 when any scenario loses more than ``threshold`` of
+its throughput or its p99 latency grows by more than ``threshold``.
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+
+
+def change(old, new):
+    if not old:
+        return 0.0
+    return (new - old) / old
+
+
+def compare(old, new, threshold):
+    """Yield ``(scenario, rps change, p99 change, regressed)``"""
+    for name, new_stats in new['scenarios'].items():
+        old_stats = old['scenarios'].get(name)
+        if old_stats is None:
+            continue
+        rps = change(old_stats['rps'], new_stats['rps'])
+        p99 = change(old_stats['p99_ms'], new_stats['p99_ms'])
+        yield name, rps, p99, rps < -threshold or p99 > threshold
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('old')
+    parser.add_argument('new')
+    parser.add_argument('--threshold', type=float, default=0.10)
+    args = parser.parse_args(argv)
+
+    old = json.loads(Path(args.old).read_text())
+    new = json.loads(Path(args.new).read_text())
+    print(f"old: {old['meta'].get('commit')}  new: {new['meta'].get('commit')}")
+    print(f"{'scenario':<12} {'rps':>9} {'p99':>9}")
+    regressed = False
+    for name, rps, p99, bad in compare(old, new, args.threshold):
+        regressed |= bad
+        print(f"{name:<12} {rps:>+9.1%} {p99:>+9.1%}{'  REGRESSION' if bad else ''}")
+    sys.exit(1 if regressed else 0)
+
+
+if __name__ == '__main__':
+    main()
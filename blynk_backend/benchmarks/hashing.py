@@ -0,0 +1,115 @@
+"""
+Password verifications (logins) per second per core for hasher settings.
+
+    python -m benchmarks.hashing
+    python -m benchmarks.hashing --configs pbkdf2:iterations=600000 argon2:time_cost=2,memory_cost=19456
+
+Each config is ``<hasher>[:<cost>=<value>,...]`` where the hasher is a
+``PASSWORD_HASHER`` name and the costs are the suffixes of its
+``PASSWORD_*`` settings (``PASSWORD_ARGON2_TIME_COST`` -> ``time_cost``).
+One thread per core verifies the same password until the deadline, which
+is the work ``LoginView`` does per login. Hashers whose library is not
+installed are reported and skipped. The end-to-end HTTP number is the
+``login`` scenario of ``benchmarks.run``.
+"""
+import argparse
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+from .load import summarize
+from .seed import BENCH_PASSWORD, setup_django
+
+DEFAULT_CONFIGS = [
+    'pbkdf2',
+    'pbkdf2:iterations=260000',
+    'argon2:time_cost=2,memory_cost=19456,parallelism=1',
+    'bcrypt:rounds=10',
+    'scrypt',
+]
+
+SETTING_PREFIXES = {
+    'pbkdf2': 'PASSWORD_PBKDF2_',
+    'argon2': 'PASSWORD_ARGON2_',
+    'bcrypt': 'PASSWORD_BCRYPT_',
+    'scrypt': 'PASSWORD_SCRYPT_',
+}
+
+
+def parse_config(config):
+    """``'argon2:time_cost=2'`` -> ``('argon2', {'PASSWORD_ARGON2_TIME_COST': 2})``"""
+    name, _, costs = config.partition(':')
+    if name not in SETTING_PREFIXES:
+        raise ValueError(f'Unknown hasher {name!r}')
+    overrides = {}
+    for item in filter(None, costs.split(',')):
+        key, _, value = item.partition('=')
+        overrides[SETTING_PREFIXES[name] + key.upper()] = int(value)
+    return name, overrides
+
+
+def measure(config, threads, duration):
+    from django.conf import settings
+    from django.contrib.auth.hashers import make_password, verify_password
+    from django.test import override_settings
+
+    name, overrides = parse_config(config)
+    hashers = [settings.PASSWORD_HASHER_CLASSES[name]] + [
+        path for other, path in settings.PASSWORD_HASHER_CLASSES.items() if other != name
+    ]
+    with override_settings(PASSWORD_HASHERS=hashers, **overrides):
+        try:
+            encoded = make_password(BENCH_PASSWORD)
+        except ValueError as e:
+            return {'skipped': str(e)}
+
+        latencies, lock = [], threading.Lock()
+        deadline = time.perf_counter() + duration
+
+        def verify():
+            local = []
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                assert verify_password(BENCH_PASSWORD, encoded)[0]
+                local.append(time.perf_counter() - start)
+            with lock:
+                latencies.extend(local)
+
+        start = time.perf_counter()
+        workers = [threading.Thread(target=verify) for _ in range(threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        stats = summarize(latencies, 0, time.perf_counter() - start)
+
+    stats['logins_per_core'] = round(stats['rps'] / threads, 1)
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--configs', nargs='+', default=DEFAULT_CONFIGS)
+    parser.add_argument('--threads', type=int, default=os.cpu_count() or 1,
+                        help='Verifying threads, one per core by default')
+    parser.add_argument('--duration', type=float, default=5.0)
+    parser.add_argument('--output', help='Write the results as JSON to this file')
+    args = parser.parse_args(argv)
+
+    setup_django()
+    results = {config: measure(config, args.threads, args.duration) for config in args.configs}
+
+    print(f"{'config':<52} {'logins/s':>9} {'per core':>9} {'p50 ms':>9}")
+    for config, stats in results.items():
+        if 'skipped' in stats:
+            print(f"{config:<52} skipped: {stats['skipped']}")
+        else:
+            print(f"{config:<52} {stats['rps']:>9} {stats['logins_per_core']:>9} {stats['p50_ms']:>9}")
+    if args.output:
+        Path(args.output).write_text(json.dumps({'config': vars(args), 'results': results}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,210 @@
+"""
+Minimal load drivers built on the standard library.
+
+Each worker thread sends requests for a fixed duration, either over one
+HTTP/1.1 connection to a running server (``run_load``) or in-process
+through Django's test client (``run_client_load``). Latencies are
+collected per request and summarised as throughput and percentiles.
+"""
+import http.client
+import socket
+import threading
+import time
+from urllib.parse import urlsplit
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def summarize(latencies, errors, elapsed):
+    """Throughput and latency percentiles (milliseconds) of a run"""
+    latencies = sorted(latencies)
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'duration_s': round(elapsed, 3),
+        'rps': round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 2),
+        'p90_ms': round(percentile(latencies, 0.90) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+        'max_ms': round(latencies[-1] * 1000, 2) if latencies else 0.0,
+    }
+
+
+def as_factory(requests):
+    """Accept a request factory or a list of requests to cycle through"""
+    if callable(requests):
+        return requests
+    return lambda i: requests[i % len(requests)]
+
+
+class _Worker(threading.Thread):
+    """Sends requests until the deadline and records their latencies"""
+
+    def __init__(self, make_request, deadline, offset, stride):
+        super().__init__(daemon=True)
+        self.make_request = make_request
+        self.deadline = deadline
+        self.offset = offset
+        self.stride = stride
+        self.latencies = []
+        self.errors = 0
+
+    def send(self, method, path, body, headers):
+        """Perform one request and return its status code"""
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+    def run(self):
+        i = self.offset
+        try:
+            while time.perf_counter() < self.deadline:
+                request = self.make_request(i)
+                # Interleave the workers so request numbers never repeat
+                i += self.stride
+                start = time.perf_counter()
+                try:
+                    status = self.send(*request)
+                except (OSError, http.client.HTTPException):
+                    self.errors += 1
+                    continue
+                elapsed = time.perf_counter() - start
+                if status >= 400:
+                    self.errors += 1
+                else:
+                    self.latencies.append(elapsed)
+        finally:
+            self.close()
+
+
+class _HTTPWorker(_Worker):
+    """Keeps one HTTP/1.1 connection, reconnecting when the server closes it"""
+
+    def __init__(self, host, port, *args):
+        super().__init__(*args)
+        self.host, self.port = host, port
+        self.conn = self.connect()
+
+    def connect(self):
+        return http.client.HTTPConnection(self.host, self.port, timeout=30)
+
+    def send(self, method, path, body, headers):
+        try:
+            self.conn.request(method, path, body=body, headers=headers)
+            response = self.conn.getresponse()
+            response.read()
+        except (OSError, http.client.HTTPException):
+            self.conn.close()
+            self.conn = self.connect()
+            raise
+        if response.will_close:
+            self.conn.close()
+            self.conn = self.connect()
+        return response.status
+
+    def close(self):
+        self.conn.close()
+
+
+class _TestClientWorker(_Worker):
+    """Calls the app in-process through Django's test client"""
+
+    def __init__(self, *args):
+        super().__init__(*args)
+        from django.test import Client
+        # Count server errors instead of re-raising them in the worker
+        self.client = Client(raise_request_exception=False)
+
+    def send(self, method, path, body, headers):
+        kwargs = {'headers': headers}
+        if body is not None:
+            kwargs['data'] = body
+            kwargs['content_type'] = headers.get('Content-Type', 'application/octet-stream')
+        return self.client.generic(method, path, **kwargs).status_code
+
+    def close(self):
+        # Each thread has its own database connection
+        from django.db import connection
+        connection.close()
+
+
+def _run(workers):
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - start
+    latencies = [latency for worker in workers for latency in worker.latencies]
+    return summarize(latencies, sum(worker.errors for worker in workers), elapsed)
+
+
+def run_load(base_url, requests, concurrency=10, duration=10.0):
+    """
+    Drive ``requests`` against a server at ``base_url`` from
+    ``concurrency`` threads for ``duration`` seconds.
+
+    ``requests`` is a factory ``i -> (method, path, body, headers)`` or a
+    list of such tuples. Returns the ``summarize`` dict for the run.
+    """
+    parts = urlsplit(base_url)
+    make_request = as_factory(requests)
+    deadline = time.perf_counter() + duration
+    return _run([
+        _HTTPWorker(parts.hostname, parts.port or 80, make_request, deadline, offset, concurrency)
+        for offset in range(concurrency)
+    ])
+
+
+def run_client_load(requests, concurrency=10, duration=10.0):
+    """Like ``run_load`` but in-process through Django's test client"""
+    make_request = as_factory(requests)
+    deadline = time.perf_counter() + duration
+    return _run([
+        _TestClientWorker(make_request, deadline, offset, concurrency)
+        for offset in range(concurrency)
+    ])
+
+
+class SlowClients:
+    """
+    Connections that send request headers one byte at a time, the way a
+    phone on a poor link does. Each one pins a sync worker while it lasts.
+    """
+
+    def __init__(self, base_url, count, interval=0.5):
+        parts = urlsplit(base_url)
+        self.address = (parts.hostname, parts.port or 80)
+        self.count = count
+        self.interval = interval
+        self.stop_event = threading.Event()
+        self.threads = []
+
+    def _trickle(self):
+        payload = f'GET /api/ngo-info/ HTTP/1.1\r\nHost: {self.address[0]}\r\nX-Slow: '.encode()
+        while not self.stop_event.is_set():
+            try:
+                with socket.create_connection(self.address, timeout=5) as sock:
+                    sock.sendall(payload)
+                    while not self.stop_event.wait(self.interval):
+                        sock.sendall(b'a')
+            except OSError:
+                self.stop_event.wait(self.interval)
+
+    def __enter__(self):
+        for _ in range(self.count):
+            thread = threading.Thread(target=self._trickle, daemon=True)
+            thread.start()
+            self.threads.append(thread)
+        return self
+
+    def __exit__(self, *exc):
+        self.stop_event.set()
+        for thread in self.threads:
+            thread.join(timeout=5)
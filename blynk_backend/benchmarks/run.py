@@ -0,0 +1,102 @@
+"""
+Run the API benchmark scenarios and save the results as a JSON baseline.
+
+    python -m benchmarks.run --output baseline.json
+    python -m benchmarks.run --target server --server-mode asgi --scenarios feed,map
+    python -m benchmarks.run --url http://127.0.0.1:8000 --scenarios feed
+
+By default a throwaway SQLite database is seeded and the app is driven
+in-process through Django's test client. ``--target server`` starts
+gunicorn on that database instead. ``--url`` benchmarks a server that is
+already running; this process then seeds the database configured by its
+own environment (DATABASE_URL), which must be the server's, so point
+both at a disposable database. Compare two baselines with
+``python -m benchmarks.compare``.
+"""
+import argparse
+import json
+import platform
+import subprocess
+import tempfile
+from datetime import datetime, timezone
+from pathlib import Path
+
+from .load import run_load, run_client_load
+from .scenarios import SCENARIOS
+from .seed import BACKEND_DIR, prepare_database, seed, server_env, setup_django
+from .server import serve
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], cwd=BACKEND_DIR, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_scenarios(names, data, drive, args):
+    results = {}
+    for name in names:
+        # Fresh factories, so warm-up traffic (e.g. new usernames) is not replayed
+        drive(SCENARIOS[name](data), 2, min(1.0, args.duration))
+        results[name] = drive(SCENARIOS[name](data), args.concurrency, args.duration)
+        stats = results[name]
+        print(f"{name:<12} {stats['rps']:>9} {stats['p50_ms']:>9} {stats['p90_ms']:>9} "
+              f"{stats['p99_ms']:>9} {stats['errors']:>7}")
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--target', choices=['client', 'server'], default='client')
+    parser.add_argument('--url', help='Benchmark an already running server')
+    parser.add_argument('--server-mode', choices=['wsgi', 'asgi'], default='wsgi')
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS))
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--posts', type=int, default=5000)
+    parser.add_argument('--help-requests', type=int, default=5000)
+    parser.add_argument('--output', help='Write the results as JSON to this file')
+    args = parser.parse_args(argv)
+
+    names = [name.strip() for name in args.scenarios.split(',') if name.strip()]
+    unknown = set(names) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+    counts = {'users': args.users, 'posts': args.posts, 'help_requests': args.help_requests}
+
+    print(f"{'scenario':<12} {'rps':>9} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'errors':>7}")
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.url:
+            setup_django()
+            data = seed(**counts)
+            results = run_scenarios(names, data, lambda r, c, d: run_load(args.url, r, c, d), args)
+        else:
+            database_url = f'sqlite:///{tmp}/bench.sqlite3'
+            data = prepare_database(database_url, **counts)
+            if args.target == 'server':
+                with serve(server_env(database_url), args.server_mode, args.workers) as base_url:
+                    results = run_scenarios(names, data, lambda r, c, d: run_load(base_url, r, c, d), args)
+            else:
+                results = run_scenarios(names, data, run_client_load, args)
+
+    if args.output:
+        baseline = {
+            'meta': {
+                'commit': git_commit(),
+                'timestamp': datetime.now(timezone.utc).isoformat(),
+                'python': platform.python_version(),
+                'target': args.url or args.target,
+                'config': vars(args),
+            },
+            'scenarios': results,
+        }
+        Path(args.output).write_text(json.dumps(baseline, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+"""
+Benchmark workloads.
+
+Each scenario takes the seed data and returns a request factory
+``make_request(i) -> (method, path, body, headers)`` that the load
+drivers call for every request. Factories are deterministic in ``i`` so
+runs on different commits send the same traffic.
+"""
+import json
+import random
+import uuid
+
+JSON_HEADERS = {'Content-Type': 'application/json'}
+
+
+def _auth(data):
+    return {'Authorization': f"Token {data['token']}"}
+
+
+def _json(payload):
+    return json.dumps(payload).encode()
+
+
+def _viewport(rng, region, span):
+    min_lon, min_lat, max_lon, max_lat = region
+    lon = rng.uniform(min_lon, max_lon - span)
+    lat = rng.uniform(min_lat, max_lat - span)
+    return f'{lon:.4f},{lat:.4f},{lon + span:.4f},{lat + span:.4f}'
+
+
+def register(data):
+    run = uuid.uuid4().hex[:8]
+
+    def make_request(i):
+        username = f'reg-{run}-{i}'
+        return 'POST', '/api/auth/register/', _json({
+            'username': username,
+            'email': f'{username}@example.com',
+            'password': 'bench-password-123',
+            'confirm_password': 'bench-password-123',
+            'role': 'volunteer',
+        }), JSON_HEADERS
+    return make_request
+
+
+def login(data):
+    from .seed import BENCH_PASSWORD
+    usernames = data['login_usernames']
+
+    def make_request(i):
+        return 'POST', '/api/auth/login/', _json({
+            'username': usernames[i % len(usernames)],
+            'password': BENCH_PASSWORD,
+        }), JSON_HEADERS
+    return make_request
+
+
+def feed(data):
+    paths = [
+        ('/api/posts/?page_size=20', {}),
+        ('/api/approved-posts/?page_size=20', {}),
+        ('/api/help-request/?page_size=20', _auth(data)),
+        ('/api/ngo-info/', {}),
+    ]
+
+    def make_request(i):
+        path, headers = paths[i % len(paths)]
+        return 'GET', path, None, headers
+    return make_request
+
+
+def map_queries(data):
+    region = data['region']
+
+    def make_request(i):
+        rng = random.Random(i)
+        kind = i % 3
+        if kind == 0:
+            return 'GET', f'/api/approved-posts/?bbox={_viewport(rng, region, 0.5)}&zoom=11', None, {}
+        if kind == 1:
+            zoom = rng.randint(3, 10)
+            return 'GET', f'/api/approved-posts/clusters/?zoom={zoom}&bbox={_viewport(rng, region, 4.0)}', None, {}
+        min_lon, min_lat, max_lon, max_lat = region
+        lat, lon = rng.uniform(min_lat, max_lat), rng.uniform(min_lon, max_lon)
+        return 'GET', f'/api/posts/nearby/?lat={lat:.5f}&lon={lon:.5f}&radius_km=10', None, {}
+    return make_request
+
+
+def create_post(data):
+    region = data['region']
+    headers = dict(JSON_HEADERS, **_auth(data))
+
+    def make_request(i):
+        rng = random.Random(i)
+        min_lon, min_lat, max_lon, max_lat = region
+        return 'POST', '/api/posts/', _json({
+            'title': f'Benchmark post {i}',
+            'description': 'Created during a benchmark run.',
+            'latitude': round(rng.uniform(min_lat, max_lat), 6),
+            'longitude': round(rng.uniform(min_lon, max_lon), 6),
+        }), headers
+    return make_request
+
+
+SCENARIOS = {
+    'register': register,
+    'login': login,
+    'feed': feed,
+    'map': map_queries,
+    'create_post': create_post,
+}
@@ -0,0 +1,130 @@
+"""
+Database setup and realistic seed data for benchmarks.
+
+Seeding uses ``bulk_create`` with one precomputed password hash, so tens
+of thousands of rows take seconds. Derived data that ``bulk_create``
+skips (geohashes, map clusters) is filled in explicitly.
+"""
+import os
+import random
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+BENCH_PASSWORD = 'bench-password-123'
+
+# Rough bounding box of the region the seeded posts are spread over
+SEED_REGION = (33.0, -5.0, 42.0, 5.0)  # minLon, minLat, maxLon, maxLat
+
+
+def server_env(database_url):
+    """Environment for a local server (or this process) using ``database_url``"""
+    env = dict(os.environ)
+    env.update({
+        'DATABASE_URL': database_url,
+        # DEBUG avoids the HTTPS redirect on plain local HTTP
+        'DEBUG': 'True',
+        'ALLOWED_HOSTS': '127.0.0.1,localhost,testserver',
+        'PYTHONPATH': str(BACKEND_DIR),
+        # Throughput runs log in and register far faster than real clients
+        'LOGIN_IP_RATE': '1000000/min',
+        'LOGIN_USERNAME_RATE': '1000000/min',
+        'REGISTER_IP_RATE': '1000000/min',
+    })
+    return env
+
+
+def setup_django(database_url=None):
+    """Configure and start Django in this process"""
+    if database_url is not None:
+        os.environ.update(server_env(database_url))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'blynk_backend.settings')
+    if str(BACKEND_DIR) not in sys.path:
+        sys.path.insert(0, str(BACKEND_DIR))
+    import django
+    django.setup()
+
+
+def seed(users=1000, posts=5000, help_requests=5000, login_users=50, seed_value=1234):
+    """
+    Create benchmark data and return what the scenarios need:
+
+    ``token``/``user_id`` of a reader account, ``login_usernames`` (never
+    used for token auth, since logging in rotates tokens), ``post_ids``
+    and the ``region`` the posts cover.
+    """
+    from django.contrib.auth.hashers import make_password
+    from django.contrib.auth.models import User
+    from django.core.management import call_command
+    from api import clustering
+    from api.authentication import issue_token
+    from api.models import UserProfile, Post, HelpRequest, NGOInfo
+
+    rng = random.Random(seed_value)
+    password = make_password(BENCH_PASSWORD)
+    roles = [role for role, _ in UserProfile.ROLE_CHOICES]
+
+    if not NGOInfo.objects.exists():
+        call_command('init_ngo_data', stdout=open(os.devnull, 'w'))
+
+    prefix = f'bench{rng.randrange(10 ** 6)}'
+    User.objects.bulk_create([
+        User(username=f'{prefix}-{i}', email=f'{prefix}-{i}@example.com', password=password)
+        for i in range(users + login_users)
+    ], batch_size=1000)
+    all_users = list(User.objects.filter(username__startswith=f'{prefix}-').order_by('id'))
+    UserProfile.objects.bulk_create(
+        [UserProfile(user=user, role=rng.choice(roles)) for user in all_users],
+        batch_size=1000,
+    )
+    authors, login_accounts = all_users[:users], all_users[users:]
+    reader = authors[0]
+    token = issue_token(reader)
+
+    min_lon, min_lat, max_lon, max_lat = SEED_REGION
+    new_posts = []
+    for i in range(posts):
+        post = Post(
+            user=rng.choice(authors),
+            title=f'Community issue {i}',
+            description='Reported problem that needs attention. ' * rng.randint(1, 8),
+            latitude=rng.uniform(min_lat, max_lat),
+            longitude=rng.uniform(min_lon, max_lon),
+            is_confirmed=rng.random() < 0.8,
+        )
+        post.geohash = post.compute_geohash()
+        new_posts.append(post)
+    Post.objects.bulk_create(new_posts, batch_size=1000)
+    clustering.rebuild()
+
+    categories = [value for value, _ in HelpRequest._meta.get_field('category').choices]
+    urgencies = [value for value, _ in HelpRequest._meta.get_field('urgency').choices]
+    # The reader owns a realistic share so its own lists are not empty
+    owners = [reader] * 20 + authors
+    HelpRequest.objects.bulk_create([
+        HelpRequest(
+            user=rng.choice(owners),
+            category=rng.choice(categories),
+            title=f'Help needed {i}',
+            description='Details of the situation. ' * rng.randint(1, 6),
+            urgency=rng.choice(urgencies),
+        )
+        for i in range(help_requests)
+    ], batch_size=1000)
+
+    return {
+        'token': token.key,
+        'user_id': reader.id,
+        'login_usernames': [user.username for user in login_accounts],
+        'post_ids': list(Post.objects.filter(is_confirmed=True).values_list('id', flat=True)[:500]),
+        'region': SEED_REGION,
+    }
+
+
+def prepare_database(database_url, **counts):
+    """Set up Django on ``database_url``, migrate it and seed it"""
+    setup_django(database_url)
+    from django.core.management import call_command
+    call_command('migrate', verbosity=0)
+    return seed(**counts)
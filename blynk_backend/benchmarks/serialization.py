@@ -0,0 +1,95 @@
+"""
+Per-item cost of turning a page of posts into a JSON response body.
+
+    python -m benchmarks.serialization
+    python -m benchmarks.serialization --page-sizes 50 200 --repeat 20
+
+A throwaway SQLite database is seeded, then each pipeline fetches a page
+of posts the way ``/api/posts/`` does, serializes and renders it, and is
+timed over ``--repeat`` runs:
+
+- ``model+json``: ``PostSerializer`` on model instances, DRF's stdlib
+  ``JSONRenderer`` (the old list path)
+- ``model+orjson``: the same serializer, ``ORJSONRenderer``
+- ``values+orjson``: ``PostValuesSerializer`` on ``.values()`` rows,
+  ``ORJSONRenderer`` (the current list path)
+
+Each run also checks that the pipelines produce identical bytes.
+"""
+import argparse
+import json
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from .seed import prepare_database
+
+
+def pipelines():
+    from rest_framework.renderers import JSONRenderer
+    from api.models import Post
+    from api.renderers import ORJSONRenderer
+    from api.serializers import PostSerializer, PostValuesSerializer
+
+    def queryset():
+        return Post.objects.select_related('user').order_by('-created_at', '-id')
+
+    def model(renderer):
+        def run(size):
+            posts = list(queryset()[:size])
+            return renderer.render(PostSerializer(posts, many=True).data)
+        return run
+
+    def values(size):
+        serializer = PostValuesSerializer()
+        rows = list(serializer.values(queryset())[:size])
+        return ORJSONRenderer().render(serializer.to_list(rows))
+
+    return {
+        'model+json': model(JSONRenderer()),
+        'model+orjson': model(ORJSONRenderer()),
+        'values+orjson': values,
+    }
+
+
+def measure(run, size, repeat):
+    run(size)  # warm up
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run(size)
+        timings.append(time.perf_counter() - start)
+    per_item = statistics.median(timings) / size * 1e6
+    return {'median_ms': round(statistics.median(timings) * 1000, 2), 'us_per_item': round(per_item, 1)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--page-sizes', type=int, nargs='+', default=[50, 200])
+    parser.add_argument('--repeat', type=int, default=30)
+    parser.add_argument('--posts', type=int, default=2000)
+    parser.add_argument('--output', help='Write the results as JSON to this file')
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        prepare_database(f'sqlite:///{tmp}/bench.sqlite3', users=100, posts=args.posts, help_requests=0)
+        runs = pipelines()
+        results = {}
+        for size in args.page_sizes:
+            outputs = {run(size) for run in runs.values()}
+            assert len(outputs) == 1, 'pipelines disagree'
+            results[size] = {name: measure(run, size, args.repeat) for name, run in runs.items()}
+
+    print(f"{'page':>5} {'pipeline':<15} {'ms/page':>9} {'us/item':>9} {'speedup':>8}")
+    for size, by_pipeline in results.items():
+        baseline = by_pipeline['model+json']['us_per_item']
+        for name, stats in by_pipeline.items():
+            speedup = baseline / stats['us_per_item']
+            print(f"{size:>5} {name:<15} {stats['median_ms']:>9} {stats['us_per_item']:>9} {speedup:>7.1f}x")
+    if args.output:
+        Path(args.output).write_text(json.dumps({'config': vars(args), 'results': results}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
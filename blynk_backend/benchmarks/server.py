@@ -0,0 +1,42 @@
+"""Start a throwaway gunicorn server for benchmarks"""
+import contextlib
+import socket
+import subprocess
+import sys
+import time
+
+from .seed import BACKEND_DIR
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(port, timeout=30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=1):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f'Server did not start on port {port}')
+
+
+@contextlib.contextmanager
+def serve(env, mode='wsgi', workers=2):
+    """Run gunicorn with ``gunicorn.conf.py`` and yield its base URL"""
+    port = free_port()
+    env = dict(env, SERVER_MODE=mode, PORT=str(port), WEB_CONCURRENCY=str(workers))
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '--log-level', 'warning'],
+        cwd=BACKEND_DIR, env=env,
+    )
+    try:
+        wait_for_port(port)
+        yield f'http://127.0.0.1:{port}'
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
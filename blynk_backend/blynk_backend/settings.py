@@ -5,6 +5,7 @@ Django settings for blynk_backend project.
 import os
 from pathlib import Path
 import dj_database_url
+from django.core.exceptions import ImproperlyConfigured
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -17,6 +18,10 @@ DEBUG = os.environ.get('DEBUG', 'False') == 'True'
 
 ALLOWED_HOSTS = os.environ.get('ALLOWED_HOSTS', '*').split(',')
 
+# 'wsgi' (gunicorn sync workers) or 'asgi' (gunicorn with uvicorn workers,
+# async read views). See gunicorn.conf.py.
+SERVER_MODE = os.environ.get('SERVER_MODE', 'wsgi')
+
 # Application definition
 INSTALLED_APPS = [
     'django.contrib.admin',
@@ -38,6 +43,7 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
+    'api.delivery.CompressionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -70,11 +76,37 @@ WSGI_APPLICATION = 'blynk_backend.wsgi.application'
 DATABASES = {
     'default': dj_database_url.config(
         default=os.environ.get('DATABASE_URL', 'sqlite:///db.sqlite3'),
-        conn_max_age=600,
+        # Persistent connections are per thread, which async views do not reuse
+        conn_max_age=0 if SERVER_MODE == 'asgi' else 600,
         conn_health_checks=True,
     )
 }
 
+# Cache
+# Per-process memory by default. Set REDIS_URL to share the cache between
+# workers and instances (requires the redis package).
+REDIS_URL = os.environ.get('REDIS_URL')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'beulynk',
+        }
+    }
+
+# Broker carrying post approval events to the /api/events/posts/ streams.
+# The in-process one only reaches clients of the same worker.
+EVENT_BROKER = os.environ.get(
+    'EVENT_BROKER', 'api.events.RedisBroker' if REDIS_URL else 'api.events.InProcessBroker'
+)
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -91,6 +123,47 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Password hashing. PASSWORD_HASHER picks the algorithm for new passwords;
+# the others stay listed so existing hashes still verify, and each one is
+# replaced with the preferred algorithm and cost on its next successful
+# login. argon2 needs argon2-cffi and bcrypt needs bcrypt.
+PASSWORD_HASHER_CLASSES = {
+    'pbkdf2': 'api.hashers.PBKDF2PasswordHasher',
+    'argon2': 'api.hashers.Argon2PasswordHasher',
+    'bcrypt': 'api.hashers.BCryptSHA256PasswordHasher',
+    'scrypt': 'api.hashers.ScryptPasswordHasher',
+}
+PASSWORD_HASHER = os.environ.get('PASSWORD_HASHER', 'pbkdf2')
+if PASSWORD_HASHER not in PASSWORD_HASHER_CLASSES:
+    raise ImproperlyConfigured(
+        f'PASSWORD_HASHER must be one of {", ".join(PASSWORD_HASHER_CLASSES)}, not {PASSWORD_HASHER!r}'
+    )
+PASSWORD_HASHERS = [PASSWORD_HASHER_CLASSES[PASSWORD_HASHER]] + [
+    path for name, path in PASSWORD_HASHER_CLASSES.items() if name != PASSWORD_HASHER
+]
+
+
+def _int_env(name):
+    value = os.environ.get(name)
+    return int(value) if value else None
+
+
+# Costs for the hashers above; unset means Django's default
+PASSWORD_PBKDF2_ITERATIONS = _int_env('PASSWORD_PBKDF2_ITERATIONS')
+PASSWORD_ARGON2_TIME_COST = _int_env('PASSWORD_ARGON2_TIME_COST')
+PASSWORD_ARGON2_MEMORY_COST = _int_env('PASSWORD_ARGON2_MEMORY_COST')  # KiB
+PASSWORD_ARGON2_PARALLELISM = _int_env('PASSWORD_ARGON2_PARALLELISM')
+PASSWORD_BCRYPT_ROUNDS = _int_env('PASSWORD_BCRYPT_ROUNDS')
+PASSWORD_SCRYPT_WORK_FACTOR = _int_env('PASSWORD_SCRYPT_WORK_FACTOR')
+
+# Threads per worker that hash passwords, and how many more hashes may
+# wait for one before logins are turned away with a 503
+PASSWORD_WORKERS = int(os.environ.get('PASSWORD_WORKERS', '2'))
+PASSWORD_QUEUE_SIZE = int(os.environ.get('PASSWORD_QUEUE_SIZE', '8'))
+
+# ModelBackend with its password checks on that thread pool
+AUTHENTICATION_BACKENDS = ['api.passwords.PooledModelBackend']
+
 # Internationalization
 LANGUAGE_CODE = 'en-us'
 TIME_ZONE = 'UTC'
@@ -105,6 +178,24 @@ STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 # Media files (user uploads)
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
+# Browser and CDN cache lifetime of media files, in seconds
+MEDIA_CACHE_MAX_AGE = int(os.environ.get('MEDIA_CACHE_MAX_AGE', str(365 * 24 * 60 * 60)))
+
+# Run media jobs on a thread of the web process. Turn off where
+# `manage.py process_media_jobs` runs as a worker with the same MEDIA_ROOT.
+MEDIA_JOBS_INLINE = os.environ.get('MEDIA_JOBS_INLINE', 'True') == 'True'
+
+# ffmpeg used to transcode post videos (looked up on PATH); without it
+# videos are served as uploaded. VIDEO_HLS also writes HLS segments.
+FFMPEG_BINARY = os.environ.get('FFMPEG_BINARY', 'ffmpeg')
+VIDEO_HLS = os.environ.get('VIDEO_HLS', 'False') == 'True'
+
+# Smallest response body, in bytes, worth compressing with brotli/gzip
+COMPRESSION_MIN_SIZE = int(os.environ.get('COMPRESSION_MIN_SIZE', '1024'))
+
+# Partial chunks of resumable video uploads (kept out of MEDIA_ROOT so
+# they are never served)
+CHUNKED_UPLOAD_ROOT = BASE_DIR / 'chunked_uploads'
 
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
@@ -112,20 +203,28 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    # orjson-backed when orjson is installed, DRF's JSON classes otherwise
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
+        'api.renderers.ORJSONRenderer',
     ],
     'DEFAULT_PARSER_CLASSES': [
-        'rest_framework.parsers.JSONParser',
+        'api.parsers.ORJSONParser',
         'rest_framework.parsers.FormParser',
         'rest_framework.parsers.MultiPartParser',
     ],
+    'DEFAULT_PAGINATION_CLASS': 'api.pagination.KeysetPagination',
+    'PAGE_SIZE': 50,
+    'DEFAULT_THROTTLE_RATES': {
+        'login_ip': os.environ.get('LOGIN_IP_RATE', '30/min'),
+        'login_username': os.environ.get('LOGIN_USERNAME_RATE', '10/min'),
+        'register_ip': os.environ.get('REGISTER_IP_RATE', '20/hour'),
+    },
 }
 
 # CORS settings
@@ -152,6 +251,9 @@ CORS_ALLOW_HEADERS = [
     'x-requested-with',
 ]
 
+# Let browser clients read the pagination Link header
+CORS_EXPOSE_HEADERS = ['Link']
+
 CORS_ALLOW_METHODS = [
     'DELETE',
     'GET',
@@ -1,19 +1,26 @@
 """
 URL configuration for blynk_backend project.
 """
+import re
+from urllib.parse import urlsplit
+
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, re_path, include
 from django.conf import settings
-from django.conf.urls.static import static
+
+from api.delivery import serve_media
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('api.urls')),
 ]
 
-# Serve media files in development
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+# Serve media files (with caching and Range support) unless a CDN or
+# another host serves MEDIA_URL
+if not urlsplit(settings.MEDIA_URL).netloc:
+    urlpatterns += [
+        re_path(rf'^{re.escape(settings.MEDIA_URL.lstrip("/"))}(?P<path>.+)$', serve_media),
+    ]
 
 # Customize admin site
 admin.site.site_header = "BEULYNK Administration"
@@ -0,0 +1,42 @@
+"""
+Gunicorn configuration for BEULYNK.
+
+SERVER_MODE=wsgi (default) runs the WSGI app on sync workers.
+SERVER_MODE=asgi runs the ASGI app on uvicorn workers, which also
+switches the hot read endpoints to their async views (see api/urls.py).
+The worker count comes from WEB_CONCURRENCY as usual.
+
+The master also starts `manage.py run_maintenance` beside the workers,
+so expired tokens, stale uploads and old tombstones are cleaned up on
+the host that holds the database and upload files. MAINTENANCE_INTERVAL
+sets its period in seconds; 0 turns it off for deployments that
+schedule the command themselves.
+"""
+import os
+import subprocess
+import sys
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+
+if os.environ.get('SERVER_MODE', 'wsgi') == 'asgi':
+    wsgi_app = 'blynk_backend.asgi:application'
+    worker_class = 'uvicorn_worker.UvicornWorker'
+else:
+    wsgi_app = 'blynk_backend.wsgi:application'
+
+maintenance_interval = int(os.environ.get('MAINTENANCE_INTERVAL', '3600'))
+_maintenance = None
+
+
+def when_ready(server):
+    global _maintenance
+    if maintenance_interval:
+        _maintenance = subprocess.Popen(
+            [sys.executable, 'manage.py', 'run_maintenance', '--interval', str(maintenance_interval)],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        )
+
+
+def on_exit(server):
+    if _maintenance is not None:
+        _maintenance.terminate()